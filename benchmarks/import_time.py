@@ -0,0 +1,117 @@
+"""
+Startup budget for the command-line entry points and the dashboard.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget analysis=800 --runs 5
+
+Each module is imported in a fresh interpreter under ``python -X importtime``
+and its cumulative import time is compared with a budget in milliseconds
+(best of --runs, to smooth out a cold disk cache). Heavy optional libraries
+must not be imported at all: they are loaded on first use. The exit code is
+1 if any module is over budget or pulls in a deferred library.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# Cumulative import time budgets in milliseconds; pandas alone is roughly half of these
+BUDGETS_MS = {
+    'analysis': 1500,
+    'data_collector': 1500,
+    'bulk_loader': 1500,
+    'api_service': 1500,
+    'scheduler': 1500,
+    'dashboard': 4000
+}
+
+# Libraries that must only load on first use
+DEFERRED = ['matplotlib', 'seaborn', 'plotly', 'gender_guesser', 'praw', 'github', 'textblob', 'scipy', 'networkx', 'duckdb']
+# The dashboard draws its charts while the script runs, so plotly is part of its startup
+ALLOWED = {'dashboard': {'plotly'}}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> Optional[Dict]:
+    """
+    Cumulative import time of module (ms) and the top-level packages it
+    imported, or a skip reason when a dependency is not installed
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    )
+    if proc.returncode != 0:
+        if "ModuleNotFoundError" in proc.stderr:
+            missing = re.findall(r"No module named '([^']+)'", proc.stderr)
+            return {'skipped': f"missing dependency {missing[-1] if missing else '?'}"}
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative_ms = None
+    imported = set()
+    for match in LINE.finditer(proc.stderr):
+        _, cumulative, _, name = match.groups()
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative_ms = int(cumulative) / 1000
+    return {'ms': cumulative_ms, 'imported': imported}
+
+
+def check(modules: Dict[str, float], runs: int) -> Dict[str, Dict]:
+    """Measure every module; returns per-module results and the list of failures"""
+    failures = []
+    results = {}
+    for module, budget in modules.items():
+        samples = [measure(module) for _ in range(runs)]
+        if 'skipped' in samples[0]:
+            print(f"  {module:<16} skipped ({samples[0]['skipped']})")
+            continue
+        best = min(sample['ms'] for sample in samples)
+        deferred = sorted((set(DEFERRED) - ALLOWED.get(module, set())) & samples[0]['imported'])
+        status = "ok"
+        if best > budget:
+            status = "OVER BUDGET"
+            failures.append(f"{module}: {best:.0f}ms > {budget:.0f}ms")
+        if deferred:
+            status = "EAGER IMPORTS"
+            failures.append(f"{module} imports {', '.join(deferred)} at startup")
+        results[module] = {'ms': best, 'budget_ms': budget, 'deferred_imported': deferred}
+        print(f"  {module:<16} {best:8.0f}ms / {budget:.0f}ms  {status}"
+              + (f" ({', '.join(deferred)})" if deferred else ""))
+    return {'modules': results, 'failures': failures}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Check import-time budgets of the entry points")
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help="Override or add a budget, e.g. analysis=800 (repeatable)")
+    parser.add_argument('--runs', type=int, default=3, help="Imports per module; the fastest counts")
+    parser.add_argument('--output', type=Path, help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        module, _, ms = item.partition('=')
+        budgets[module] = float(ms)
+
+    print(f"Import time (best of {args.runs}, python -X importtime)")
+    report = check(budgets, args.runs)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if report['failures']:
+        print("\nStartup budget exceeded:")
+        for failure in report['failures']:
+            print(f"  {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
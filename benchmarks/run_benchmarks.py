@@ -0,0 +1,190 @@
+"""
+Benchmark suite for collection, gender inference, analysis and dashboard data prep.
+
+    python benchmarks/run_benchmarks.py --size small --output bench_small.json
+    python benchmarks/run_benchmarks.py --size small --baseline bench_small.json --threshold 0.25
+
+Each stage is timed on a synthetic corpus (see synthetic_data.py) and the
+results are written as JSON. With --baseline, any stage slower than the
+baseline by more than the threshold is reported and the exit code is 1.
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from synthetic_data import SIZES, generate_corpus, iter_corpus  # noqa: E402
+from data_collector import SocialComputingDataCollector, infer_genders  # noqa: E402
+from analysis import SocialComputingAnalysis  # noqa: E402
+from chart_data import prepare_chart_data  # noqa: E402
+
+PLATFORMS = ["stackoverflow", "github", "reddit"]
+
+
+def time_stage(results: Dict, name: str, fn: Callable[[], Optional[int]]):
+    """Run fn once, recording wall time and (if fn returns it) rows processed"""
+    start = time.perf_counter()
+    rows = fn()
+    seconds = time.perf_counter() - start
+    entry = {'seconds': round(seconds, 4)}
+    if rows is not None:
+        entry['rows'] = rows
+        entry['rows_per_second'] = round(rows / seconds) if seconds > 0 else None
+    results[name] = entry
+    print(f"  {name:<45} {seconds:9.3f}s" + (f"  {rows:>10} rows" if rows is not None else ""))
+
+
+def run(size: str, workdir: Path, inference_sample: int, store_sample: int) -> Dict:
+    db_path = workdir / f"bench_{size}.db"
+    stages = {}
+    print(f"Benchmarking '{size}' corpus ({SIZES[size]:,} comments) in {workdir}")
+
+    # Insert: build the corpus with the same executemany path the pipeline writer uses
+    time_stage(stages, 'insert.corpus', lambda: sum(generate_corpus(str(db_path), size).values()))
+
+    # Per-row _store_* path and the batched writer path, on a scratch database
+    scratch = SocialComputingDataCollector(db_path=str(workdir / "bench_scratch.db"))
+    _, sample_rows = next(t for t in iter_corpus('small', seed=7) if t[0] == 'reddit_comments')
+    comments = [
+        {'id': f"s{row[0]}", 'author': row[2], 'subreddit': row[3], 'body': row[4],
+         'score': row[6], 'created_utc': row[7]}
+        for row in sample_rows[:store_sample]
+    ]
+
+    def store_per_row():
+        for comment in comments:
+            scratch._store_reddit_comment(comment, 'p0')
+        return len(comments)
+
+    def store_batched():
+        conn = sqlite3.connect(scratch.db_path)
+        rows = [scratch._transform_item('reddit_comments', dict(c, id=f"b{c['id']}", post_id='p0'))[1] for c in comments]
+        scratch._write_rows(conn, 'reddit_comments', rows)
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+    time_stage(stages, 'insert.store_per_row', store_per_row)
+    time_stage(stages, 'insert.store_batched', store_batched)
+
+    # Gender inference over distinct usernames
+    conn = sqlite3.connect(db_path)
+    usernames = pd.read_sql_query(
+        f"SELECT DISTINCT username FROM reddit_comments LIMIT {inference_sample}", conn
+    )['username']
+    conn.close()
+    analyzer = SocialComputingAnalysis(db_path=str(db_path), output_dir=str(workdir / "visualizations"))
+
+    time_stage(stages, 'inference.infer_gender_enhanced',
+               lambda: len(usernames.apply(analyzer.infer_gender_enhanced)))
+    time_stage(stages, 'inference.infer_genders_vectorized', lambda: len(infer_genders(usernames)))
+
+    # Loading and analysis
+    loaded = {}
+    for name in PLATFORMS:
+        def load(name=name):
+            loaded[name] = analyzer.load_platform_data(name)
+            return sum(len(df) for df in loaded[name].values())
+        time_stage(stages, f'analysis.load_platform_data.{name}', load)
+
+    total_rows = sum(sum(len(df) for df in data.values()) for data in loaded.values())
+
+    def comprehensive():
+        analyzer.generate_comprehensive_analysis()
+        return total_rows
+    time_stage(stages, 'analysis.generate_comprehensive_analysis', comprehensive)
+
+    # Dashboard data preparation (aggregates only; loading is timed above)
+    for name in PLATFORMS:
+        def prepare(name=name):
+            prepare_chart_data(name, {key: df.copy() for key, df in loaded[name].items()})
+            return sum(len(df) for df in loaded[name].values())
+        time_stage(stages, f'dashboard.chart_data.{name}', prepare)
+
+    return stages
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, threshold: float, min_seconds: float = 0.1) -> List[str]:
+    """
+    Stages slower than baseline by more than threshold (fraction). Stages
+    under min_seconds in both runs are ignored as timer noise.
+    """
+    regressions = []
+    if baseline.get('meta', {}).get('size') != results['meta']['size']:
+        print("Warning: baseline was run on a different corpus size")
+    for name, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous or previous['seconds'] <= 0:
+            continue
+        if max(previous['seconds'], current['seconds']) < min_seconds:
+            continue
+        ratio = current['seconds'] / previous['seconds']
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {previous['seconds']:.3f}s -> {current['seconds']:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark collection, inference, analysis and dashboard data prep")
+    parser.add_argument('--size', choices=list(SIZES), default='small', help="Synthetic corpus size")
+    parser.add_argument('--workdir', type=Path, help="Directory for the synthetic databases (default: a temp dir)")
+    parser.add_argument('--output', type=Path, help="Write results JSON here")
+    parser.add_argument('--baseline', type=Path, help="Compare against a previous results JSON")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown vs baseline, as a fraction")
+    parser.add_argument('--min-seconds', type=float, default=0.1, help="Ignore stages faster than this in both runs")
+    parser.add_argument('--inference-sample', type=int, default=100_000, help="Distinct usernames for inference timing")
+    parser.add_argument('--store-sample', type=int, default=2_000, help="Rows for the per-row _store_* timing")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        stages = run(args.size, workdir, args.inference_sample, args.store_sample)
+
+    results = {
+        'meta': {
+            'size': args.size,
+            'comments': SIZES[args.size],
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine()
+        },
+        'stages': stages
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
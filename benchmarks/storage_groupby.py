@@ -0,0 +1,166 @@
+"""
+Groupby latency of the storage backends on a large comments table.
+
+    python benchmarks/storage_groupby.py                      # 10M rows
+    python benchmarks/storage_groupby.py --rows 1000000 --runs 5 --output groupby.json
+
+A reddit_comments table with --rows synthetic rows (no text, no triggers)
+is written to a scratch SQLite file, reused while its row count matches.
+Each analytical groupby then runs on SQLite, on DuckDB reading the SQLite
+file, and on an embedded DuckDB copy (the copy time is reported
+separately), along with reading the whole table into pandas the way
+load_platform_data does. Results are checked to agree across engines.
+DuckDB rows are skipped when duckdb is not installed.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from storage import DuckDBBackend, SQLiteBackend  # noqa: E402
+from synthetic_data import SUBREDDITS, _zipf_choice, make_usernames  # noqa: E402
+
+# Written with operators both engines agree on (% and - rather than integer /)
+GROUPBYS = {
+    'by_gender': '''
+        SELECT gender_inferred, COUNT(*) AS n, AVG(score) AS mean_score, SUM(score) AS total_score
+        FROM {table} GROUP BY gender_inferred''',
+    'by_subreddit_gender': '''
+        SELECT subreddit, gender_inferred, COUNT(*) AS n, AVG(score) AS mean_score, MAX(score) AS max_score
+        FROM {table} GROUP BY subreddit, gender_inferred''',
+    'by_month_gender': '''
+        SELECT created_utc - created_utc % 2592000 AS month, gender_inferred, COUNT(*) AS n, AVG(score) AS mean_score
+        FROM {table} GROUP BY 1, 2''',
+    'distinct_authors': '''
+        SELECT gender_inferred, COUNT(DISTINCT username) AS authors
+        FROM {table} GROUP BY gender_inferred'''
+}
+GENDERS = np.array(['male', 'female', 'anonymous', 'mostly_male', 'mostly_female', 'unknown'], dtype=object)
+
+
+def build_table(db_path: Path, rows: int, chunk_rows: int = 1_000_000, seed: int = 42):
+    """Create (or reuse) a scratch database whose reddit_comments table has the given number of rows"""
+    conn = sqlite3.connect(db_path)
+    try:
+        existing = conn.execute("SELECT COUNT(*) FROM reddit_comments").fetchone()[0]
+        if existing == rows:
+            return
+    except sqlite3.OperationalError:
+        pass
+    conn.execute("DROP TABLE IF EXISTS reddit_comments")
+    conn.execute('''
+        CREATE TABLE reddit_comments (
+            comment_id TEXT PRIMARY KEY, username TEXT, subreddit TEXT,
+            score INTEGER, created_utc INTEGER, gender_inferred TEXT
+        )
+    ''')
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = np.random.default_rng(seed)
+    usernames = make_usernames(rng, max(rows // 20, 100))
+    subreddits = np.array(SUBREDDITS, dtype=object)
+    started = time.perf_counter()
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        columns = [
+            np.char.add('c', np.arange(offset, offset + n).astype(str)).astype(object),
+            usernames[_zipf_choice(rng, len(usernames), n)],
+            subreddits[_zipf_choice(rng, len(subreddits), n)],
+            rng.geometric(0.1, n) - 2,
+            rng.integers(1_230_000_000, 1_720_000_000, n),
+            GENDERS[rng.choice(len(GENDERS), n, p=[0.3, 0.08, 0.5, 0.05, 0.02, 0.05])]
+        ]
+        conn.executemany("INSERT INTO reddit_comments VALUES (?, ?, ?, ?, ?, ?)",
+                         zip(*[column.tolist() for column in columns]))
+        conn.commit()
+    conn.close()
+    print(f"  wrote {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+
+def best_of(runs: int, fn: Callable[[], pd.DataFrame]) -> tuple:
+    """(fastest seconds, result of the last run)"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _canonical(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [str(c) for c in df.columns]
+    keys = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c]) or c == 'month']
+    return df.astype({c: float for c in df.columns if c not in keys}).sort_values(keys).reset_index(drop=True)
+
+
+def run(db_path: Path, rows: int, runs: int, threads: Optional[int]) -> Dict:
+    build_table(db_path, rows)
+    engines = {'sqlite': SQLiteBackend(db_path)}
+    copy_seconds = None
+    try:
+        engines['duckdb_attached'] = DuckDBBackend(db_path, threads=threads)
+        start = time.perf_counter()
+        # The copy is made when the embedded file is missing or older than the SQLite file
+        engines['duckdb_embedded'] = DuckDBBackend(db_path, db_path.with_suffix('.duckdb'), threads=threads)
+        copy_seconds = time.perf_counter() - start
+        print(f"  embedded DuckDB copy ready in {copy_seconds:.1f}s")
+    except ImportError as e:
+        print(f"  duckdb skipped ({e})")
+
+    tables = {'sqlite': 'reddit_comments', 'duckdb_attached': 'collected.reddit_comments',
+              'duckdb_embedded': 'main.reddit_comments'}
+    results = {'rows': rows, 'duckdb_copy_seconds': copy_seconds, 'queries': {}}
+    header = ''.join(f"{name:>18}" for name in engines)
+    print(f"\n  {'query (best of %d, s)' % runs:<28}{header}")
+    for name, sql in GROUPBYS.items():
+        timings, outputs = {}, {}
+        for engine, backend in engines.items():
+            timings[engine], outputs[engine] = best_of(runs, lambda: backend.query(sql.format(table=tables[engine])))
+        reference = _canonical(outputs['sqlite'])
+        for engine, output in outputs.items():
+            pd.testing.assert_frame_equal(_canonical(output), reference, check_dtype=False, rtol=1e-9)
+        results['queries'][name] = timings
+        print(f"  {name:<28}" + ''.join(f"{timings[engine]:>18.3f}" for engine in engines))
+
+    # The whole-table read behind load_platform_data, then the same groupby in pandas
+    timings = {}
+    for engine, backend in engines.items():
+        timings[engine], _ = best_of(1, lambda: backend.read_table('reddit_comments')
+                                     .groupby('gender_inferred')['score'].agg(['count', 'mean']))
+    results['queries']['read_table_pandas_groupby'] = timings
+    print(f"  {'read_table + pandas':<28}" + ''.join(f"{timings[engine]:>18.3f}" for engine in engines))
+
+    for backend in engines.values():
+        backend.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare groupby latency of the SQLite and DuckDB backends")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="Rows in the synthetic comments table")
+    parser.add_argument('--db-path', type=Path, help="Scratch SQLite file, reused across runs (default: a temp dir)")
+    parser.add_argument('--runs', type=int, default=3, help="Runs per query; the fastest counts")
+    parser.add_argument('--threads', type=int, help="DuckDB worker threads (default: all cores)")
+    parser.add_argument('--output', type=Path, help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db_path or Path(tmp) / "groupby.db"
+        print(f"Groupby benchmark on {args.rows:,} rows ({db_path})")
+        results = run(db_path, args.rows, args.runs, args.threads)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
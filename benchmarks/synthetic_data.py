@@ -0,0 +1,160 @@
+"""
+Synthetic social_computing.db corpora for the benchmark suite.
+
+Usernames mix first-name handles, gendered words and random handles, and
+authors, subreddits and languages follow Zipf-like popularity so that
+groupbys and username repetition look like collected data.
+"""
+import sqlite3
+import string
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from data_collector import INSERT_COLUMNS, INSERT_STATEMENTS, create_schema, infer_genders  # noqa: E402
+from text_store import intern_texts  # noqa: E402
+
+import pandas as pd  # noqa: E402
+
+# Corpus sizes by name, counted in Reddit comments (the largest table)
+SIZES = {
+    'small': 10_000,
+    'medium': 1_000_000,
+    'large': 10_000_000
+}
+
+# Rows in every other table, relative to the number of comments
+TABLE_RATIOS = {
+    'reddit_comments': 1.0,
+    'reddit_posts': 0.1,
+    'stackoverflow_users': 0.05,
+    'stackoverflow_questions': 0.1,
+    'github_users': 0.05,
+    'github_repositories': 0.1
+}
+
+FIRST_NAMES = [
+    'sarah', 'emma', 'olivia', 'sophia', 'grace', 'chloe', 'hannah', 'lucy', 'anna', 'claire',
+    'james', 'john', 'robert', 'michael', 'david', 'daniel', 'kevin', 'ryan', 'eric', 'adam',
+    'maria', 'priya', 'wei', 'ahmed', 'fatima', 'olga', 'juan', 'kenji', 'ali', 'sven'
+]
+HANDLE_WORDS = ['dev', 'code', 'hacker', 'ninja', 'byte', 'pixel', 'girl', 'dude', 'guy', 'lady', 'king', 'queen']
+SUBREDDITS = [
+    'programming', 'cscareerquestions', 'learnprogramming', 'technology', 'python', 'javascript',
+    'webdev', 'rust', 'golang', 'java', 'cpp', 'csharp', 'datascience', 'MachineLearning',
+    'devops', 'sysadmin', 'linux', 'ExperiencedDevs', 'womenintech', 'girlsgonewired'
+]
+LANGUAGES = ['Python', 'JavaScript', 'Java', 'C++', 'C#', 'TypeScript', 'Go', 'Rust', 'Ruby', 'PHP', None]
+TAGS = ['python', 'javascript', 'java', 'c++', 'c#', 'pandas', 'reactjs', 'sql', 'django', 'node.js', 'arrays', 'git']
+
+
+def _zipf_choice(rng: np.random.Generator, n_items: int, size: int, a: float = 1.3) -> np.ndarray:
+    """Indices into n_items drawn with Zipf-like popularity"""
+    return (rng.zipf(a, size) - 1) % n_items
+
+
+def make_usernames(rng: np.random.Generator, n: int) -> np.ndarray:
+    """n distinct-ish usernames in a realistic mix of styles"""
+    style = rng.choice(3, size=n, p=[0.45, 0.15, 0.40])
+    names = np.array(FIRST_NAMES, dtype=object)[rng.integers(0, len(FIRST_NAMES), n)]
+    words = np.array(HANDLE_WORDS, dtype=object)[rng.integers(0, len(HANDLE_WORDS), n)]
+    digits = rng.integers(0, 10_000, n).astype(str).astype(object)
+    letters = np.array(list(string.ascii_lowercase), dtype=object)
+    random_handles = letters[rng.integers(0, 26, (n, 8))].sum(axis=1)
+
+    usernames = np.where(style == 0, names + '_' + digits,
+                np.where(style == 1, words + digits, random_handles + digits))
+    usernames[rng.random(n) < 0.03] = 'deleted'
+    return usernames
+
+
+def _random_text(rng: np.random.Generator, n: int, mean_words: int) -> np.ndarray:
+    vocab = np.array(['the', 'code', 'works', 'error', 'python', 'help', 'why', 'does', 'this', 'not',
+                      'thanks', 'great', 'question', 'answer', 'imposter', 'syndrome', 'job', 'team'], dtype=object)
+    lengths = rng.poisson(mean_words, n) + 1
+    return np.array([' '.join(vocab[rng.integers(0, len(vocab), k)]) for k in lengths], dtype=object)
+
+
+def _iso_dates(rng: np.random.Generator, n: int) -> np.ndarray:
+    seconds = rng.integers(1_230_000_000, 1_720_000_000, n)
+    return pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%dT%H:%M:%S').to_numpy(dtype=object)
+
+
+def generate_table(rng: np.random.Generator, table: str, n: int, counts: Dict[str, int],
+                   offset: int, usernames: np.ndarray) -> List[tuple]:
+    """Rows offset..offset+n of a synthetic table, gender_inferred included"""
+    ids = np.arange(offset, offset + n)
+    author = usernames[_zipf_choice(rng, len(usernames), n)]
+
+    if table == 'stackoverflow_users':
+        columns = [ids, author, rng.lognormal(5, 2, n).astype(int), _iso_dates(rng, n), _iso_dates(rng, n),
+                   rng.poisson(3, n), rng.poisson(5, n), rng.poisson(10, n)]
+    elif table == 'stackoverflow_questions':
+        tag_names = np.array(TAGS, dtype=object)
+        first = rng.integers(0, len(TAGS), n)
+        second = (first + 1 + rng.integers(0, len(TAGS) - 1, n)) % len(TAGS)
+        tags = np.where(rng.random(n) < 0.5, tag_names[first], tag_names[first] + ',' + tag_names[second])
+        columns = [ids, rng.integers(0, max(counts['stackoverflow_users'], 1), n), _random_text(rng, n, 8), tags,
+                   rng.geometric(0.2, n) - 3, rng.lognormal(6, 1.5, n).astype(int), rng.poisson(2, n), _iso_dates(rng, n)]
+    elif table == 'github_users':
+        columns = [ids, author, rng.poisson(20, n), rng.lognormal(3, 2, n).astype(int), rng.poisson(15, n),
+                   _iso_dates(rng, n), _iso_dates(rng, n), np.full(n, None), np.full(n, None)]
+    elif table == 'github_repositories':
+        languages = np.array(LANGUAGES, dtype=object)[_zipf_choice(rng, len(LANGUAGES), n)]
+        names = np.char.add('repo', ids.astype(str)).astype(object)
+        columns = [ids, rng.integers(0, max(counts['github_users'], 1), n), names, np.full(n, None), languages,
+                   rng.lognormal(4, 2, n).astype(int), rng.lognormal(2, 2, n).astype(int), _iso_dates(rng, n), _iso_dates(rng, n)]
+    elif table == 'reddit_posts':
+        subreddits = np.array(SUBREDDITS, dtype=object)[_zipf_choice(rng, len(SUBREDDITS), n)]
+        selftext = _random_text(rng, n, 60)
+        columns = [np.char.add('p', ids.astype(str)).astype(object), author, subreddits, _random_text(rng, n, 10),
+                   selftext, [len(text) for text in selftext], rng.geometric(0.05, n) - 1, rng.poisson(12, n),
+                   rng.integers(1_230_000_000, 1_720_000_000, n)]
+    elif table == 'reddit_comments':
+        post_ids = np.char.add('p', rng.integers(0, max(counts['reddit_posts'], 1), n).astype(str)).astype(object)
+        subreddits = np.array(SUBREDDITS, dtype=object)[_zipf_choice(rng, len(SUBREDDITS), n)]
+        body = _random_text(rng, n, 25)
+        columns = [np.char.add('c', ids.astype(str)).astype(object), post_ids, author, subreddits,
+                   body, [len(text) for text in body], rng.geometric(0.1, n) - 2,
+                   rng.integers(1_230_000_000, 1_720_000_000, n)]
+    else:
+        raise ValueError(f"Unknown table {table}")
+
+    columns.append(infer_genders(pd.Series(author, dtype=object)))
+    return list(zip(*[c.tolist() if isinstance(c, np.ndarray) else c for c in columns]))
+
+
+def iter_corpus(size: str, seed: int = 42, chunk_rows: int = 250_000) -> Iterator[tuple]:
+    """Yield (table, rows) chunks of a synthetic corpus of the named size"""
+    rng = np.random.default_rng(seed)
+    base = SIZES[size]
+    counts = {table: max(int(base * ratio), 1) for table, ratio in TABLE_RATIOS.items()}
+    usernames = make_usernames(rng, max(base // 20, 100))
+
+    for table, total in counts.items():
+        for offset in range(0, total, chunk_rows):
+            n = min(chunk_rows, total - offset)
+            yield table, generate_table(rng, table, n, counts, offset, usernames)
+
+
+def generate_corpus(db_path: str, size: str, seed: int = 42) -> Dict[str, int]:
+    """Create a fresh synthetic database; returns rows written per table"""
+    path = Path(db_path)
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    written = {}
+    for table, rows in iter_corpus(size, seed):
+        conn.executemany(INSERT_STATEMENTS[table], intern_texts(conn, table, INSERT_COLUMNS[table], rows))
+        conn.commit()
+        written[table] = written.get(table, 0) + len(rows)
+    conn.close()
+    return written
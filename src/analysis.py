@@ -2,115 +2,130 @@ import pandas as pd
 import numpy as np
 import sqlite3
 from typing import Dict, List, Tuple
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-import plotly.express as px
-import gender_guesser.detector as gender
+import argparse
+import logging
+import time
+import tracing
+from structured_logging import configure_logging
+from profiling import profile_call
+import quantile_sketch
+import time_series
+import question_tags
+import identity_linking
+import text_tone
+import text_search
+from text_store import require_converted, with_lengths
+from olap_cube import OlapCube, build_cube, ensure_cube, stale_sources
+from resampling import gender_uncertainty
+from storage import open_backend
 
+logger = logging.getLogger(__name__)
+
+# infer_gender_enhanced runs once per username; a span per call would swamp the trace
+@tracing.trace_methods(exclude=('infer_gender_enhanced',))
 class SocialComputingAnalysis:
     """
     Class to perform analysis on gender disparity in tech communities
     using traces of online engagement
     """
-    def __init__(self, db_path: str = "data/social_computing.db", output_dir: str = "visualizations"):
+    def __init__(self, db_path: str = "data/social_computing.db", output_dir: str = "visualizations",
+                 n_resamples: int = 1000, seed: int = 42, resampling_workers: int = 1,
+                 backend: str = 'sqlite', backend_options: Dict = None):
         self.db_path = Path(db_path)
+        # Engine that load_platform_data reads the base tables with; the derived
+        # tables (sketches, rollups, indexes, cube) are always read from SQLite
+        self.storage = open_backend(backend, self.db_path, **(backend_options or {}))
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.detector = gender.Detector()
-        
+        self._detector = None
+        # Bootstrap/permutation settings for the uncertainty estimates in the engagement analyses;
+        # 1000 resamples keep every report and dashboard path quick, pass more for publication intervals
+        self.n_resamples = n_resamples
+        self.seed = seed
+        self.resampling_workers = resampling_workers
+        # Summary of the most recent load_platform_data call per platform
+        self.load_metrics: Dict[str, Dict] = {}
+        
+    @property
+    def detector(self):
+        """gender_guesser detector, built on first use since loading its name list takes a while"""
+        if self._detector is None:
+            import gender_guesser.detector as gender
+            self._detector = gender.Detector()
+        return self._detector
+    
     def load_platform_data(self, platform: str) -> Dict[str, pd.DataFrame]:
         """Load data from SQLite database for a specific platform"""
-        print("Requested platform:", platform)
-        print("Platform type:", type(platform))
-        print("Platform comparison with 'reddit':", platform == "reddit")
+        started = time.perf_counter()
+        logger.debug("Loading %s data", platform)
+        debug = logger.isEnabledFor(logging.DEBUG)
         
-        conn = sqlite3.connect(self.db_path)
         if platform == "stackoverflow":
-            print("Loading Stack Overflow data...")
-            users_df = pd.read_sql_query("SELECT * FROM stackoverflow_users", conn)
+            users_df = self.storage.read_table("stackoverflow_users")
             users_df['gender_inferred'] = users_df['gender_inferred'].replace('unknown', 'anonymous')
-            questions_df = pd.read_sql_query("SELECT * FROM stackoverflow_questions", conn)
+            questions_df = self.storage.read_table("stackoverflow_questions")
             questions_df['gender_inferred'] = questions_df['gender_inferred'].replace('unknown', 'anonymous')
 
-            # Compute question_count and answer_count for each user
-            print("Computing question_count and answer_count for each user...")
-            question_counts = questions_df.groupby('user_id').size().to_frame('question_count')
-            print(f"Question counts shape: {question_counts.shape}")
-            print(f"Question counts head: {question_counts.head()}")
-            
-            # Note: answer_count cannot be computed from current data structure
-            # as we don't have answer_user_id column
-            answer_counts = pd.DataFrame({'answer_count': 0}, index=question_counts.index)
-            print(f"Answer counts shape: {answer_counts.shape}")
-            
-            # Check if columns already exist in users_df
-            print(f"Users_df shape before merge: {users_df.shape}")
-            print(f"Users_df columns before merge: {list(users_df.columns)}")
-            
-            # If question_count already exists, update it; otherwise add it
-            if 'question_count' in users_df.columns:
-                print("question_count column already exists, updating values...")
-                # Create a mapping from user_id to question_count
-                question_map = question_counts['question_count'].to_dict()
-                users_df['question_count'] = users_df['user_id'].map(question_map).fillna(0).astype(int)
-            else:
-                print("Adding question_count column...")
-                users_df = users_df.merge(question_counts, how='left', left_on='user_id', right_index=True)
-                users_df['question_count'] = users_df['question_count'].fillna(0).astype(int)
+            # Per-user question and answer counts as grouped aggregates over the
+            # user_id indexes, rather than grouping the loaded frames in pandas
+            has_answers = self.storage.has_table("stackoverflow_answers")
+            counts_sql = f"""
+                SELECT user_id, COUNT(*) AS question_count, 0 AS answer_count
+                FROM {self.storage.qualified('stackoverflow_questions')}
+                WHERE user_id IS NOT NULL GROUP BY user_id"""
+            if has_answers:
+                counts_sql = f"""
+                    SELECT user_id, SUM(question_count) AS question_count, SUM(answer_count) AS answer_count
+                    FROM ({counts_sql}
+                          UNION ALL
+                          SELECT user_id, 0, COUNT(*) FROM {self.storage.qualified('stackoverflow_answers')}
+                          WHERE user_id IS NOT NULL GROUP BY user_id) AS counts
+                    GROUP BY user_id"""
+            counts = self.storage.query(counts_sql).set_index('user_id')
+            if debug:
+                logger.debug("Activity counts shape %s, head:\n%s", counts.shape, counts.head())
+            for column in ('question_count', 'answer_count'):
+                users_df[column] = users_df['user_id'].map(counts[column]).fillna(0).astype(int)
             
-            # If answer_count already exists, update it; otherwise add it
-            if 'answer_count' in users_df.columns:
-                print("answer_count column already exists, setting to 0...")
-                users_df['answer_count'] = 0
-            else:
-                print("Adding answer_count column...")
-                users_df = users_df.merge(answer_counts, how='left', left_on='user_id', right_index=True)
-                users_df['answer_count'] = users_df['answer_count'].fillna(0).astype(int)
-            
-            print(f"Final users_df columns: {list(users_df.columns)}")
-            print(f"Question count sample: {users_df['question_count'].head()}")
-            print(f"Answer count sample: {users_df['answer_count'].head()}")
+            if debug:
+                logger.debug("Users columns after counts: %s, counts head:\n%s",
+                             list(users_df.columns), users_df[['question_count', 'answer_count']].head())
 
             result = {"users": users_df, "questions": questions_df}
-            print("Stack Overflow result keys:", list(result.keys()))
-            conn.close()
-            return result
+            if has_answers:
+                answers_df = self.storage.read_table("stackoverflow_answers")
+                answers_df['gender_inferred'] = answers_df['gender_inferred'].replace('unknown', 'anonymous')
+                result["answers"] = answers_df
         elif platform == "github":
-            print("Loading GitHub data...")
-            users_df = pd.read_sql_query("SELECT * FROM github_users", conn)
+            users_df = self.storage.read_table("github_users")
             users_df['gender_inferred'] = users_df['gender_inferred'].replace('unknown', 'anonymous')
-            repos_df = pd.read_sql_query("SELECT * FROM github_repositories", conn)
+            repos_df = self.storage.read_table("github_repositories")
             repos_df['gender_inferred'] = repos_df['gender_inferred'].replace('unknown', 'anonymous')
             result = {"users": users_df, "repositories": repos_df}
-            print("GitHub result keys:", list(result.keys()))
-            conn.close()
-            return result
         elif platform == "reddit":
-            print("Loading Reddit data...")
-            posts_df = pd.read_sql_query("SELECT * FROM reddit_posts", conn)
+            # Databases not yet moved to the text store have the text instead of its length
+            posts_df = with_lengths("reddit_posts", self.storage.read_table("reddit_posts"))
             posts_df['gender_inferred'] = posts_df['gender_inferred'].replace('unknown', 'anonymous')
             
             # Load comments if they exist
             try:
-                comments_df = pd.read_sql_query("SELECT * FROM reddit_comments", conn)
+                comments_df = with_lengths("reddit_comments", self.storage.read_table("reddit_comments"))
                 comments_df['gender_inferred'] = comments_df['gender_inferred'].replace('unknown', 'anonymous')
                 result = {"posts": posts_df, "comments": comments_df}
-                print("Reddit result keys:", list(result.keys()))
-                print("Reddit posts shape:", posts_df.shape)
-                print("Reddit comments shape:", comments_df.shape)
             except Exception as e:
-                print(f"No comments table found: {e}")
+                logger.info("No comments table found: %s", e)
                 result = {"posts": posts_df}
-                print("Reddit result keys:", list(result.keys()))
-                print("Reddit posts shape:", posts_df.shape)
-            
-            conn.close()
-            return result
         else:
-            print(f"Unknown platform: '{platform}'")
-            conn.close()
+            logger.warning("Unknown platform: %r", platform)
             return {}
+        
+        metrics = {'platform': platform, 'backend': self.storage.name,
+                   'seconds': round(time.perf_counter() - started, 4)}
+        metrics.update({f"{name}_rows": len(df) for name, df in result.items()})
+        self.load_metrics[platform] = metrics
+        logger.info("Loaded %s data", platform, extra={'metrics': metrics})
+        return result
     
     def infer_gender_enhanced(self, username: str) -> str:
         """
@@ -206,7 +221,7 @@ class SocialComputingAnalysis:
         score_by_gender = df_filtered.groupby('gender_inferred')['score'].mean()
         
         # Comment length analysis
-        df_filtered['comment_length'] = df_filtered['body'].str.len()
+        df_filtered['comment_length'] = df_filtered['body_length']
         length_by_gender = df_filtered.groupby('gender_inferred')['comment_length'].mean()
         
         return {
@@ -248,7 +263,7 @@ class SocialComputingAnalysis:
         """
         Update all tables with enhanced gender inference
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._write_connection()
         
         # Update Reddit posts
         posts_df = pd.read_sql_query("SELECT * FROM reddit_posts", conn)
@@ -299,10 +314,244 @@ class SocialComputingAnalysis:
         except Exception as e:
             print(f"Error updating GitHub users: {e}")
         
+        # Sketches and cube cells are keyed by gender, so they have to follow the new labels
+        quantile_sketch.rebuild_sketches(conn)
+        build_cube(conn)
         conn.commit()
         conn.close()
         print("✅ Enhanced gender inference applied to all tables")
     
+    def _write_connection(self) -> sqlite3.Connection:
+        """
+        Connection for building derived tables. Their builders read text
+        lengths and the text views, so a database collected before the text
+        store has to be converted with text_store.py first
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            require_converted(conn)
+        except RuntimeError:
+            conn.close()
+            raise
+        return conn
+    
+    def build_sketches(self) -> List[str]:
+        """Rebuild the quantile sketches of tables re-collected since their last build; returns those tables"""
+        conn = self._write_connection()
+        try:
+            rebuilt = quantile_sketch.ensure_sketches(conn)
+            conn.commit()
+            return rebuilt
+        finally:
+            conn.close()
+    
+    def sketch_summary(self, table: str, metric: str, by_group: bool = False) -> pd.DataFrame:
+        """
+        Count, mean, std, min, quartiles and max of a metric per gender (and per
+        subreddit or language when by_group) from the stored quantile sketches;
+        empty until the sketches are built
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return quantile_sketch.sketch_summary(conn, table, metric, by_group)
+        except pd.errors.DatabaseError as e:
+            if 'no such table' not in str(e):
+                raise
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    
+    def sketch_quartiles(self, table: str, metric: str, groups: List[str] = None) -> Dict[str, Dict]:
+        """Box-plot quartiles per gender, merged across the given groups (all groups if None)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            genders = [row[0] for row in conn.execute(
+                "SELECT DISTINCT gender FROM quantile_sketches WHERE source = ? AND metric = ?", (table, metric)
+            )]
+            result = {}
+            for gender in genders:
+                sketch = quantile_sketch.merged_sketch(conn, table, metric, gender, groups)
+                if sketch.n:
+                    minimum, q1, median, q3, maximum = sketch.quantiles([0, 0.25, 0.5, 0.75, 1])
+                    result[gender] = {'count': sketch.n, 'min': minimum, 'q1': q1,
+                                      'median': median, 'q3': q3, 'max': maximum}
+            return result
+        except sqlite3.OperationalError:
+            # Sketches not built yet
+            return {}
+        finally:
+            conn.close()
+    
+    def sketch_gender_summary(self, table: str, columns: List[str]):
+        """Mean/median/std table per gender from sketches, or None if a column is not sketched"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return quantile_sketch.gender_summary_from_sketches(conn, table, columns)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            # Databases created before the sketch table existed
+            return None
+        finally:
+            conn.close()
+    
+    def activity_trend(self, table: str, bucket: str = 'week', start: str = None, end: str = None,
+                       rolling: int = None) -> pd.DataFrame:
+        """Items per day, week or month and gender from the activity rollups; empty until they are built"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return time_series.activity_trend(conn, table, bucket, start, end, rolling)
+        except pd.errors.DatabaseError as e:
+            if 'no such table' not in str(e):
+                raise
+            return pd.DataFrame(columns=['period', 'gender', 'count', 'value_sum', 'mean_value', 'share'])
+        finally:
+            conn.close()
+    
+    def build_rollups(self):
+        """Create the activity rollups and their triggers for a database collected before they existed"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            time_series.create_rollups(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def tag_gender_breakdown(self, tags: List[str] = None, min_questions: int = 1) -> pd.DataFrame:
+        """Per-tag question counts, gender shares and score stats from the tag index; empty until it is built"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return question_tags.tag_gender_breakdown(conn, tags, min_questions)
+        except pd.errors.DatabaseError as e:
+            if 'no such table' not in str(e):
+                raise
+            return pd.DataFrame(columns=['tag', 'gender', 'questions', 'share', 'tag_questions',
+                                         'mean_score', 'std_score', 'mean_views', 'mean_answers'])
+        finally:
+            conn.close()
+    
+    def build_tag_index(self):
+        """Create the tag index and its triggers for a database collected before it existed"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            question_tags.create_tag_index(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def interaction_graph(self):
+        """Reddit commenter-to-post-author graph as an interaction_graph.InteractionGraph"""
+        # scipy.sparse is only needed here
+        from interaction_graph import InteractionGraph
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return InteractionGraph.from_db(conn)
+        finally:
+            conn.close()
+    
+    def analyze_interaction_graph(self) -> Dict:
+        """Gender assortativity, degree distributions and reply-score asymmetry of Reddit replies"""
+        graph = self.interaction_graph()
+        if graph.num_edges == 0:
+            return {}
+        return graph.summary()
+    
+    def link_identities(self, min_similarity: float = 0.5) -> pd.DataFrame:
+        """Propose cross-platform account links from username similarity and store them in identity_links"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            links = identity_linking.link_accounts(identity_linking.load_accounts(conn), min_similarity)
+            identity_linking.store_links(conn, links)
+            conn.commit()
+            return links
+        finally:
+            conn.close()
+    
+    def identity_links(self) -> pd.DataFrame:
+        """The account links stored by the last link_identities() run"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return identity_linking.load_links(conn)
+        finally:
+            conn.close()
+    
+    def score_text_tone(self, workers: int = 1) -> Dict[str, int]:
+        """Score sentiment and politeness of Reddit posts and comments not scored yet"""
+        conn = self._write_connection()
+        try:
+            return text_tone.score_new_rows(conn, workers=workers)
+        finally:
+            conn.close()
+    
+    def tone_by_gender(self, table: str = 'reddit_comments') -> pd.DataFrame:
+        """Per-gender sentiment, politeness and toxicity from the stored scores (empty before the first scoring)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return text_tone.tone_by_gender(conn, table)
+        except pd.errors.DatabaseError as e:
+            if 'no such table' not in str(e):
+                raise
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    
+    def search_text(self, query: str, tables: List[str] = None, limit: int = 20) -> Dict[str, Dict]:
+        """Full-text search of question titles, posts and comments with hit counts by gender"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return text_search.search(conn, query, tables, limit)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+            if 'no such table' not in str(e):
+                raise
+            raise RuntimeError("The search index has not been built; run `python src/analysis.py --build-search-index`") from e
+        finally:
+            conn.close()
+    
+    def build_search_index(self):
+        """Create the full-text indexes and their triggers for a database collected before they existed"""
+        conn = self._write_connection()
+        try:
+            text_search.create_search_index(conn)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def build_cube(self) -> List[str]:
+        """Rebuild the aggregate cube for tables written since it was built; returns those tables"""
+        conn = self._write_connection()
+        try:
+            rebuilt = ensure_cube(conn)
+            conn.commit()
+            return rebuilt
+        finally:
+            conn.close()
+    
+    def olap_cube(self) -> OlapCube:
+        """The aggregate cube for filtered breakdowns as last built (no cells before the first build)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return OlapCube.load(conn)
+        except pd.errors.DatabaseError as e:
+            if 'no such table' not in str(e):
+                raise
+            return OlapCube(pd.DataFrame(columns=['source', 'metric']))
+        finally:
+            conn.close()
+    
+    def stale_cube_sources(self) -> List[str]:
+        """Tables written since the cube was built from them"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return stale_sources(conn)
+        except sqlite3.OperationalError:
+            # Cube never built
+            return []
+        finally:
+            conn.close()
+    
+    def _uncertainty(self, df: pd.DataFrame, value_columns: List[str]) -> Dict:
+        """Bootstrap CIs for gender shares and per-gender means, with female-vs-male permutation tests"""
+        return gender_uncertainty(df, value_columns, n_resamples=self.n_resamples,
+                                  seed=self.seed, workers=self.resampling_workers)
+    
     def analyze_engagement_patterns(self, platform: str) -> Dict:
         """Analyze engagement patterns by gender across platforms"""
         data = self.load_platform_data(platform)
@@ -341,10 +590,23 @@ class SocialComputingAnalysis:
             'badge_count': ['mean', 'median', 'std']
         }).round(2)
         
-        return {
+        result = {
             'gender_distribution': gender_dist.to_dict(),
-            'user_activity': activity_by_gender.to_dict()
+            'user_activity': activity_by_gender.to_dict(),
+            'uncertainty': self._uncertainty(users_df, ['reputation', 'question_count'])
         }
+        
+        # Answer score and acceptance by the gender of the answering user
+        answers_df = data.get("answers")
+        if answers_df is not None and not answers_df.empty:
+            answers_df['gender_inferred'] = answers_df['user_id'].map(
+                users_df.set_index('user_id')['gender_inferred']).fillna(answers_df['gender_inferred'])
+            result['answer_quality'] = answers_df.groupby('gender_inferred').agg(
+                answers=('answer_id', 'count'),
+                mean_score=('score', 'mean'),
+                acceptance_rate=('is_accepted', 'mean')
+            ).round(3).to_dict()
+        return result
     
     def _analyze_github_engagement(self, data: Dict) -> Dict:
         """Analyze GitHub engagement patterns using enhanced gender analysis"""
@@ -378,11 +640,16 @@ class SocialComputingAnalysis:
             # Language trends by gender
             language_gender = repos_df.groupby(['language', 'gender_inferred']).size().unstack(fill_value=0).to_dict()
         
+        uncertainty = self._uncertainty(users_df, ['followers'])
+        if not repos_df.empty:
+            uncertainty['stars'] = self._uncertainty(repos_df.dropna(subset=['gender_inferred']), ['stars'])['stars']
+        
         return {
             'gender_distribution': gender_dist.to_dict(),
             'user_activity': user_activity.to_dict(),
             'repo_stars': repo_stars,
-            'language_gender': language_gender
+            'language_gender': language_gender,
+            'uncertainty': uncertainty
         }
     
     def _analyze_reddit_engagement(self, data: Dict) -> Dict:
@@ -405,7 +672,8 @@ class SocialComputingAnalysis:
         
         result = {
             'gender_distribution': posts_df['gender_inferred'].value_counts(normalize=True).to_dict(),
-            'post_analysis': post_analysis
+            'post_analysis': post_analysis,
+            'uncertainty': self._uncertainty(posts_df, ['score', 'num_comments'])
         }
         
         # Add comment analysis if available
@@ -425,7 +693,8 @@ class SocialComputingAnalysis:
             
             result.update({
                 'comment_analysis': comment_analysis,
-                'comment_gender_distribution': comments_df['gender_inferred'].value_counts(normalize=True).to_dict()
+                'comment_gender_distribution': comments_df['gender_inferred'].value_counts(normalize=True).to_dict(),
+                'comment_uncertainty': self._uncertainty(comments_df, ['score'])
             })
         
         return result
@@ -443,6 +712,7 @@ class SocialComputingAnalysis:
     
     def _create_stackoverflow_visualizations(self, data: Dict):
         """Create Stack Overflow visualizations"""
+        import plotly.express as px
         users_df = data["users"]
         
         # Gender distribution pie chart
@@ -464,6 +734,7 @@ class SocialComputingAnalysis:
     
     def _create_github_visualizations(self, data: Dict):
         """Create GitHub visualizations"""
+        import plotly.express as px
         users_df = data["users"]
         repos_df = data["repositories"]
         
@@ -486,6 +757,7 @@ class SocialComputingAnalysis:
     
     def _create_reddit_visualizations(self, data: Dict):
         """Create Reddit visualizations"""
+        import plotly.express as px
         posts_df = data["posts"]
         
         # Gender distribution
@@ -555,7 +827,7 @@ class SocialComputingAnalysis:
                 # Add comment analysis for Reddit
                 if "comments" in data and not data["comments"].empty:
                     comments_df = data["comments"]
-                    comments_df['comment_length'] = comments_df['body'].str.len()
+                    comments_df['comment_length'] = comments_df['body_length']
                     
                     comment_analysis = {
                         'total_comments': len(comments_df),
@@ -566,9 +838,19 @@ class SocialComputingAnalysis:
                         'subreddit_activity': comments_df.groupby(['subreddit', 'gender_inferred']).size().unstack(fill_value=0).to_dict()
                     }
                     analysis['comment_analysis'] = comment_analysis
+                    analysis['interaction_graph'] = self.analyze_interaction_graph()
+                
+                # Tone of posts and comments as of the last score_text_tone() run
+                analysis['tone'] = {
+                    'posts': self.tone_by_gender('reddit_posts').to_dict(orient='index'),
+                    'comments': self.tone_by_gender('reddit_comments').to_dict(orient='index')
+                }
             
             report[platform] = analysis
         
+        # People who appear to use the same handle on several platforms, as of the last link_identities() run
+        report['identity_links'] = identity_linking.links_summary(self.identity_links())
+        
         # Cross-platform comparison
         platform_comparison = {}
         for platform, data in report.items():
@@ -594,12 +876,81 @@ class SocialComputingAnalysis:
         
         return report
 
-def main():
+def main(argv: List[str] = None):
     """Main function to run analysis"""
-    analyzer = SocialComputingAnalysis()
+    parser = argparse.ArgumentParser(description="Analyze gender disparity in the collected engagement traces")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to read")
+    parser.add_argument('--output-dir', default="visualizations", help="Directory for the generated charts")
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'duckdb'],
+                        help="Engine that reads the collected tables for the engagement analyses")
+    parser.add_argument('--duckdb-path', help="With --backend duckdb, keep an embedded DuckDB copy of the tables in this file")
+    parser.add_argument('--resamples', type=int, default=1000,
+                        help="Bootstrap and permutation resamples behind the confidence intervals and p-values")
+    parser.add_argument('--link-identities', action='store_true',
+                        help="Re-link accounts across platforms by username before reporting (stored in identity_links)")
+    parser.add_argument('--score-tone', action='store_true',
+                        help="Score the tone of Reddit posts and comments added since the last scoring before reporting")
+    parser.add_argument('--build-sketches', action='store_true',
+                        help="Rebuild the quantile sketches of tables written since their last build (the collector keeps them current)")
+    parser.add_argument('--build-rollups', action='store_true',
+                        help="Create the activity rollups behind the trend charts on a database collected before they existed")
+    parser.add_argument('--build-tag-index', action='store_true',
+                        help="Create the exploded tag index behind the per-tag breakdowns on a database collected before it existed")
+    parser.add_argument('--build-search-index', action='store_true',
+                        help="Create the full-text search indexes on a database collected before they existed")
+    parser.add_argument('--build-cube', action='store_true',
+                        help="Rebuild the aggregate cube for tables that changed, for the dashboard and the API's /cube")
+    parser.add_argument('--trace', help="Record a trace of analysis calls to this file (Chrome trace format; .spans.json for plain JSON)")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG adds per-step load diagnostics")
+    parser.add_argument('--log-json', action='store_true', help="Log one JSON object per line")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile report generation and write hotspot, allocation and collapsed-stack reports to the output directory")
+    args = parser.parse_args(argv)
+    
+    configure_logging(args.log_level, args.log_json)
+    if args.trace:
+        tracing.trace_to(args.trace)
+    
+    backend_options = {'duckdb_path': args.duckdb_path} if args.backend == 'duckdb' and args.duckdb_path else {}
+    analyzer = SocialComputingAnalysis(db_path=args.db_path, output_dir=args.output_dir, n_resamples=args.resamples,
+                                       backend=args.backend, backend_options=backend_options)
+    
+    if args.link_identities:
+        links = analyzer.link_identities()
+        print(f"Linked {len(links)} account pairs across platforms")
+    
+    if args.score_tone:
+        scored = analyzer.score_text_tone()
+        print(f"Scored text tone: {scored}")
+    
+    if args.build_sketches:
+        rebuilt = analyzer.build_sketches()
+        print(f"Rebuilt quantile sketches: {rebuilt or 'none were stale'}")
+    
+    if args.build_rollups:
+        analyzer.build_rollups()
+        print("Activity rollups are in place")
+    
+    if args.build_tag_index:
+        analyzer.build_tag_index()
+        print("Tag index is in place")
+    
+    if args.build_search_index:
+        analyzer.build_search_index()
+        print("Search index is in place")
+    
+    if args.build_cube:
+        rebuilt = analyzer.build_cube()
+        print(f"Rebuilt the aggregate cube for: {rebuilt or 'no table, it was up to date'}")
     
     print("Generating analysis report...")
-    report = analyzer.generate_report()
+    if args.profile:
+        report, profiler, paths = profile_call(analyzer.generate_report, output_dir=args.output_dir)
+        print(f"Profiled report generation ({profiler.elapsed:.2f}s under the profiler):")
+        for kind, path in paths.items():
+            print(f"  {kind}: {path}")
+    else:
+        report = analyzer.generate_report()
     
     print("\n=== KEY FINDINGS ===")
     for platform, data in report.items():
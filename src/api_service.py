@@ -0,0 +1,405 @@
+"""
+Local read-only JSON API over the collection database.
+
+    python src/api_service.py --port 8765
+    curl localhost:8765/summary
+    curl 'localhost:8765/trend/reddit_posts?bucket=month'
+    curl 'localhost:8765/cube/reddit_comments/score?by=dimension&top=10'
+
+Dashboards and notebooks on the same machine can share one computation
+instead of each reloading the tables. Responses are cached in memory per
+data version (see data_summary.data_version): a write to the database by
+any process drops the cache, and concurrent requests for the same
+resource wait for a single computation. Every response carries an ETag
+derived from the data version and the request, so a conditional request
+(If-None-Match) is answered with 304 without computing anything.
+
+Requests run on threads of a ThreadingHTTPServer. The aggregate
+endpoints borrow connections from a pool opened with mode=ro, so they
+cannot write to the database; the engagement reports come from
+SocialComputingAnalysis, which only reads. Derived tables (rollups, tag
+index, cube, tone scores) are read as stored; endpoints whose table has
+not been built yet return 404.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import math
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import quantile_sketch
+import question_tags
+import text_search
+import text_tone
+import time_series
+from data_summary import data_version, summarize
+from olap_cube import OlapCube, stale_sources
+from structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ['stackoverflow', 'github', 'reddit']
+# Computed in the background at startup and after each data change when warming is on
+WARM_PATHS = ['/summary'] + [f'/engagement/{platform}' for platform in PLATFORMS]
+
+
+class ApiError(Exception):
+    """An error reported to the client with an HTTP status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadOnlyPool:
+    """Fixed set of read-only SQLite connections shared by the request threads"""
+
+    def __init__(self, db_path: Path, size: int = 4):
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"Database {db_path} does not exist")
+        self._connections = queue.Queue()
+        for _ in range(size):
+            conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True, check_same_thread=False)
+            self._connections.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            # Do not hand a connection with an open read transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+            self._connections.put(conn)
+
+    def close(self):
+        for _ in range(self.size):
+            self._connections.get().close()
+
+
+class VersionedCache:
+    """
+    Encoded responses for one data version. Computations are single-flight:
+    a second request for a key being computed waits for the first.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._entries: Dict[str, bytes] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self, version: Tuple):
+        """Drop every entry when the data version moved; the caller holds _lock"""
+        if version != self.version:
+            self.version = version
+            self._entries.clear()
+            self._key_locks.clear()
+
+    def get_or_compute(self, version: Tuple, key: str, compute: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            self._sync(version)
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if self.version == version and key in self._entries:
+                    self.hits += 1
+                    return self._entries[key]
+                self.misses += 1
+            body = compute()
+            with self._lock:
+                if self.version == version:
+                    self._entries[key] = body
+            return body
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def to_jsonable(value: Any) -> Any:
+    """Plain JSON types for DataFrames, Series, numpy scalars, NaN and tuple keys"""
+    if isinstance(value, pd.DataFrame):
+        if not isinstance(value.index, pd.RangeIndex):
+            value = value.reset_index()
+        value = value.set_axis(['.'.join(map(str, c)) if isinstance(c, tuple) else str(c) for c in value.columns], axis=1)
+        return [to_jsonable(record) for record in value.to_dict('records')]
+    if isinstance(value, pd.Series):
+        return to_jsonable(value.to_dict())
+    if isinstance(value, dict):
+        return {('.'.join(map(str, k)) if isinstance(k, tuple) else str(k)): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return [to_jsonable(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _param(params: Dict[str, List[str]], name: str, cast: Callable = str, default: Any = None) -> Any:
+    if name not in params:
+        return default
+    try:
+        return cast(params[name][-1])
+    except ValueError:
+        raise ApiError(400, f"Invalid value for {name}: {params[name][-1]!r}")
+
+
+def _list(params: Dict[str, List[str]], name: str) -> Optional[List[str]]:
+    values = [item for value in params.get(name, []) for item in value.split(',') if item]
+    return values or None
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class AggregateService:
+    """Routes API paths to the aggregate queries and caches their JSON per data version"""
+
+    def __init__(self, db_path: str = "data/social_computing.db", pool_size: int = 4, warm: bool = True):
+        self.db_path = Path(db_path)
+        self.pool = ReadOnlyPool(self.db_path, pool_size)
+        self.cache = VersionedCache()
+        self.warm_on_change = warm
+        self._warmed_version = None
+        self._analysis = None
+        self._analysis_lock = threading.Lock()
+        self.routes: Dict[str, Callable] = {
+            'health': self.health,
+            'summary': self.summary,
+            'engagement': self.engagement,
+            'trend': self.trend,
+            'tags': self.tags,
+            'tone': self.tone,
+            'search': self.search,
+            'sketch': self.sketch,
+            'cube': self.cube
+        }
+
+    def etag(self, version: Tuple, path: str, query: str) -> str:
+        canonical = json.dumps([version, path, sorted(parse_qs(query).items())])
+        return '"{}"'.format(hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32])
+
+    def handle(self, path: str, query: str) -> Tuple[str, Callable[[], bytes]]:
+        """(etag, function producing the encoded body) of a request; the body is cached per data version"""
+        parts = [part for part in path.split('/') if part]
+        if not parts or parts[0] not in self.routes:
+            raise ApiError(404, f"Unknown endpoint {path!r}; endpoints: {', '.join(sorted(self.routes))}")
+        route = self.routes[parts[0]]
+        params = parse_qs(query)
+        try:
+            inspect.signature(route).bind(*parts[1:], params=params)
+        except TypeError:
+            raise ApiError(404, f"Wrong number of path segments for /{parts[0]}")
+        version = data_version(self.db_path)
+        if self.warm_on_change and version != self._warmed_version:
+            self.warm(version)
+
+        def body() -> bytes:
+            if route == self.health:
+                return json.dumps(self.health()).encode('utf-8')
+            key = f"{path}?{query}"
+            return self.cache.get_or_compute(version, key, lambda: self._encode(route, parts[1:], params))
+        return self.etag(version, path, query), body
+
+    def _encode(self, route: Callable, args: List[str], params: Dict[str, List[str]]) -> bytes:
+        started = time.perf_counter()
+        try:
+            result = route(*args, params=params)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+            # pandas re-raises SQLite errors from read_sql_query as its own DatabaseError
+            if 'no such table' in str(e):
+                raise ApiError(404, f"Not built in this database yet: {e.__cause__ or e}")
+            raise
+        logger.info("Computed %s", route.__name__,
+                    extra={'metrics': {'endpoint': route.__name__, 'seconds': round(time.perf_counter() - started, 4)}})
+        return json.dumps(to_jsonable(result)).encode('utf-8')
+
+    def warm(self, version: Tuple):
+        """Compute the WARM_PATHS for a data version in a background thread"""
+        self._warmed_version = version
+
+        def run():
+            for path in WARM_PATHS:
+                if data_version(self.db_path) != version:
+                    return
+                try:
+                    self.handle(path, '')[1]()
+                except Exception:
+                    logger.exception("Warming %s failed", path)
+        threading.Thread(target=run, name='api-warm', daemon=True).start()
+
+    # Endpoints; path segments arrive as positional arguments and the query string as params
+
+    def health(self, params: Dict = None) -> Dict:
+        return {'status': 'ok', 'data_version': list(data_version(self.db_path)), 'cache': self.cache.stats()}
+
+    def summary(self, params: Dict) -> Dict:
+        with self.pool.connection() as conn:
+            return summarize(conn)
+
+    def engagement(self, platform: str, params: Dict) -> Dict:
+        if platform not in PLATFORMS:
+            raise ApiError(404, f"Unknown platform {platform!r}")
+        with self._analysis_lock:
+            if self._analysis is None:
+                # Loaded on first use; the report code pulls in the resampling and gender detector setup
+                from analysis import SocialComputingAnalysis
+                self._analysis = SocialComputingAnalysis(self.db_path)
+        return self._analysis.analyze_engagement_patterns(platform)
+
+    def trend(self, table: str, params: Dict) -> Any:
+        if table not in time_series.TIME_SOURCES:
+            raise ApiError(404, f"No activity trend for {table!r}")
+        with self.pool.connection() as conn:
+            return time_series.activity_trend(
+                conn, table, _param(params, 'bucket', default='week'), _param(params, 'start'),
+                _param(params, 'end'), _param(params, 'rolling', int)
+            )
+
+    def tags(self, params: Dict) -> Any:
+        with self.pool.connection() as conn:
+            return question_tags.tag_gender_breakdown(conn, _list(params, 'tags'),
+                                                      _param(params, 'min_questions', int, 1))
+
+    def tone(self, table: str, params: Dict) -> Any:
+        if table not in text_tone.TONE_SOURCES:
+            raise ApiError(404, f"No tone scores for {table!r}")
+        with self.pool.connection() as conn:
+            return text_tone.tone_by_gender(conn, table)
+
+    def search(self, params: Dict) -> Any:
+        query = _param(params, 'q')
+        if not query:
+            raise ApiError(400, "Missing q")
+        tables = _list(params, 'tables')
+        if tables and set(tables) - set(text_search.FTS_SOURCES):
+            raise ApiError(404, f"Not searchable: {', '.join(sorted(set(tables) - set(text_search.FTS_SOURCES)))}")
+        with self.pool.connection() as conn:
+            return text_search.search(conn, query, tables, _param(params, 'limit', int, 20))
+
+    def sketch(self, table: str, metric: str, params: Dict) -> Any:
+        with self.pool.connection() as conn:
+            return quantile_sketch.sketch_summary(conn, table, metric, _flag(_param(params, 'by_group', default='')))
+
+    def cube(self, table: str, metric: str, params: Dict) -> Dict:
+        """Gender stats (by=gender) or a breakdown by dimension or month of a stored cube slice"""
+        by = _param(params, 'by', default='gender')
+        if by not in ('gender', 'dimension', 'month'):
+            raise ApiError(400, f"by must be gender, dimension or month, not {by!r}")
+        with self.pool.connection() as conn:
+            cube = OlapCube.load(conn)
+            try:
+                stale = table in stale_sources(conn)
+            except sqlite3.OperationalError:
+                # Cube built before change tracking: nothing says it is current
+                stale = True
+        dimensions, start, end = _list(params, 'dimensions'), _param(params, 'start'), _param(params, 'end')
+        try:
+            if by == 'gender':
+                result = cube.gender_stats(table, metric, dimensions, start, end,
+                                           quantiles=_flag(_param(params, 'quantiles', default='')))
+            else:
+                result = cube.breakdown(table, metric, by, dimensions, start, end, _param(params, 'top', int))
+        except ValueError as e:
+            raise ApiError(404, str(e))
+        # The cube is rebuilt by writers (bulk loads, analysis.py --build-cube); flag a stale one
+        return {'stale': stale, 'cells': result}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """GET-only JSON handler; the service is attached to the server"""
+
+    server_version = "SocialComputingAPI/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            etag, body = self.server.service.handle(url.path, url.query)
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self._send(304, None, etag)
+                return
+            self._send(200, body(), etag)
+        except ApiError as e:
+            self._send(e.status, json.dumps({'error': str(e)}).encode('utf-8'))
+        except Exception as e:
+            logger.exception("Request %s failed", self.path)
+            self._send(500, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode('utf-8'))
+
+    def _send(self, status: int, body: Optional[bytes], etag: Optional[str] = None):
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+            # Clients may keep responses but must revalidate, since any write changes them
+            self.send_header('Cache-Control', 'no-cache')
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def make_server(service: AggregateService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for the API service"""
+    parser = argparse.ArgumentParser(description="Serve read-only aggregate JSON over the collection database")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to read")
+    parser.add_argument('--host', default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    parser.add_argument('--pool-size', type=int, default=4, help="Read-only connections shared by the request threads")
+    parser.add_argument('--no-warm', action='store_true', help="Compute responses only when first requested")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG adds one line per request")
+    parser.add_argument('--log-json', action='store_true', help="Log one JSON object per line")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level, args.log_json)
+    service = AggregateService(args.db_path, pool_size=args.pool_size, warm=not args.no_warm)
+    server = make_server(service, args.host, args.port)
+    logger.info(f"Serving {args.db_path} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""
+Bulk initial load of exported dumps into the collection database.
+
+Streams Stack Exchange data-dump XML (Users.xml, Posts.xml), GH Archive
+event JSON and Pushshift-style Reddit NDJSON into the existing tables.
+Rows are parsed incrementally, gender is inferred per batch with
+``infer_genders`` and batches are written with ``executemany`` under
+relaxed pragmas; secondary indexes and triggers are dropped for the load
+and restored at the end, and the quantile sketches, activity rollups, tag
+index, full-text indexes and OLAP cube of every loaded table are recomputed.
+Reddit selftext and comment bodies go to the text store like collected ones.
+
+    python src/bulk_loader.py so-users dump/Users.xml
+    python src/bulk_loader.py so-posts dump/Posts.xml
+    python src/bulk_loader.py gharchive 2024-01-01-*.json.gz
+    python src/bulk_loader.py pushshift RS_2023-01.zst RC_2023-01.zst
+"""
+import argparse
+import bz2
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from data_collector import INSERT_COLUMNS, INSERT_STATEMENTS, create_schema, infer_genders
+from quantile_sketch import SKETCHED_COLUMNS, rebuild_sketches
+from time_series import TIME_SOURCES, rebuild_rollups
+from question_tags import rebuild_tag_index
+from text_search import rebuild_search_index
+from text_store import intern_texts
+from olap_cube import CUBE_SOURCES, build_cube
+
+logger = logging.getLogger(__name__)
+
+# Position of the username column in each table's row, used for gender inference.
+# Every INSERT statement takes gender_inferred as its last value.
+USERNAME_COLUMN = {
+    'stackoverflow_users': 1,
+    'stackoverflow_questions': None,
+    'stackoverflow_answers': None,
+    'github_users': 1,
+    'github_repositories': None,
+    'reddit_posts': 1,
+    'reddit_comments': 2
+}
+
+# Partial records (GH Archive actors carry only id and login, data-dump users
+# have no question, answer or badge counts) must not overwrite complete rows
+# collected from the API
+INSERT_IF_MISSING = {'github_users', 'stackoverflow_users'}
+
+
+def open_dump(path: Path):
+    """Open a possibly compressed dump file for binary streaming"""
+    suffix = path.suffix.lower()
+    if suffix == '.gz':
+        return gzip.open(path, 'rb')
+    if suffix == '.bz2':
+        return bz2.open(path, 'rb')
+    if suffix == '.xz':
+        return lzma.open(path, 'rb')
+    if suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Reading .zst dumps requires the zstandard package (pip install zstandard)")
+        # Pushshift dumps use a long window
+        reader = zstandard.ZstdDecompressor(max_window_size=2 ** 31).stream_reader(open(path, 'rb'))
+        return io.BufferedReader(reader)
+    return open(path, 'rb')
+
+
+def _iter_line_chunks(path: Path, chunk_lines: int) -> Iterator[List[str]]:
+    """Yield lists of raw NDJSON lines, decoded to text (json.loads is faster on str)"""
+    with io.TextIOWrapper(open_dump(path), encoding='utf-8', errors='replace') as f:
+        chunk = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _iter_xml_rows(path: Path) -> Iterator[Dict[str, str]]:
+    """Yield the attributes of each <row> element without building the tree"""
+    with open_dump(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event == 'end' and elem.tag == 'row':
+                yield elem.attrib
+                root.clear()
+
+
+def _se_date(value: Optional[str]) -> Optional[str]:
+    # Data-dump timestamps look like 2008-07-31T14:22:31.287; drop the milliseconds
+    return value[:19] if value else None
+
+
+def _se_tags(value: Optional[str]) -> str:
+    # Older dumps use <a><b>, newer ones |a|b|
+    if not value:
+        return ''
+    return ','.join(t for t in value.replace('><', '|').strip('<>|').split('|') if t)
+
+
+def stackexchange_user_rows(row: Dict[str, str]) -> Iterator[Tuple[str, tuple]]:
+    yield 'stackoverflow_users', (
+        int(row['Id']),
+        row.get('DisplayName'),
+        int(row.get('Reputation', 0)),
+        _se_date(row.get('CreationDate')),
+        _se_date(row.get('LastAccessDate')),
+        None,
+        None,
+        None
+    )
+
+
+def stackexchange_post_rows(row: Dict[str, str]) -> Iterator[Tuple[str, tuple]]:
+    if row.get('PostTypeId') == '2':
+        # Answers, including those of deleted accounts; acceptance is recorded on
+        # the question (AcceptedAnswerId), so it is left unknown here
+        yield 'stackoverflow_answers', (
+            int(row['Id']),
+            int(row['ParentId']),
+            int(row['OwnerUserId']) if row.get('OwnerUserId') else None,
+            int(row.get('Score', 0)),
+            None,
+            _se_date(row.get('CreationDate')),
+            row.get('OwnerDisplayName')
+        )
+        return
+    # Only questions (PostTypeId 1) with a known owner, as in live collection
+    if row.get('PostTypeId') != '1' or not row.get('OwnerUserId'):
+        return
+    yield 'stackoverflow_questions', (
+        int(row['Id']),
+        int(row['OwnerUserId']),
+        row.get('Title'),
+        _se_tags(row.get('Tags')),
+        int(row.get('Score', 0)),
+        int(row.get('ViewCount', 0)),
+        int(row.get('AnswerCount', 0)),
+        _se_date(row.get('CreationDate')),
+        row.get('OwnerDisplayName')
+    )
+
+
+def gharchive_rows(event: Dict) -> Iterator[Tuple[str, tuple]]:
+    actor = event.get('actor') or {}
+    if actor.get('id') and actor.get('login'):
+        yield 'github_users', (
+            actor['id'], actor['login'], None, None, None, None, None, None, None
+        )
+
+    # Full repository objects only appear inside some payloads
+    payload = event.get('payload') or {}
+    candidates = [
+        payload.get('forkee'),
+        payload.get('repository'),
+        ((payload.get('pull_request') or {}).get('base') or {}).get('repo')
+    ]
+    for repo in candidates:
+        if not repo or not repo.get('id') or not repo.get('owner'):
+            continue
+        owner = repo['owner']
+        yield 'github_repositories', (
+            repo['id'],
+            owner.get('id'),
+            repo.get('name'),
+            repo.get('description'),
+            repo.get('language'),
+            repo.get('stargazers_count', 0),
+            repo.get('forks_count', 0),
+            repo.get('created_at'),
+            repo.get('updated_at'),
+            owner.get('login')
+        )
+
+
+def _reddit_author(value: Optional[str]) -> str:
+    return 'deleted' if not value or value == '[deleted]' else value
+
+
+def pushshift_rows(item: Dict) -> Iterator[Tuple[str, tuple]]:
+    if 'body' in item:
+        link_id = item.get('link_id') or ''
+        yield 'reddit_comments', (
+            item['id'],
+            link_id[3:] if link_id.startswith('t3_') else link_id,
+            _reddit_author(item.get('author')),
+            item.get('subreddit'),
+            item.get('body'),
+            len(item['body']) if item.get('body') is not None else None,
+            item.get('score', 0),
+            int(float(item.get('created_utc', 0)))
+        )
+    elif 'title' in item:
+        yield 'reddit_posts', (
+            item['id'],
+            _reddit_author(item.get('author')),
+            item.get('subreddit'),
+            item.get('title'),
+            item.get('selftext'),
+            len(item['selftext']) if item.get('selftext') is not None else None,
+            item.get('score', 0),
+            item.get('num_comments', 0),
+            int(float(item.get('created_utc', 0)))
+        )
+
+
+# Per-record row builders for each dump format
+PARSERS = {
+    'so-users': stackexchange_user_rows,
+    'so-posts': stackexchange_post_rows,
+    'gharchive': gharchive_rows,
+    'pushshift': pushshift_rows
+}
+
+# Formats stored one JSON document per line, which can be parsed in parallel
+LINE_FORMATS = {'gharchive', 'pushshift'}
+
+
+def with_genders(table: str, rows: List[tuple]) -> List[tuple]:
+    """Append the inferred gender to each row of a batch, vectorized over the batch"""
+    column = USERNAME_COLUMN[table]
+    if column is None:
+        # Tables without a username column carry the owner name as their last value
+        usernames = pd.Series([row[-1] for row in rows], dtype=object)
+        rows = [row[:-1] for row in rows]
+    else:
+        usernames = pd.Series([row[column] for row in rows], dtype=object)
+    genders = infer_genders(usernames)
+    return [row + (gender,) for row, gender in zip(rows, genders)]
+
+
+def parse_lines(fmt: str, lines: List[str]) -> Dict[str, List[tuple]]:
+    """Turn a chunk of NDJSON lines into complete rows per table (runs in worker processes)"""
+    row_builder = PARSERS[fmt]
+    batches = defaultdict(list)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        for table, row in row_builder(item):
+            batches[table].append(row)
+    return {table: with_genders(table, rows) for table, rows in batches.items()}
+
+
+class BulkLoader:
+    """
+    Loads parsed dump rows into the collection database in large batches.
+    Use as a context manager: pragmas are relaxed and secondary indexes and
+    triggers dropped on entry, and everything is restored on exit.
+    """
+
+    def __init__(self, db_path: str = "data/social_computing.db", batch_size: int = 100000):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.rows_loaded = defaultdict(int)
+        self._deferred_indexes: List[Tuple[str, str]] = []
+        self._deferred_triggers: List[Tuple[str, str]] = []
+        self._journal_mode = None
+        self._synchronous = None
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.db_path)
+        # Make sure the schema exists before loading into it
+        create_schema(self.conn)
+        self._journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self._synchronous = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+        self.conn.execute("PRAGMA journal_mode=MEMORY")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-262144")
+        self._drop_secondary_indexes()
+        self._drop_triggers()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                # Drop the batch in flight; the batches committed before it stay loaded
+                self.conn.rollback()
+            # The schema and pragmas come back even if one of these steps fails
+            try:
+                self._restore_triggers()
+            finally:
+                try:
+                    self._rebuild_indexes()
+                finally:
+                    self.conn.execute(f"PRAGMA journal_mode={self._journal_mode}")
+                    self.conn.execute(f"PRAGMA synchronous={self._synchronous}")
+            if self.rows_loaded:
+                # Also after a failed load, so the derived tables match the committed rows
+                if exc_type is not None:
+                    logger.warning(f"Load failed after {sum(self.rows_loaded.values())} rows; "
+                                   f"rebuilding derived tables for them")
+                # Rollups and the search index first: their triggers assume they match the rows
+                self._rebuild_rollups()
+                self._rebuild_sketches()
+        finally:
+            self.conn.close()
+        return False
+
+    def _drop_secondary_indexes(self):
+        tables = list(INSERT_STATEMENTS)
+        placeholders = ','.join('?' * len(tables))
+        self._deferred_indexes = self.conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})",
+            tables
+        ).fetchall()
+        for name, _ in self._deferred_indexes:
+            self.conn.execute(f'DROP INDEX "{name}"')
+        if self._deferred_indexes:
+            logger.info(f"Deferred {len(self._deferred_indexes)} index builds until the end of the load")
+
+    def _drop_triggers(self):
+        # Rollup triggers fire per row; the rollups are recomputed once after the load instead
+        tables = list(INSERT_STATEMENTS)
+        placeholders = ','.join('?' * len(tables))
+        self._deferred_triggers = self.conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})",
+            tables
+        ).fetchall()
+        for name, _ in self._deferred_triggers:
+            self.conn.execute(f'DROP TRIGGER "{name}"')
+
+    def _restore_triggers(self):
+        for _, sql in self._deferred_triggers:
+            self.conn.execute(sql)
+        self.conn.commit()
+
+    def _rebuild_indexes(self):
+        start = time.perf_counter()
+        for _, sql in self._deferred_indexes:
+            self.conn.execute(sql)
+        self.conn.commit()
+        if self._deferred_indexes:
+            logger.info(f"Rebuilt {len(self._deferred_indexes)} indexes in {time.perf_counter() - start:.1f}s")
+
+    def _rebuild_sketches(self):
+        start = time.perf_counter()
+        rebuild_sketches(self.conn, [table for table, rows in self.rows_loaded.items()
+                                     if rows and table in SKETCHED_COLUMNS])
+        self.conn.commit()
+        logger.info(f"Rebuilt quantile sketches in {time.perf_counter() - start:.1f}s")
+
+    def _rebuild_rollups(self):
+        start = time.perf_counter()
+        loaded = [table for table, rows in self.rows_loaded.items() if rows]
+        rebuild_rollups(self.conn, [table for table in loaded if table in TIME_SOURCES])
+        if 'stackoverflow_questions' in loaded:
+            rebuild_tag_index(self.conn)
+        rebuild_search_index(self.conn, loaded)
+        build_cube(self.conn, [table for table in loaded if table in CUBE_SOURCES])
+        self.conn.commit()
+        logger.info(f"Rebuilt activity rollups, tag and search indexes and the cube in {time.perf_counter() - start:.1f}s")
+
+    def _write_batch(self, table: str, rows: List[tuple]):
+        """Write a batch of complete rows with one executemany"""
+        sql = INSERT_STATEMENTS[table]
+        rows = intern_texts(self.conn, table, INSERT_COLUMNS[table], rows)
+        if table in INSERT_IF_MISSING:
+            sql = sql.replace('INSERT OR REPLACE', 'INSERT OR IGNORE', 1)
+        self.conn.executemany(sql, rows)
+        self.conn.commit()
+        self.rows_loaded[table] += len(rows)
+
+    def load_file(self, fmt: str, path: Path, workers: int = 1) -> Dict[str, int]:
+        """Stream one dump file into the database; returns rows loaded per table so far"""
+        if fmt in LINE_FORMATS:
+            self._load_lines(fmt, path, workers)
+        else:
+            self._load_xml(fmt, path)
+        return dict(self.rows_loaded)
+
+    def _load_xml(self, fmt: str, path: Path):
+        row_builder = PARSERS[fmt]
+        batches = defaultdict(list)
+        for record in _iter_xml_rows(path):
+            for table, row in row_builder(record):
+                batch = batches[table]
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self._write_batch(table, with_genders(table, batch))
+                    batches[table] = []
+        for table, batch in batches.items():
+            if batch:
+                self._write_batch(table, with_genders(table, batch))
+
+    def _load_lines(self, fmt: str, path: Path, workers: int):
+        chunks = _iter_line_chunks(path, self.batch_size)
+        if workers <= 1:
+            for chunk in chunks:
+                for table, rows in parse_lines(fmt, chunk).items():
+                    self._write_batch(table, rows)
+            return
+
+        # Parse in worker processes while this process writes; keep a bounded
+        # number of chunks in flight so memory stays flat on huge dumps
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(parse_lines, fmt, chunk))
+                if len(in_flight) >= workers * 2:
+                    for table, rows in in_flight.popleft().result().items():
+                        self._write_batch(table, rows)
+            while in_flight:
+                for table, rows in in_flight.popleft().result().items():
+                    self._write_batch(table, rows)
+
+    def fill_question_genders(self):
+        """
+        Data-dump questions and answers carry no owner name, so take each
+        post's gender from its owner's row in stackoverflow_users
+        """
+        for table in ('stackoverflow_questions', 'stackoverflow_answers'):
+            self.conn.execute(f'''
+                UPDATE {table}
+                SET gender_inferred = (
+                    SELECT u.gender_inferred FROM stackoverflow_users u
+                    WHERE u.user_id = {table}.user_id
+                )
+                WHERE gender_inferred = 'anonymous'
+                  AND user_id IN (SELECT user_id FROM stackoverflow_users)
+            ''')
+        self.conn.commit()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for bulk loads"""
+    parser = argparse.ArgumentParser(description="Bulk load exported dumps into the collection database")
+    parser.add_argument('format', choices=sorted(PARSERS), help="Dump format")
+    parser.add_argument('paths', nargs='+', type=Path, help="Dump files (.gz, .bz2, .xz and .zst are decompressed on the fly)")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to load into")
+    parser.add_argument('--batch-size', type=int, default=100000, help="Rows per executemany batch")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes parsing NDJSON dumps")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    with BulkLoader(args.db_path, batch_size=args.batch_size) as loader:
+        for path in args.paths:
+            file_start = time.perf_counter()
+            before = sum(loader.rows_loaded.values())
+            loader.load_file(args.format, path, workers=args.workers)
+            loaded = sum(loader.rows_loaded.values()) - before
+            elapsed = time.perf_counter() - file_start
+            logger.info(f"{path}: {loaded} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+        if args.format == 'so-posts':
+            loader.fill_question_genders()
+
+    elapsed = time.perf_counter() - start
+    total = sum(loader.rows_loaded.values())
+    print(json.dumps({
+        'rows_loaded': dict(loader.rows_loaded),
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(total / max(elapsed, 1e-9))
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import pandas as pd
+from typing import Dict, List
+
+# Gender labels folded together before charting
+GENDER_CLEANUP = {
+    'unknown': 'anonymous',
+    'mostly_male': 'male',
+    'mostly_female': 'female'
+}
+
+def clean_genders(df: pd.DataFrame) -> pd.DataFrame:
+    """Fold gender_guesser's extra labels into male/female/anonymous, in place"""
+    df['gender_inferred'] = df['gender_inferred'].replace(GENDER_CLEANUP)
+    return df
+
+def gender_counts(df: pd.DataFrame) -> pd.Series:
+    """Number of rows per gender"""
+    return df['gender_inferred'].value_counts()
+
+def group_gender_counts(df: pd.DataFrame, group_col: str) -> pd.DataFrame:
+    """Rows per (group, gender) in long format with a 'count' column"""
+    counts = df.groupby([group_col, 'gender_inferred']).size().reset_index()
+    return counts.rename(columns={0: 'count'})
+
+def group_gender_mean(df: pd.DataFrame, group_col: str, value_col: str) -> pd.DataFrame:
+    """Mean of value_col per (group, gender) in long format"""
+    return df.groupby([group_col, 'gender_inferred'])[value_col].mean().reset_index()
+
+def gender_summary(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Mean, median and standard deviation of each column per gender"""
+    return df.groupby('gender_inferred').agg({
+        column: ['mean', 'median', 'std'] for column in columns
+    }).round(2)
+
+def gender_value_stats(df: pd.DataFrame, value_col: str) -> pd.DataFrame:
+    """Mean, median and standard deviation of one column per gender, as flat columns"""
+    return df.groupby('gender_inferred')[value_col].agg(['mean', 'median', 'std']).round(2)
+
+def prepare_chart_data(platform: str, data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Compute every aggregate the dashboard draws for a platform section.
+    Used by the benchmark suite to time dashboard data preparation.
+    """
+    charts = {}
+    if platform == "stackoverflow":
+        users_df = clean_genders(data["users"])
+        questions_df = data["questions"]
+        charts['gender_distribution'] = gender_counts(users_df)
+        charts['summary_stats'] = gender_summary(users_df, ['reputation', 'question_count', 'answer_count'])
+        if not questions_df.empty:
+            charts['question_scores'] = gender_value_stats(questions_df, 'score')
+    elif platform == "github":
+        users_df = clean_genders(data["users"])
+        repos_df = clean_genders(data["repositories"])
+        charts['gender_distribution'] = gender_counts(users_df)
+        if not repos_df.empty:
+            charts['language_gender'] = group_gender_counts(repos_df, 'language')
+            charts['summary_stats'] = gender_summary(repos_df, ['stars', 'forks'])
+            charts['language_bias'] = group_gender_mean(repos_df, 'language', 'stars')
+    elif platform == "reddit":
+        posts_df = clean_genders(data["posts"])
+        charts['gender_distribution'] = gender_counts(posts_df)
+        charts['subreddit_gender'] = group_gender_counts(posts_df, 'subreddit')
+        charts['subreddit_engagement'] = group_gender_mean(posts_df, 'subreddit', 'score')
+        charts['interaction_ratio'] = group_gender_mean(posts_df, 'subreddit', 'num_comments')
+        if "comments" in data and not data["comments"].empty:
+            comments_df = clean_genders(data["comments"])
+            comments_df['comment_length'] = comments_df['body_length']
+            charts['comment_gender_distribution'] = gender_counts(comments_df)
+            charts['comment_subreddit_gender'] = group_gender_counts(comments_df, 'subreddit')
+            charts['comment_summary_stats'] = gender_summary(comments_df, ['score', 'comment_length'])
+    return charts
@@ -0,0 +1,322 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input
+_SENTINEL = object()
+
+
+class StageMetrics:
+    """Throughput and queue-depth counters for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, items: int = 1, busy: float = 0.0, blocked: float = 0.0, errors: int = 0):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy
+            self.blocked_seconds += blocked
+            self.errors += errors
+
+    def observe_queue(self, depth: int):
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def snapshot(self, queue_depth: Optional[int] = None) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        result = {
+            'items': self.items,
+            'errors': self.errors,
+            'items_per_second': round(self.items / elapsed, 2) if elapsed > 0 else 0.0,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'blocked_seconds': round(self.blocked_seconds, 3),
+            'max_queue_depth': self.max_queue_depth
+        }
+        if queue_depth is not None:
+            result['queue_depth'] = queue_depth
+        return result
+
+
+class CollectionStats:
+    """Thread-safe per-platform counters of API calls and emitted items"""
+
+    def __init__(self):
+        self.api_calls = defaultdict(int)
+        self.items = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record_api_call(self, platform: str):
+        with self._lock:
+            self.api_calls[platform] += 1
+        counts = getattr(self._local, 'counts', None)
+        if counts is not None:
+            counts['api_calls'] += 1
+
+    def record_item(self, table: str):
+        with self._lock:
+            self.items[table] += 1
+        counts = getattr(self._local, 'counts', None)
+        if counts is not None:
+            counts['items'] += 1
+
+    def record_error(self, platform: str, message: str):
+        """A collection step that failed and was skipped"""
+        with self._lock:
+            self.errors[platform] += 1
+        counts = getattr(self._local, 'counts', None)
+        if counts is not None:
+            counts['errors'].append(message)
+
+    @contextmanager
+    def track(self):
+        """Yield counters of the API calls and items recorded by the current thread inside the block"""
+        counts = {'api_calls': 0, 'items': 0, 'errors': []}
+        self._local.counts = counts
+        try:
+            yield counts
+        finally:
+            self._local.counts = None
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {'api_calls': dict(self.api_calls), 'items': dict(self.items), 'errors': dict(self.errors)}
+
+
+class CollectionPipeline:
+    """
+    Staged producer/consumer pipeline for collected items.
+
+    Fetchers call ``put(kind, item)`` with raw API items, which land on a bounded
+    queue; transform workers turn each item into a ``(table, row)`` pair (this is
+    where gender inference happens); a single writer thread owns the SQLite
+    connection and commits rows in batches. Bounded queues give backpressure:
+    ``put`` blocks while downstream stages are behind. If the writer fails,
+    ``put`` and ``close`` raise instead of waiting on queues nobody drains.
+
+    The writer switches the database to WAL while it runs, so readers are not
+    blocked by its commits, and restores the previous journal mode when it
+    stops. Leaving WAL needs the only connection to the database; if readers
+    or other writers still have it open, it stays in WAL, which is logged.
+    """
+
+    def __init__(self, db_path: Path,
+                 transform: Callable[[str, Dict], Optional[Tuple[str, tuple]]],
+                 writer: Callable[[sqlite3.Connection, str, List[tuple]], None],
+                 queue_size: int = 1000, batch_size: int = 500,
+                 flush_interval: float = 1.0, transform_workers: int = 1):
+        self.db_path = db_path
+        self.transform = transform
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.raw_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+
+        self.fetch_metrics = StageMetrics('fetch')
+        self.transform_metrics = StageMetrics('transform')
+        self.write_metrics = StageMetrics('write')
+        self.commits = 0
+
+        self._transform_threads = [
+            threading.Thread(target=self._transform_loop, name=f"pipeline-transform-{i}", daemon=True)
+            for i in range(transform_workers)
+        ]
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="pipeline-writer", daemon=True)
+        self._started = False
+        self._closed = False
+        # Set when the writer thread dies; the stages then stop waiting on each other
+        self._failed = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def start(self):
+        """Start the transform workers and the writer thread"""
+        for thread in self._transform_threads:
+            thread.start()
+        self._writer_thread.start()
+        self._started = True
+        return self
+
+    def put(self, kind: str, item: Dict):
+        """Queue a raw item for transformation; blocks while the queue is full"""
+        if self._closed:
+            raise RuntimeError("Pipeline is closed")
+        start = time.perf_counter()
+        if not self._offer(self.raw_queue, (kind, item)):
+            self._raise_failure()
+        self.fetch_metrics.record(blocked=time.perf_counter() - start)
+        self.fetch_metrics.observe_queue(self.raw_queue.qsize())
+
+    def close(self):
+        """Drain every stage, commit outstanding rows and stop the threads"""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._started:
+            return
+        for _ in self._transform_threads:
+            self._offer(self.raw_queue, _SENTINEL)
+        for thread in self._transform_threads:
+            thread.join()
+        self._offer(self.write_queue, _SENTINEL)
+        self._writer_thread.join()
+        if self._failed.is_set():
+            self._raise_failure()
+
+    def _raise_failure(self):
+        raise RuntimeError(f"Collection pipeline writer failed: {self._error}") from self._error
+
+    def _offer(self, q: queue.Queue, entry) -> bool:
+        """Put entry on q, waiting while it is full; False once the writer has failed"""
+        while not self._failed.is_set():
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _take(self, q: queue.Queue):
+        """Next entry of q, or the sentinel once the writer has failed"""
+        while not self._failed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _SENTINEL
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-stage item counts, throughput and queue depths"""
+        return {
+            'fetch': self.fetch_metrics.snapshot(self.raw_queue.qsize()),
+            'transform': self.transform_metrics.snapshot(self.write_queue.qsize()),
+            'write': dict(self.write_metrics.snapshot(), commits=self.commits)
+        }
+
+    def _transform_loop(self):
+        while True:
+            entry = self._take(self.raw_queue)
+            if entry is _SENTINEL:
+                return
+            kind, item = entry
+            start = time.perf_counter()
+            try:
+                result = self.transform(kind, item)
+            except Exception as e:
+                logger.error(f"Error transforming {kind} item: {e}")
+                self.transform_metrics.record(items=0, busy=time.perf_counter() - start, errors=1)
+                continue
+            busy = time.perf_counter() - start
+
+            if result is not None:
+                start = time.perf_counter()
+                if not self._offer(self.write_queue, result):
+                    return
+                self.transform_metrics.record(busy=busy, blocked=time.perf_counter() - start)
+                self.transform_metrics.observe_queue(self.write_queue.qsize())
+            else:
+                self.transform_metrics.record(busy=busy)
+
+    def _writer_loop(self):
+        # Wait out short locks held by readers (API, dashboard, scheduler) instead of failing
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        # journal_mode persists in the file, so it is put back on close
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        pending = defaultdict(list)
+        pending_count = 0
+        last_flush = time.perf_counter()
+
+        def flush():
+            nonlocal pending_count, last_flush
+            start = time.perf_counter()
+            written = 0
+            errors = 0
+            # One transaction per flush, with a savepoint per table
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for table, rows in pending.items():
+                # A table whose write fails leaves nothing behind (text blobs, rows, sketch updates)
+                conn.execute("SAVEPOINT write_batch")
+                try:
+                    self.writer(conn, table, rows)
+                    conn.execute("RELEASE write_batch")
+                    written += len(rows)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_batch")
+                    conn.execute("RELEASE write_batch")
+                    logger.error(f"Error writing {len(rows)} rows to {table}: {e}")
+                    errors += len(rows)
+            conn.commit()
+            self.commits += 1
+            self.write_metrics.record(items=written, busy=time.perf_counter() - start, errors=errors)
+            pending.clear()
+            pending_count = 0
+            last_flush = time.perf_counter()
+
+        try:
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.perf_counter() - last_flush))
+                try:
+                    entry = self.write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    if pending_count:
+                        flush()
+                    else:
+                        last_flush = time.perf_counter()
+                    continue
+
+                if entry is _SENTINEL:
+                    break
+                table, row = entry
+                pending[table].append(row)
+                pending_count += 1
+                if pending_count >= self.batch_size:
+                    flush()
+            if pending_count:
+                flush()
+        except Exception as e:
+            # e.g. the commit failing; producers see it on their next put() and on close()
+            logger.error(f"Collection pipeline writer failed: {e}")
+            self._error = e
+            self._failed.set()
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+        finally:
+            if journal_mode.lower() != 'wal':
+                try:
+                    # Fail at once rather than wait out the 30s timeout when others have it open
+                    conn.execute("PRAGMA busy_timeout=0")
+                    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+                except sqlite3.OperationalError as e:
+                    logger.info(f"Left the database in WAL mode, other connections have it open ({e})")
+            conn.close()
@@ -2,8 +2,10 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from pathlib import Path
-from data_collector import SocialComputingDataCollector
 from analysis import SocialComputingAnalysis
+from profiling import profile_call
+from resampling import bootstrap_mean, format_interval
+from chart_data import clean_genders, gender_counts, group_gender_counts, group_gender_mean, gender_summary, gender_value_stats
 
 # =============================
 # Gender Disparity in Tech Communities Dashboard
@@ -31,13 +33,26 @@ with st.container():
     This dashboard analyzes gender disparities in technology communities using traces of online engagement from Stack Overflow, GitHub, and Reddit. The project follows social computing methodology by analyzing natural digital footprints rather than survey responses.
     """)
 
-collector = SocialComputingDataCollector()
 analyzer = SocialComputingAnalysis()
 
 @st.cache_data(ttl=3600)
 def load_platform_data(platform: str):
     return analyzer.load_platform_data(platform)
 
+@st.cache_data(ttl=3600)
+def mean_interval(values: pd.Series, scale: float = 1.0, digits: int = 1, suffix: str = '') -> str:
+    """95% bootstrap confidence interval of a mean (or of a share, given booleans) as caption text"""
+    interval = bootstrap_mean(values.astype(float), n_resamples=analyzer.n_resamples, seed=analyzer.seed)
+    return "95% " + format_interval(interval, scale, digits, suffix)
+
+@st.cache_data(ttl=300)
+def load_activity_trend(table: str, bucket: str, start: str, end: str, rolling: int) -> pd.DataFrame:
+    return analyzer.activity_trend(table, bucket, start, end, rolling)
+
+@st.cache_resource(ttl=300)
+def load_olap_cube():
+    return analyzer.olap_cube()
+
 # Sidebar navigation
 st.sidebar.header("Dashboard Sections")
 section = st.sidebar.radio(
@@ -47,9 +62,15 @@ section = st.sidebar.radio(
         "GitHub Analysis", 
         "Reddit Analysis",
         "Cross-Platform Comparison",
-        
+        "Activity Trends",
+        "Text Search",
+        "Explore with Filters",
     ]
 )
+profile_report = st.sidebar.checkbox(
+    "Profile report generation",
+    help="Run the cross-platform report under cProfile and tracemalloc and save the reports to the visualizations folder"
+)
 
 # =============================
 # Section 1: Stack Overflow Analysis
@@ -80,19 +101,17 @@ if section == "Stack Overflow Analysis":
                 with col3:
                     female_pct = (users_df['gender_inferred'] == 'female').mean() * 100
                     st.metric("Female Users (%)", f"{female_pct:.1f}%")
+                    st.caption(mean_interval(users_df['gender_inferred'] == 'female', 100, 1, '%'))
                 with col4:
                     avg_reputation = users_df['reputation'].mean()
                     st.metric("Avg Reputation", f"{avg_reputation:.0f}")
+                    st.caption(mean_interval(users_df['reputation'], digits=0))
                 
                 # Gender Distribution
                 st.markdown("**👥 Gender Distribution**")
                 # Clean up gender categories to remove mostly_male/mostly_female
-                users_df['gender_inferred'] = users_df['gender_inferred'].replace({
-                    'unknown': 'anonymous',
-                    'mostly_male': 'male',
-                    'mostly_female': 'female'
-                })
-                gender_dist = users_df['gender_inferred'].value_counts()
+                clean_genders(users_df)
+                gender_dist = gender_counts(users_df)
                 fig_gender = px.pie(
                     values=gender_dist.values,
                     names=gender_dist.index,
@@ -127,16 +146,27 @@ if section == "Stack Overflow Analysis":
                     )
                     st.plotly_chart(fig_questions, use_container_width=True)
                 with col2:
-                    # Show reputation comparison instead of answers since all answers are 0
-                    fig_reputation_activity = px.box(
-                        users_df,
-                        x="gender_inferred",
-                        y="reputation",
-                        title="Reputation by Gender",
-                        color="gender_inferred",
-                        color_discrete_sequence=px.colors.qualitative.Pastel
-                    )
-                    st.plotly_chart(fig_reputation_activity, use_container_width=True)
+                    if users_df['answer_count'].any():
+                        fig_answers = px.box(
+                            users_df,
+                            x="gender_inferred",
+                            y="answer_count",
+                            title="Answers Given by Gender",
+                            color="gender_inferred",
+                            color_discrete_sequence=px.colors.qualitative.Pastel
+                        )
+                        st.plotly_chart(fig_answers, use_container_width=True)
+                    else:
+                        # No answers collected yet (data_collector.py --answers); show reputation instead
+                        fig_reputation_activity = px.box(
+                            users_df,
+                            x="gender_inferred",
+                            y="reputation",
+                            title="Reputation by Gender",
+                            color="gender_inferred",
+                            color_discrete_sequence=px.colors.qualitative.Pastel
+                        )
+                        st.plotly_chart(fig_reputation_activity, use_container_width=True)
                 
 
                 
@@ -176,11 +206,7 @@ if section == "Stack Overflow Analysis":
                 
                 # Statistical Summary Table
                 st.markdown("**📋 Statistical Summary**")
-                summary_stats = users_df.groupby('gender_inferred').agg({
-                    'reputation': ['mean', 'median', 'std'],
-                    'question_count': ['mean', 'median', 'std'],
-                    'answer_count': ['mean', 'median', 'std']
-                }).round(2)
+                summary_stats = gender_summary(users_df, ['reputation', 'question_count', 'answer_count'])
                 st.dataframe(summary_stats, use_container_width=True)
                 
                 # Bias Analysis Section
@@ -188,7 +214,9 @@ if section == "Stack Overflow Analysis":
                
                 # Vote ratio differences (using question scores)
                 if not questions_df.empty:
-                    question_scores_by_gender = questions_df.groupby('gender_inferred')['score'].agg(['mean', 'median', 'std']).round(2)
+                    question_scores_by_gender = analyzer.sketch_summary('stackoverflow_questions', 'score')[['mean', 'median', 'std']].round(2)
+                    if question_scores_by_gender.empty:
+                        question_scores_by_gender = gender_value_stats(questions_df, 'score')
                     st.markdown("**📊 Question Score Analysis by Gender**")
                     st.dataframe(question_scores_by_gender, use_container_width=True)
                     
@@ -235,19 +263,18 @@ elif section == "GitHub Analysis":
                 with col3:
                     female_pct = (users_df['gender_inferred'] == 'female').mean() * 100
                     st.metric("Female Users (%)", f"{female_pct:.1f}%")
+                    st.caption(mean_interval(users_df['gender_inferred'] == 'female', 100, 1, '%'))
                 with col4:
                     avg_stars = repos_df['stars'].mean() if not repos_df.empty else 0
                     st.metric("Avg Repository Stars", f"{avg_stars:.0f}")
+                    if not repos_df.empty:
+                        st.caption(mean_interval(repos_df['stars'], digits=0))
                 
                 # Gender Distribution
                 st.markdown("**👥 Gender Distribution**")
                 # Clean up gender categories to remove mostly_male/mostly_female
-                users_df['gender_inferred'] = users_df['gender_inferred'].replace({
-                    'unknown': 'anonymous',
-                    'mostly_male': 'male',
-                    'mostly_female': 'female'
-                })
-                gender_dist = users_df['gender_inferred'].value_counts()
+                clean_genders(users_df)
+                gender_dist = gender_counts(users_df)
                 fig_gender = px.pie(
                     values=gender_dist.values,
                     names=gender_dist.index,
@@ -292,8 +319,7 @@ elif section == "GitHub Analysis":
                 with col2:
                     # Language preferences (more meaningful)
                     if not repos_df.empty:
-                        language_gender = repos_df.groupby(['language', 'gender_inferred']).size().reset_index()
-                        language_gender = language_gender.rename(columns={0: 'count'})
+                        language_gender = group_gender_counts(repos_df, 'language')
                         fig_language_analysis = px.bar(
                             language_gender,
                             x="language",
@@ -341,10 +367,9 @@ elif section == "GitHub Analysis":
                 # Statistical Summary Table
                 st.markdown("**📋 Statistical Summary**")
                 if not repos_df.empty:
-                    summary_stats = repos_df.groupby('gender_inferred').agg({
-                        'stars': ['mean', 'median', 'std'],
-                        'forks': ['mean', 'median', 'std']
-                    }).round(2)
+                    summary_stats = analyzer.sketch_gender_summary('github_repositories', ['stars', 'forks'])
+                    if summary_stats is None:
+                        summary_stats = gender_summary(repos_df, ['stars', 'forks'])
                     st.dataframe(summary_stats, use_container_width=True)
                 else:
                     st.info("No repository data available for statistical summary")
@@ -355,7 +380,7 @@ elif section == "GitHub Analysis":
                 
                 if not repos_df.empty:
                     # Language bias analysis
-                    language_bias = repos_df.groupby(['language', 'gender_inferred'])['stars'].mean().reset_index()
+                    language_bias = group_gender_mean(repos_df, 'language', 'stars')
                     fig_language_bias = px.bar(
                         language_bias,
                         x="language",
@@ -390,11 +415,7 @@ elif section == "Reddit Analysis":
                 posts_df = data["posts"]
                 
                 # Clean up gender categories to remove mostly_male/mostly_female
-                posts_df['gender_inferred'] = posts_df['gender_inferred'].replace({
-                    'unknown': 'anonymous',
-                    'mostly_male': 'male',
-                    'mostly_female': 'female'
-                })
+                clean_genders(posts_df)
                 
                 # Add data quality note
                 st.info("📊 **Data Quality**: 570 posts analyzed. Most users are anonymous (459), with 76 male and 31 female users.")
@@ -409,13 +430,15 @@ elif section == "Reddit Analysis":
                 with col3:
                     female_pct = (posts_df['gender_inferred'] == 'female').mean() * 100
                     st.metric("Female Posts (%)", f"{female_pct:.1f}%")
+                    st.caption(mean_interval(posts_df['gender_inferred'] == 'female', 100, 1, '%'))
                 with col4:
                     avg_score = posts_df['score'].mean()
                     st.metric("Avg Post Score", f"{avg_score:.0f}")
+                    st.caption(mean_interval(posts_df['score'], digits=0))
                 
                 # Gender Distribution
                 st.markdown("**👥 Gender Distribution**")
-                gender_dist = posts_df['gender_inferred'].value_counts()
+                gender_dist = gender_counts(posts_df)
                 fig_gender = px.pie(
                     values=gender_dist.values,
                     names=gender_dist.index,
@@ -450,8 +473,7 @@ elif section == "Reddit Analysis":
                 
                 # Subreddit Participation
                 st.markdown("**🏷️ Subreddit Participation by Gender**")
-                subreddit_gender = posts_df.groupby(['subreddit', 'gender_inferred']).size().reset_index()
-                subreddit_gender = subreddit_gender.rename(columns={0: 'count'})
+                subreddit_gender = group_gender_counts(posts_df, 'subreddit')
                 fig_subreddit = px.bar(
                     subreddit_gender,
                     x="subreddit",
@@ -501,7 +523,7 @@ elif section == "Reddit Analysis":
                 st.info("📊 **Bias Metrics**: Analyzing potential gender bias in post engagement, community interaction, and voting patterns.")
                 
                 # Post engagement bias by subreddit
-                subreddit_engagement = posts_df.groupby(['subreddit', 'gender_inferred'])['score'].mean().reset_index()
+                subreddit_engagement = group_gender_mean(posts_df, 'subreddit', 'score')
                 fig_subreddit_bias = px.bar(
                     subreddit_engagement,
                     x="subreddit",
@@ -513,7 +535,7 @@ elif section == "Reddit Analysis":
                 st.plotly_chart(fig_subreddit_bias, use_container_width=True)
                 
                 # Community interaction differences
-                interaction_ratio = posts_df.groupby(['subreddit', 'gender_inferred'])['num_comments'].mean().reset_index()
+                interaction_ratio = group_gender_mean(posts_df, 'subreddit', 'num_comments')
                 fig_interaction = px.bar(
                     interaction_ratio,
                     x="subreddit",
@@ -537,11 +559,7 @@ elif section == "Reddit Analysis":
                 comments_df = data["comments"]
                 
                 # Clean up gender categories to remove mostly_male/mostly_female
-                comments_df['gender_inferred'] = comments_df['gender_inferred'].replace({
-                    'unknown': 'anonymous',
-                    'mostly_male': 'male',
-                    'mostly_female': 'female'
-                })
+                clean_genders(comments_df)
                 
                 # Add data quality note
                 st.info("📊 **Data Quality**: 276 comments analyzed. Gender distribution shows engagement patterns across tech communities.")
@@ -556,13 +574,15 @@ elif section == "Reddit Analysis":
                 with col3:
                     female_pct = (comments_df['gender_inferred'] == 'female').mean() * 100
                     st.metric("Female Comments (%)", f"{female_pct:.1f}%")
+                    st.caption(mean_interval(comments_df['gender_inferred'] == 'female', 100, 1, '%'))
                 with col4:
                     avg_score = comments_df['score'].mean()
                     st.metric("Avg Comment Score", f"{avg_score:.0f}")
+                    st.caption(mean_interval(comments_df['score'], digits=0))
                 
                 # Comment Gender Distribution
                 st.markdown("**👥 Comment Gender Distribution**")
-                comment_gender_dist = comments_df['gender_inferred'].value_counts()
+                comment_gender_dist = gender_counts(comments_df)
                 fig_comment_gender = px.pie(
                     values=comment_gender_dist.values,
                     names=comment_gender_dist.index,
@@ -586,7 +606,7 @@ elif section == "Reddit Analysis":
                     st.plotly_chart(fig_comment_scores, use_container_width=True)
                 with col2:
                     # Comment length analysis
-                    comments_df['comment_length'] = comments_df['body'].str.len()
+                    comments_df['comment_length'] = comments_df['body_length']
                     fig_comment_length = px.box(
                         comments_df,
                         x="gender_inferred",
@@ -599,8 +619,7 @@ elif section == "Reddit Analysis":
                 
                 # Comment Activity by Subreddit
                 st.markdown("**🏷️ Comment Activity by Subreddit**")
-                comment_subreddit_gender = comments_df.groupby(['subreddit', 'gender_inferred']).size().reset_index()
-                comment_subreddit_gender = comment_subreddit_gender.rename(columns={0: 'count'})
+                comment_subreddit_gender = group_gender_counts(comments_df, 'subreddit')
                 fig_comment_subreddit = px.bar(
                     comment_subreddit_gender,
                     x="subreddit",
@@ -649,10 +668,9 @@ elif section == "Reddit Analysis":
                 
                 # Statistical Summary Table
                 st.markdown("**📋 Statistical Summary**")
-                summary_stats = comments_df.groupby('gender_inferred').agg({
-                    'score': ['mean', 'median', 'std'],
-                    'comment_length': ['mean', 'median', 'std']
-                }).round(2)
+                summary_stats = analyzer.sketch_gender_summary('reddit_comments', ['score', 'comment_length'])
+                if summary_stats is None:
+                    summary_stats = gender_summary(comments_df, ['score', 'comment_length'])
                 st.dataframe(summary_stats, use_container_width=True)
                 
                
@@ -675,7 +693,23 @@ elif section == "Cross-Platform Comparison":
         st.subheader("🌐 Cross-Platform Gender Representation Comparison")
         try:
             # Generate comprehensive analysis
-            comprehensive_report = analyzer.generate_comprehensive_analysis()
+            if profile_report:
+                comprehensive_report, profiler, profile_paths = profile_call(
+                    analyzer.generate_comprehensive_analysis, output_dir=str(analyzer.output_dir)
+                )
+                with st.expander(f"⏱️ Profile: {profiler.elapsed:.2f}s under the profiler", expanded=True):
+                    st.markdown("**Hotspots by self time**")
+                    st.dataframe(pd.DataFrame(profiler.hotspots(top=20)), use_container_width=True)
+                    st.markdown(f"**Allocation sites at peak** (peak traced memory {profiler.peak_bytes / 1e6:.1f} MB)")
+                    st.dataframe(pd.DataFrame(profiler.allocation_sites(top=15)), use_container_width=True)
+                    st.download_button(
+                        "Download collapsed stacks (flamegraph)",
+                        profile_paths['collapsed'].read_text(encoding='utf-8'),
+                        file_name=profile_paths['collapsed'].name
+                    )
+                    st.caption(f"Reports written to {analyzer.output_dir}")
+            else:
+                comprehensive_report = analyzer.generate_comprehensive_analysis()
             
             if comprehensive_report:
                 # Display cross-platform insights
@@ -739,6 +773,17 @@ elif section == "Cross-Platform Comparison":
                     platform_df = pd.DataFrame(platform_data)
                     st.dataframe(platform_df, use_container_width=True)
                 
+                identity_links = comprehensive_report.get('identity_links')
+                if identity_links and identity_links['platform_pairs']:
+                    st.markdown("**🔗 Shared Handles Across Platforms**")
+                    st.caption(f"Account pairs with username-match confidence of at least {identity_links['min_confidence']:.0%}")
+                    links_df = pd.DataFrame([
+                        {'Platforms': pair.replace('-', ' & '), 'Linked Accounts': stats['links'],
+                         'Same Inferred Gender %': stats['gender_agreement'] * 100}
+                        for pair, stats in identity_links['platform_pairs'].items()
+                    ])
+                    st.dataframe(links_df, use_container_width=True)
+                
                 st.markdown("**💡 Key Insights**")
                 st.info("""
                **Key Observations from Our Analysis:**
@@ -768,6 +813,175 @@ elif section == "Cross-Platform Comparison":
         except Exception as e:
             st.error(f"Error creating cross-platform comparison: {e}")
 
+# =============================
+# Section 5: Activity Trends
+# =============================
+elif section == "Activity Trends":
+    with st.container():
+        st.markdown("""
+        <h2 style='color: #16a085;'>Activity Trends</h2>
+        """, unsafe_allow_html=True)
+        st.write(":chart_with_upwards_trend: **Activity over time by gender, from daily rollups kept up to date during collection.**")
+
+        trend_sources = {
+            "Stack Overflow questions": "stackoverflow_questions",
+            "GitHub repositories": "github_repositories",
+            "Reddit posts": "reddit_posts",
+            "Reddit comments": "reddit_comments"
+        }
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            source_label = st.selectbox("Activity", list(trend_sources))
+        with col2:
+            bucket = st.selectbox("Bucket", ["day", "week", "month"], index=1)
+        with col3:
+            rolling = st.slider("Rolling window (buckets)", 1, 12, 4)
+        col1, col2 = st.columns(2)
+        with col1:
+            start = st.date_input("From", value=None)
+        with col2:
+            end = st.date_input("To", value=None)
+
+        try:
+            trend_df = load_activity_trend(
+                trend_sources[source_label], bucket,
+                start.isoformat() if start else None, end.isoformat() if end else None, rolling
+            )
+            if trend_df.empty:
+                st.warning("No dated activity in this range. Please run data collection first.")
+            else:
+                count_col = 'count_rolling' if 'count_rolling' in trend_df else 'count'
+                share_col = 'share_rolling' if 'share_rolling' in trend_df else 'share'
+                fig_counts = px.line(
+                    trend_df, x='period', y=count_col, color='gender',
+                    title=f"{source_label} per {bucket} by gender",
+                    labels={'period': bucket.capitalize(), count_col: 'Items'},
+                    color_discrete_sequence=px.colors.qualitative.Pastel
+                )
+                st.plotly_chart(fig_counts, use_container_width=True)
+
+                fig_share = px.area(
+                    trend_df, x='period', y=share_col, color='gender',
+                    title=f"Share of {source_label.lower()} by gender",
+                    labels={'period': bucket.capitalize(), share_col: 'Share'},
+                    color_discrete_sequence=px.colors.qualitative.Pastel
+                )
+                st.plotly_chart(fig_share, use_container_width=True)
+
+                fig_value = px.line(
+                    trend_df, x='period', y='mean_value', color='gender',
+                    title=f"Average {'stars' if trend_sources[source_label] == 'github_repositories' else 'score'} per {bucket}",
+                    labels={'period': bucket.capitalize(), 'mean_value': 'Average'},
+                    color_discrete_sequence=px.colors.qualitative.Pastel
+                )
+                st.plotly_chart(fig_value, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error loading activity trends: {e}")
+
+
+# =============================
+# Section 6: Text Search
+# =============================
+elif section == "Text Search":
+    with st.container():
+        st.markdown("""
+        <h2 style='color: #8e44ad;'>Text Search</h2>
+        """, unsafe_allow_html=True)
+        st.write(":mag: **Search question titles, Reddit posts and comments and see who writes about a topic.**")
+
+        query = st.text_input("Search", placeholder='e.g. "imposter syndrome" or mentor* NOT job')
+        if query:
+            try:
+                search_results = analyzer.search_text(query)
+                table_labels = {
+                    'stackoverflow_questions': "Stack Overflow questions",
+                    'reddit_posts': "Reddit posts",
+                    'reddit_comments': "Reddit comments"
+                }
+                counts_df = pd.DataFrame([
+                    {'Source': table_labels[table], 'Gender': gender, 'Hits': hits}
+                    for table, result in search_results.items()
+                    for gender, hits in result['gender_counts'].items()
+                ])
+                if counts_df.empty:
+                    st.info("No matches.")
+                else:
+                    fig_hits = px.bar(
+                        counts_df, x='Source', y='Hits', color='Gender', barmode='group',
+                        title=f"Matches for {query} by gender",
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    st.plotly_chart(fig_hits, use_container_width=True)
+                    for table, result in search_results.items():
+                        if result['total']:
+                            st.markdown(f"**{table_labels[table]}** ({result['total']} matches)")
+                            st.dataframe(result['results'].drop(columns='rank'), use_container_width=True)
+            except Exception as e:
+                st.error(f"Error searching text: {e}")
+
+# =============================
+# Section 7: Explore with Filters
+# =============================
+elif section == "Explore with Filters":
+    with st.container():
+        st.markdown("""
+        <h2 style='color: #d35400;'>Explore with Filters</h2>
+        """, unsafe_allow_html=True)
+        st.write(":bar_chart: **Gender breakdowns for any date range and set of subreddits, languages or tags, answered from a pre-aggregated cube.**")
+
+        cube_sources = {
+            "Stack Overflow questions (by tag)": "stackoverflow_questions",
+            "GitHub repositories (by language)": "github_repositories",
+            "Reddit posts (by subreddit)": "reddit_posts",
+            "Reddit comments (by subreddit)": "reddit_comments"
+        }
+        try:
+            cube = load_olap_cube()
+            col1, col2 = st.columns(2)
+            with col1:
+                cube_label = st.selectbox("Data", list(cube_sources))
+            cube_table = cube_sources[cube_label]
+            metrics = cube.metrics(cube_table)
+            if not metrics:
+                st.warning("The aggregate cube has no cells for this source. Build it with `python src/analysis.py --build-cube` after collecting data.")
+            else:
+                if cube_table in analyzer.stale_cube_sources():
+                    st.info("This table changed since the cube was built; run `python src/analysis.py --build-cube` to refresh it.")
+                with col2:
+                    metric = st.selectbox("Metric", metrics)
+                first_month, last_month = cube.month_range(cube_table)
+                col1, col2 = st.columns(2)
+                with col1:
+                    start = st.date_input("From", value=pd.Timestamp(first_month) if first_month else None)
+                with col2:
+                    end = st.date_input("To", value=pd.Timestamp(last_month) if last_month else None)
+                selected = st.multiselect("Filter by " + cube_label.split("by ")[-1].rstrip(")"),
+                                          cube.dimension_values(cube_table))
+                start_text = start.isoformat() if start else None
+                end_text = end.isoformat() if end else None
+
+                stats = cube.gender_stats(cube_table, metric, selected, start_text, end_text, quantiles=True)
+                if stats.empty:
+                    st.info("No rows match these filters.")
+                else:
+                    st.dataframe(stats.round(3), use_container_width=True)
+                    breakdown = cube.breakdown(cube_table, metric, 'dimension', selected, start_text, end_text, top=15)
+                    fig_breakdown = px.bar(
+                        breakdown, x='dimension', y='count', color='gender',
+                        title=f"{cube_label.split(' (')[0]} by gender",
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    st.plotly_chart(fig_breakdown, use_container_width=True)
+                    monthly = cube.breakdown(cube_table, metric, 'month', selected, start_text, end_text)
+                    fig_monthly = px.line(
+                        monthly, x='month', y='mean', color='gender',
+                        title=f"Average {metric.replace('_', ' ')} per month",
+                        color_discrete_sequence=px.colors.qualitative.Pastel
+                    )
+                    st.plotly_chart(fig_monthly, use_container_width=True)
+        except Exception as e:
+            st.error(f"Error loading the aggregate cube: {e}")
+
 
 # Footer
 st.markdown("""
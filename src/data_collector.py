@@ -4,14 +4,29 @@ import sqlite3
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import os
 from dotenv import load_dotenv
-import praw
-from github import Github
 import json
+import re
 from pathlib import Path
 import numpy as np
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from contextlib import contextmanager
+from response_cache import ResponseCache
+from collection_pipeline import CollectionPipeline, CollectionStats
+from rate_limiter import RateLimiter
+from structured_logging import configure_logging
+from quantile_sketch import create_sketch_table, ensure_sketches, mark_stale, new_rows, update_sketches
+from time_series import create_rollups
+from question_tags import create_tag_index
+from text_search import create_search_index
+from text_store import create_text_store, intern_texts, require_converted
+from data_summary import data_version, summarize
+from storage import SQLiteBackend
+import tracing
 
 # Load environment variables
 load_dotenv()
@@ -20,123 +35,267 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Username heuristics used by _infer_gender_from_username and infer_genders
+ANONYMOUS_USERNAMES = ['deleted', 'anonymous', 'unknown']
+FEMALE_NAME_INDICATORS = ['sarah', 'emma', 'olivia', 'ava', 'isabella', 'sophia', 'charlotte', 'mia', 'amelia', 'harper']
+MALE_NAME_INDICATORS = ['james', 'john', 'robert', 'michael', 'william', 'david', 'richard', 'joseph', 'thomas', 'christopher']
+FEMALE_PATTERNS = ['girl', 'woman', 'lady', 'ms', 'miss', 'mrs']
+MALE_PATTERNS = ['guy', 'man', 'mr', 'dude']
+
+def infer_genders(usernames: pd.Series) -> np.ndarray:
+    """
+    Vectorized equivalent of SocialComputingDataCollector._infer_gender_from_username.
+    Each distinct username is classified once, so repeated authors cost nothing.
+    """
+    codes, uniques = pd.factorize(usernames.fillna(''), use_na_sentinel=False)
+    lower = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    
+    def contains_any(words):
+        return lower.str.contains('|'.join(re.escape(w) for w in words), regex=True).to_numpy()
+    
+    labels = np.select(
+        [
+            (lower == '').to_numpy() | lower.isin(ANONYMOUS_USERNAMES).to_numpy(),
+            contains_any(FEMALE_NAME_INDICATORS),
+            contains_any(MALE_NAME_INDICATORS),
+            contains_any(FEMALE_PATTERNS),
+            contains_any(MALE_PATTERNS)
+        ],
+        ['anonymous', 'female', 'male', 'female', 'male'],
+        default='anonymous'
+    )
+    return labels[codes]
+
+# Parameterized INSERT statements shared by the inline store methods
+# and the collection pipeline writer
+INSERT_STATEMENTS = {
+    'stackoverflow_users': '''
+        INSERT OR REPLACE INTO stackoverflow_users 
+        (user_id, username, reputation, creation_date, last_access_date, 
+         question_count, answer_count, badge_count, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'stackoverflow_questions': '''
+        INSERT OR REPLACE INTO stackoverflow_questions 
+        (question_id, user_id, title, tags, score, view_count, 
+         answer_count, creation_date, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'stackoverflow_answers': '''
+        INSERT OR REPLACE INTO stackoverflow_answers 
+        (answer_id, question_id, user_id, score, is_accepted, 
+         creation_date, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'github_users': '''
+        INSERT OR REPLACE INTO github_users 
+        (user_id, username, public_repos, followers, following, 
+         created_at, updated_at, bio, location, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'github_repositories': '''
+        INSERT OR REPLACE INTO github_repositories 
+        (repo_id, user_id, name, description, language, stars, 
+         forks, created_at, updated_at, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'reddit_posts': '''
+        INSERT OR REPLACE INTO reddit_posts 
+        (post_id, username, subreddit, title, selftext_text_id, selftext_length, score, 
+         num_comments, created_utc, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'reddit_comments': '''
+        INSERT OR REPLACE INTO reddit_comments 
+        (comment_id, post_id, username, subreddit, body_text_id, body_length, score, 
+         created_utc, gender_inferred)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+}
+
+# Column names of each INSERT statement, in row tuple order
+INSERT_COLUMNS = {
+    table: [c.strip() for c in re.search(r'\((.*?)\)\s*VALUES', sql, re.S).group(1).split(',')]
+    for table, sql in INSERT_STATEMENTS.items()
+}
+
+def create_schema(conn: sqlite3.Connection):
+    """Create the collection tables if they do not exist yet"""
+    cursor = conn.cursor()
+    
+    # Create tables for different platforms
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stackoverflow_users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            reputation INTEGER,
+            creation_date TEXT,
+            last_access_date TEXT,
+            question_count INTEGER,
+            answer_count INTEGER,
+            badge_count INTEGER,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stackoverflow_questions (
+            question_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            title TEXT,
+            tags TEXT,
+            score INTEGER,
+            view_count INTEGER,
+            answer_count INTEGER,
+            creation_date TEXT,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES stackoverflow_users (user_id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stackoverflow_answers (
+            answer_id INTEGER PRIMARY KEY,
+            question_id INTEGER,
+            user_id INTEGER,
+            score INTEGER,
+            is_accepted INTEGER,
+            creation_date TEXT,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (question_id) REFERENCES stackoverflow_questions (question_id)
+        )
+    ''')
+    # Per-user and per-question answer counts are index-only aggregates
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stackoverflow_answers_user_id ON stackoverflow_answers(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stackoverflow_answers_question_id ON stackoverflow_answers(question_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stackoverflow_questions_user_id ON stackoverflow_questions(user_id)")
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS github_users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            public_repos INTEGER,
+            followers INTEGER,
+            following INTEGER,
+            created_at TEXT,
+            updated_at TEXT,
+            bio TEXT,
+            location TEXT,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS github_repositories (
+            repo_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            name TEXT,
+            description TEXT,
+            language TEXT,
+            stars INTEGER,
+            forks INTEGER,
+            created_at TEXT,
+            updated_at TEXT,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES github_users (user_id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reddit_posts (
+            post_id TEXT PRIMARY KEY,
+            username TEXT,
+            subreddit TEXT,
+            title TEXT,
+            selftext_text_id INTEGER,
+            selftext_length INTEGER,
+            score INTEGER,
+            num_comments INTEGER,
+            created_utc INTEGER,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reddit_comments (
+            comment_id TEXT PRIMARY KEY,
+            post_id TEXT,
+            username TEXT,
+            subreddit TEXT,
+            body_text_id INTEGER,
+            body_length INTEGER,
+            score INTEGER,
+            created_utc INTEGER,
+            gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (post_id) REFERENCES reddit_posts (post_id)
+        )
+    ''')
+    
+    # Selftext and comment bodies live in text_blobs; older databases are converted explicitly
+    require_converted(conn)
+    create_text_store(conn)
+    create_sketch_table(conn)
+    create_rollups(conn)
+    create_tag_index(conn)
+    create_search_index(conn)
+    conn.commit()
+
+@tracing.trace_methods
 class SocialComputingDataCollector:
     """
     Collects traces of online engagement from various tech platforms
     following social computing methodology
     """
     
-    def __init__(self, db_path: str = "data/social_computing.db"):
+    def __init__(self, db_path: str = "data/social_computing.db", response_cache: Optional[ResponseCache] = None,
+                 user_staleness: timedelta = timedelta(days=7)):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Collection always writes to SQLite; analysis may read it through another backend
+        self.storage = SQLiteBackend(self.db_path)
         self.setup_database()
         
+        # Optional on-disk cache of API responses for development re-runs
+        self.response_cache = response_cache
+        
+        # Stored users collected more recently than this are not fetched again
+        self.user_staleness = user_staleness
+        
+        # Set while a collection pipeline is running; stores are queued to it.
+        # A per-thread pipeline takes only the stores of the thread that opened it
+        self.pipeline = None
+        self._local = threading.local()
+        
+        # (data version, summary) of the last get_collected_data_summary call
+        self._summary = None
+        
+        # Each platform has its own quota, so each gets its own limiter
+        self.rate_limiters = {
+            'stackoverflow': RateLimiter(rate=10, burst=1),
+            'github': RateLimiter(rate=10, burst=1),
+            'reddit': RateLimiter(rate=10, burst=10)
+        }
+        self.stats = CollectionStats()
+        
         # Initialize API clients
         self.setup_api_clients()
         
-      
+    @property
+    def replay_only(self) -> bool:
+        """True when every fetch must be served from the response cache"""
+        return self.response_cache is not None and self.response_cache.replay_only
         
     def setup_database(self):
         """Initialize SQLite database for storing collected traces"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create tables for different platforms
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stackoverflow_users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                reputation INTEGER,
-                creation_date TEXT,
-                last_access_date TEXT,
-                question_count INTEGER,
-                answer_count INTEGER,
-                badge_count INTEGER,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stackoverflow_questions (
-                question_id INTEGER PRIMARY KEY,
-                user_id INTEGER,
-                title TEXT,
-                tags TEXT,
-                score INTEGER,
-                view_count INTEGER,
-                answer_count INTEGER,
-                creation_date TEXT,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES stackoverflow_users (user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS github_users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                public_repos INTEGER,
-                followers INTEGER,
-                following INTEGER,
-                created_at TEXT,
-                updated_at TEXT,
-                bio TEXT,
-                location TEXT,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS github_repositories (
-                repo_id INTEGER PRIMARY KEY,
-                user_id INTEGER,
-                name TEXT,
-                description TEXT,
-                language TEXT,
-                stars INTEGER,
-                forks INTEGER,
-                created_at TEXT,
-                updated_at TEXT,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES github_users (user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reddit_posts (
-                post_id TEXT PRIMARY KEY,
-                username TEXT,
-                subreddit TEXT,
-                title TEXT,
-                selftext TEXT,
-                score INTEGER,
-                num_comments INTEGER,
-                created_utc INTEGER,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reddit_comments (
-                comment_id TEXT PRIMARY KEY,
-                post_id TEXT,
-                username TEXT,
-                subreddit TEXT,
-                body TEXT,
-                score INTEGER,
-                created_utc INTEGER,
-                gender_inferred TEXT,
-                collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (post_id) REFERENCES reddit_posts (post_id)
-            )
-        ''')
-        
-        conn.commit()
+        conn = self.storage.connect()
+        create_schema(conn)
         conn.close()
         
     def setup_api_clients(self):
@@ -145,160 +304,287 @@ class SocialComputingDataCollector:
         self.stack_exchange_key = os.getenv('STACK_EXCHANGE_API_KEY')
         self.stack_exchange_base_url = "https://api.stackexchange.com/2.3"
         
-        # GitHub API
-        github_token = os.getenv('GITHUB_TOKEN')
-        if github_token:
-            self.github_client = Github(github_token)
-        else:
-            self.github_client = None
+        # GitHub and Reddit clients are created on first use, so praw and
+        # PyGithub are only imported by runs that collect from them
+        self._github_token = os.getenv('GITHUB_TOKEN')
+        self._github_client = None
+        if not self._github_token:
             logger.warning("GitHub token not found. GitHub data collection will be limited.")
         
-        # Reddit API
-        reddit_client_id = os.getenv('REDDIT_CLIENT_ID')
-        reddit_client_secret = os.getenv('REDDIT_CLIENT_SECRET')
-        if reddit_client_id and reddit_client_secret:
-            self.reddit_client = praw.Reddit(
-                client_id=reddit_client_id,
-                client_secret=reddit_client_secret,
+        self._reddit_credentials = (os.getenv('REDDIT_CLIENT_ID'), os.getenv('REDDIT_CLIENT_SECRET'))
+        self._reddit_client = None
+        if not all(self._reddit_credentials):
+            logger.warning("Reddit credentials not found. Reddit data collection will be limited.")
+    
+    @property
+    def github_client(self):
+        """PyGithub client, or None without a token"""
+        if self._github_client is None and self._github_token:
+            from github import Github
+            self._github_client = Github(self._github_token)
+        return self._github_client
+    
+    @property
+    def reddit_client(self):
+        """praw client, or None without credentials"""
+        if self._reddit_client is None and all(self._reddit_credentials):
+            import praw
+            client_id, client_secret = self._reddit_credentials
+            self._reddit_client = praw.Reddit(
+                client_id=client_id,
+                client_secret=client_secret,
                 user_agent="GenderDisparityAnalysis/1.0"
             )
-        else:
-            self.reddit_client = None
-            logger.warning("Reddit credentials not found. Reddit data collection will be limited.")
+        return self._reddit_client
+    
+    def _get_stackexchange(self, path: str, params: Dict) -> Dict:
+        """Fetch a Stack Exchange API endpoint, going through the response cache if enabled"""
+        url = f"{self.stack_exchange_base_url}{path}"
+        params = dict(params, key=self.stack_exchange_key)
+        
+        def fetch():
+            self.rate_limiters['stackoverflow'].acquire()  # Respect rate limits
+            self.stats.record_api_call('stackoverflow')
+            response = requests.get(url, params=params)
+            response.raise_for_status()
+            tracing.add_bytes(len(response.content))
+            return response.json()
+        
+        if self.response_cache is None:
+            return fetch()
+        return self.response_cache.fetch(url, params, fetch)
     
     def collect_stackoverflow_data(self, tags: Optional[List[str]] = None, max_users: int = 500):
         """
-        Collect Stack Overflow user activity traces
+        Collect Stack Overflow user activity traces.
+        max_users caps the number of distinct question owners; each owner is
+        fetched at most once per call, and not at all if already stored and
+        fresher than user_staleness.
         """
         logger.info("Starting Stack Overflow data collection...")
         
         if not tags:
             tags = ['python', 'javascript', 'java', 'c++', 'c#']
         
-        user_count = 0
+        seen_users = set()
         for tag in tags:
-            if user_count >= max_users:
+            if len(seen_users) >= max_users:
                 break
             logger.info(f"Collecting data for tag: {tag}")
             
             # Get questions for the tag
-            questions_url = f"{self.stack_exchange_base_url}/questions"
             params = {
                 'tagged': tag,
                 'site': 'stackoverflow',
                 'pagesize': 100,
                 'sort': 'votes',
-                'order': 'desc',
-                'key': self.stack_exchange_key
+                'order': 'desc'
             }
             
             try:
-                response = requests.get(questions_url, params=params)
-                response.raise_for_status()
-                data = response.json()
-               
+                data = self._get_stackexchange("/questions", params)
+                
+                new_users = []
                 for question in data['items']:
                     owner = question.get('owner', {})
                     user_id = owner.get('user_id')
                     if not user_id:
                         continue
-                    if user_count >= max_users:
-                        break
-                    self._collect_stackoverflow_user(user_id)
+                    if user_id not in seen_users:
+                        if len(seen_users) >= max_users:
+                            break
+                        seen_users.add(user_id)
+                        new_users.append(user_id)
                     self._store_stackoverflow_question(question)
-                    user_count += 1
-                    time.sleep(0.1)  # Respect rate limits
+                
+                self._collect_stackoverflow_users(self._stale_stackoverflow_users(new_users))
                 
             except Exception as e:
                 logger.error(f"Error collecting Stack Overflow data for tag {tag}: {e}")
+                self.stats.record_error('stackoverflow', f"tag {tag}: {e}")
+        
+        logger.info(f"Resolved {len(seen_users)} distinct Stack Overflow users")
     
-    def _collect_stackoverflow_user(self, user_id: int):
-        """Collect individual Stack Overflow user data"""
-        user_url = f"{self.stack_exchange_base_url}/users/{user_id}"
+    def _stale_stackoverflow_users(self, user_ids: List[int]) -> List[int]:
+        """
+        Filter user ids down to those not stored yet or whose stored profile
+        is older than the configured staleness window
+        """
+        if not user_ids:
+            return []
+        
+        conn = self.storage.connect()
+        fresh = set()
+        # Stay well under SQLite's bound parameter limit
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT user_id FROM stackoverflow_users WHERE user_id IN ({placeholders}) "
+                f"AND collected_at >= datetime('now', ?)",
+                chunk + [f"-{int(self.user_staleness.total_seconds())} seconds"]
+            ).fetchall()
+            fresh.update(row[0] for row in rows)
+        conn.close()
+        
+        if fresh:
+            logger.info(f"Skipping {len(fresh)} Stack Overflow users collected within {self.user_staleness}")
+        return [user_id for user_id in user_ids if user_id not in fresh]
+    
+    def _collect_stackoverflow_users(self, user_ids: List[int]):
+        """Collect Stack Overflow user data, up to 100 users per API request"""
         params = {
             'site': 'stackoverflow',
-            'key': self.stack_exchange_key
+            'pagesize': 100
         }
         
-        try:
-            response = requests.get(user_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['items']:
-                user = data['items'][0]
-                
-                # Infer gender from username/profile
-                gender_inferred = self._infer_gender_from_username(user['display_name'])
-                
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO stackoverflow_users 
-                    (user_id, username, reputation, creation_date, last_access_date, 
-                     question_count, answer_count, badge_count, gender_inferred)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    user['user_id'],
-                    user['display_name'],
-                    user.get('reputation', 0),
-                    datetime.fromtimestamp(user['creation_date']).isoformat(),
-                    datetime.fromtimestamp(user['last_access_date']).isoformat(),
-                    user.get('question_count', 0),
-                    user.get('answer_count', 0),
-                    user.get('badge_counts', {}).get('total', 0),
-                    gender_inferred
-                ))
-                
-                conn.commit()
-                conn.close()
-                
-        except Exception as e:
-            logger.error(f"Error collecting user {user_id}: {e}")
+        for i in range(0, len(user_ids), 100):
+            chunk = user_ids[i:i + 100]
+            try:
+                data = self._get_stackexchange(f"/users/{';'.join(map(str, chunk))}", params)
+                for user in data['items']:
+                    self._emit('stackoverflow_users', user)
+            except Exception as e:
+                logger.error(f"Error collecting users {chunk}: {e}")
+                self.stats.record_error('stackoverflow', f"users {chunk[0]}..{chunk[-1]}: {e}")
+    
+    def _collect_stackoverflow_user(self, user_id: int):
+        """Collect individual Stack Overflow user data"""
+        self._collect_stackoverflow_users([user_id])
+    
+    def _stackoverflow_user_row(self, user: Dict) -> tuple:
+        """Normalize a Stack Exchange user item into a stackoverflow_users row"""
+        # Infer gender from username/profile
+        gender_inferred = self._infer_gender_from_username(user['display_name'])
+        return (
+            user['user_id'],
+            user['display_name'],
+            user.get('reputation', 0),
+            datetime.fromtimestamp(user['creation_date']).isoformat(),
+            datetime.fromtimestamp(user['last_access_date']).isoformat(),
+            user.get('question_count', 0),
+            user.get('answer_count', 0),
+            user.get('badge_counts', {}).get('total', 0),
+            gender_inferred
+        )
     
     def _store_stackoverflow_question(self, question: Dict):
         """Store Stack Overflow question data"""
         try:
-            owner = question.get('owner', {})
-            user_id = owner.get('user_id')
-            if not user_id:
-                logger.warning(f"Skipping question without user_id: {json.dumps(question, indent=2)}")
-                return
-            gender_inferred = self._infer_gender_from_username(owner.get('display_name', ''))
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO stackoverflow_questions 
-                (question_id, user_id, title, tags, score, view_count, 
-                 answer_count, creation_date, gender_inferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                question['question_id'],
-                user_id,
-                question['title'],
-                ','.join(question['tags']),
-                question['score'],
-                question['view_count'],
-                question['answer_count'],
-                datetime.fromtimestamp(question['creation_date']).isoformat(),
-                gender_inferred
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            self._emit('stackoverflow_questions', question)
         except Exception as e:
             logger.error(f"Error storing question {question.get('question_id', 'unknown')}: {e}")
     
+    def _stackoverflow_question_row(self, question: Dict) -> Optional[tuple]:
+        """Normalize a Stack Exchange question item into a stackoverflow_questions row"""
+        owner = question.get('owner', {})
+        user_id = owner.get('user_id')
+        if not user_id:
+            logger.warning(f"Skipping question without user_id: {json.dumps(question, indent=2)}")
+            return None
+        gender_inferred = self._infer_gender_from_username(owner.get('display_name', ''))
+        return (
+            question['question_id'],
+            user_id,
+            question['title'],
+            ','.join(question['tags']),
+            question['score'],
+            question['view_count'],
+            question['answer_count'],
+            datetime.fromtimestamp(question['creation_date']).isoformat(),
+            gender_inferred
+        )
+    
+    def collect_stackoverflow_answers(self, question_ids: Optional[List[int]] = None, workers: int = 4,
+                                      min_quota: int = 50):
+        """
+        Collect the answers to Stack Overflow questions, 100 questions per
+        request; by default, every stored question that has answers but none
+        collected yet. Batches are paged concurrently by up to workers threads,
+        all throttled by the shared Stack Overflow rate limiter. A backoff
+        from the API pauses every worker, and collection stops once the daily
+        quota falls below min_quota.
+        """
+        if question_ids is None:
+            question_ids = self._questions_without_answers()
+        batches = [question_ids[i:i + 100] for i in range(0, len(question_ids), 100)]
+        logger.info(f"Collecting answers to {len(question_ids)} Stack Overflow questions in {len(batches)} requests")
+        
+        quota_exhausted = threading.Event()
+        backoff_lock = threading.Lock()
+        resume_at = [0.0]
+        
+        def collect(batch: List[int]):
+            page = 1
+            while not quota_exhausted.is_set():
+                with backoff_lock:
+                    delay = resume_at[0] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                data = self._get_stackexchange(f"/questions/{';'.join(map(str, batch))}/answers", {
+                    'site': 'stackoverflow',
+                    'pagesize': 100,
+                    'page': page,
+                    'sort': 'creation',
+                    'order': 'asc'
+                })
+                for answer in data.get('items', []):
+                    self._emit('stackoverflow_answers', answer)
+                if data.get('backoff'):
+                    # The API asks for no further calls to this method for that many seconds
+                    with backoff_lock:
+                        resume_at[0] = max(resume_at[0], time.monotonic() + data['backoff'])
+                if data.get('quota_remaining', min_quota) < min_quota:
+                    logger.warning(f"Stack Exchange quota down to {data['quota_remaining']}; stopping answer collection")
+                    quota_exhausted.set()
+                if not data.get('has_more'):
+                    return
+                page += 1
+        
+        with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="answers") as executor:
+            futures = {executor.submit(collect, batch): batch for batch in batches}
+            for future, batch in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error collecting answers to questions {batch[0]}..{batch[-1]}: {e}")
+                    self.stats.record_error('stackoverflow', f"answers to {batch[0]}..{batch[-1]}: {e}")
+    
+    def _questions_without_answers(self) -> List[int]:
+        """Ids of stored questions with answers of which none have been collected"""
+        conn = self.storage.connect()
+        try:
+            return [row[0] for row in conn.execute('''
+                SELECT q.question_id FROM stackoverflow_questions q
+                WHERE q.answer_count > 0
+                  AND NOT EXISTS (SELECT 1 FROM stackoverflow_answers a WHERE a.question_id = q.question_id)
+                ORDER BY q.question_id
+            ''')]
+        finally:
+            conn.close()
+    
+    def _stackoverflow_answer_row(self, answer: Dict) -> tuple:
+        """Normalize a Stack Exchange answer item into a stackoverflow_answers row"""
+        # Answers of deleted accounts have an owner without user_id; they still count per question
+        owner = answer.get('owner', {})
+        gender_inferred = self._infer_gender_from_username(owner.get('display_name', ''))
+        return (
+            answer['answer_id'],
+            answer['question_id'],
+            owner.get('user_id'),
+            answer.get('score', 0),
+            int(answer.get('is_accepted', False)),
+            datetime.fromtimestamp(answer['creation_date']).isoformat(),
+            gender_inferred
+        )
+    
     def collect_github_data(self, languages: Optional[List[str]] = None, max_repos: int = 500):
         """
         Collect GitHub repository and user activity traces
         """
-        if not self.github_client:
+        if not self.github_client and not self.replay_only:
             logger.error("GitHub client not initialized")
+            self.stats.record_error('github', "GitHub client not initialized")
             return
             
         logger.info("Starting GitHub data collection...")
@@ -310,96 +596,120 @@ class SocialComputingDataCollector:
             logger.info(f"Collecting GitHub data for language: {language}")
             
             try:
-                # Search for repositories in the language
-                query = f"language:{language} stars:>10"
-                repos = self.github_client.search_repositories(query=query, sort='stars', order='desc')
+                repos = self._fetch_github_repositories(language, max_repos // len(languages))
                 
-                count = 0
                 for repo in repos:
-                    if count >= max_repos // len(languages):
-                        break
-                    
                     # Collect repository data
                     self._store_github_repository(repo)
                     
                     # Collect owner data
-                    self._collect_github_user(repo.owner)
-                    
-                    count += 1
-                    time.sleep(0.1)  # Respect rate limits
+                    self._collect_github_user(repo['owner'])
                     
             except Exception as e:
                 logger.error(f"Error collecting GitHub data for language {language}: {e}")
+                self.stats.record_error('github', f"language {language}: {e}")
+    
+    def _fetch_github_repositories(self, language: str, limit: int) -> List[Dict]:
+        """
+        Search repositories for a language and return them as plain dicts,
+        including the owner's profile, going through the response cache if enabled
+        """
+        query = f"language:{language} stars:>10"
+        params = {'q': query, 'sort': 'stars', 'order': 'desc', 'limit': limit}
+        
+        def fetch():
+            # Search for repositories in the language
+            repos = self.github_client.search_repositories(query=query, sort='stars', order='desc')
+            records = []
+            for repo in repos:
+                if len(records) >= limit:
+                    break
+                self.rate_limiters['github'].acquire()  # Respect rate limits
+                self.stats.record_api_call('github')
+                owner = repo.owner
+                records.append({
+                    'id': repo.id,
+                    'name': repo.name,
+                    'description': repo.description,
+                    'language': repo.language,
+                    'stargazers_count': repo.stargazers_count,
+                    'forks_count': repo.forks_count,
+                    'created_at': repo.created_at.isoformat(),
+                    'updated_at': repo.updated_at.isoformat(),
+                    'owner': {
+                        'id': owner.id,
+                        'login': owner.login,
+                        'public_repos': owner.public_repos,
+                        'followers': owner.followers,
+                        'following': owner.following,
+                        'created_at': owner.created_at.isoformat(),
+                        'updated_at': owner.updated_at.isoformat(),
+                        'bio': owner.bio,
+                        'location': owner.location
+                    }
+                })
+            return records
+        
+        if self.response_cache is None:
+            return fetch()
+        return self.response_cache.fetch("github:search/repositories", params, fetch)
     
-    def _collect_github_user(self, user):
+    def _collect_github_user(self, user: Dict):
         """Collect GitHub user data"""
         try:
-            # Infer gender from username/profile
-            gender_inferred = self._infer_gender_from_username(user.login)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO github_users 
-                (user_id, username, public_repos, followers, following, 
-                 created_at, updated_at, bio, location, gender_inferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user.id,
-                user.login,
-                user.public_repos,
-                user.followers,
-                user.following,
-                user.created_at.isoformat(),
-                user.updated_at.isoformat(),
-                user.bio,
-                user.location,
-                gender_inferred
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            self._emit('github_users', user)
         except Exception as e:
-            logger.error(f"Error collecting GitHub user {user.login}: {e}")
+            logger.error(f"Error collecting GitHub user {user.get('login')}: {e}")
     
-    def _store_github_repository(self, repo):
+    def _github_user_row(self, user: Dict) -> tuple:
+        """Normalize a GitHub user record into a github_users row"""
+        # Infer gender from username/profile
+        gender_inferred = self._infer_gender_from_username(user['login'])
+        return (
+            user['id'],
+            user['login'],
+            user['public_repos'],
+            user['followers'],
+            user['following'],
+            user['created_at'],
+            user['updated_at'],
+            user['bio'],
+            user['location'],
+            gender_inferred
+        )
+    
+    def _store_github_repository(self, repo: Dict):
         """Store GitHub repository data"""
         try:
-            # Print repo data for debugging
-            print(f"GitHub repo debug:{repo} id={repo.id}, owner_id={repo.owner.id}, name={repo.name}, language={repo.language}, stars={repo.stargazers_count}")
-            gender_inferred = self._infer_gender_from_username(repo.owner.login)
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO github_repositories 
-                (repo_id, user_id, name, description, language, stars, 
-                 forks, created_at, updated_at, gender_inferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                repo.id,
-                repo.owner.id,
-                repo.name,
-                repo.description,
-                repo.language,
-                repo.stargazers_count,
-                repo.forks_count,
-                repo.created_at.isoformat(),
-                repo.updated_at.isoformat(),
-                gender_inferred
-            ))
-            conn.commit()
-            conn.close()
+            logger.debug("GitHub repo id=%s owner_id=%s name=%s language=%s stars=%s", repo['id'],
+                         repo['owner']['id'], repo['name'], repo['language'], repo['stargazers_count'])
+            self._emit('github_repositories', repo)
         except Exception as e:
-            logger.error(f"Error storing GitHub repository {repo.name}: {e}")
+            logger.error(f"Error storing GitHub repository {repo.get('name')}: {e}")
+    
+    def _github_repository_row(self, repo: Dict) -> tuple:
+        """Normalize a GitHub repository record into a github_repositories row"""
+        gender_inferred = self._infer_gender_from_username(repo['owner']['login'])
+        return (
+            repo['id'],
+            repo['owner']['id'],
+            repo['name'],
+            repo['description'],
+            repo['language'],
+            repo['stargazers_count'],
+            repo['forks_count'],
+            repo['created_at'],
+            repo['updated_at'],
+            gender_inferred
+        )
     
     def collect_reddit_data(self, subreddits: Optional[List[str]] = None, max_posts: int = 1000, collect_comments: bool = True):
         """
         Collect Reddit post and comment activity traces from tech communities
         """
-        if not self.reddit_client:
+        if not self.reddit_client and not self.replay_only:
             logger.error("Reddit client not initialized")
+            self.stats.record_error('reddit', "Reddit client not initialized")
             return
             
         logger.info("Starting Reddit data collection...")
@@ -411,203 +721,413 @@ class SocialComputingDataCollector:
             logger.info(f"Collecting Reddit data from r/{subreddit_name}")
             
             try:
-                subreddit = self.reddit_client.subreddit(subreddit_name)
+                posts = self._fetch_reddit_posts(subreddit_name, max_posts // len(subreddits), collect_comments)
                 
-                count = 0
-                for post in subreddit.hot(limit=max_posts // len(subreddits)):
+                for post in posts:
                     # Store post data
                     self._store_reddit_post(post)
                     
-                    # Collect comments if enabled
-                    if collect_comments:
-                        self._collect_reddit_comments(post)
-                    
-                    count += 1
-                    if count % 10 == 0:
-                        time.sleep(1)  # Respect rate limits
+                    # Store comments if they were collected
+                    for comment in post.get('comments', []):
+                        self._store_reddit_comment(comment, post['id'])
                         
             except Exception as e:
                 logger.error(f"Error collecting Reddit data from r/{subreddit_name}: {e}")
+                self.stats.record_error('reddit', f"r/{subreddit_name}: {e}")
+    
+    def _fetch_reddit_posts(self, subreddit_name: str, limit: int, collect_comments: bool) -> List[Dict]:
+        """
+        Fetch hot posts (and optionally their comments) from a subreddit as plain
+        dicts, going through the response cache if enabled
+        """
+        params = {'limit': limit, 'comments': collect_comments}
+        
+        def fetch():
+            subreddit = self.reddit_client.subreddit(subreddit_name)
+            records = []
+            for post in subreddit.hot(limit=limit):
+                self.rate_limiters['reddit'].acquire()  # Respect rate limits
+                self.stats.record_api_call('reddit')
+                record = {
+                    'id': post.id,
+                    'author': post.author.name if post.author else "deleted",
+                    'subreddit': post.subreddit.display_name,
+                    'title': post.title,
+                    'selftext': post.selftext,
+                    'score': post.score,
+                    'num_comments': post.num_comments,
+                    'created_utc': post.created_utc
+                }
+                
+                # Collect comments if enabled
+                if collect_comments:
+                    record['comments'] = self._collect_reddit_comments(post)
+                records.append(record)
+            return records
+        
+        if self.response_cache is None:
+            return fetch()
+        return self.response_cache.fetch(f"reddit:r/{subreddit_name}/hot", params, fetch)
     
-    def _store_reddit_post(self, post):
+    def _store_reddit_post(self, post: Dict):
         """Store Reddit post data"""
         try:
-            gender_inferred = self._infer_gender_from_username(post.author.name if post.author else "deleted")
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO reddit_posts 
-                (post_id, username, subreddit, title, selftext, score, 
-                 num_comments, created_utc, gender_inferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                post.id,
-                post.author.name if post.author else "deleted",
-                post.subreddit.display_name,
-                post.title,
-                post.selftext,
-                post.score,
-                post.num_comments,
-                post.created_utc,
-                gender_inferred
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            self._emit('reddit_posts', post)
         except Exception as e:
-            logger.error(f"Error storing Reddit post {post.id}: {e}")
+            logger.error(f"Error storing Reddit post {post.get('id')}: {e}")
+    
+    def _reddit_post_row(self, post: Dict) -> tuple:
+        """Normalize a Reddit post record into a reddit_posts row"""
+        gender_inferred = self._infer_gender_from_username(post['author'])
+        return (
+            post['id'],
+            post['author'],
+            post['subreddit'],
+            post['title'],
+            post['selftext'],
+            len(post['selftext']),
+            post['score'],
+            post['num_comments'],
+            post['created_utc'],
+            gender_inferred
+        )
     
-    def _collect_reddit_comments(self, post, max_comments: int = 50):
-        """Collect comments from a Reddit post"""
+    def _collect_reddit_comments(self, post, max_comments: int = 50) -> List[Dict]:
+        """Collect comments from a Reddit post as plain dicts"""
+        records = []
         try:
             # Replace more=True to get all comments
             post.comments.replace_more(limit=0)
             comments = post.comments.list()
             
-            count = 0
             for comment in comments:
-                if count >= max_comments:
+                if len(records) >= max_comments:
                     break
                     
-                # Store comment data
-                self._store_reddit_comment(comment, post.id)
-                count += 1
+                records.append({
+                    'id': comment.id,
+                    'author': comment.author.name if comment.author else "deleted",
+                    'subreddit': comment.subreddit.display_name,
+                    'body': comment.body,
+                    'score': comment.score,
+                    'created_utc': comment.created_utc
+                })
                 
         except Exception as e:
             logger.error(f"Error collecting comments for post {post.id}: {e}")
+            self.stats.record_error('reddit', f"comments of {post.id}: {e}")
+        return records
     
-    def _store_reddit_comment(self, comment, post_id: str):
+    def _store_reddit_comment(self, comment: Dict, post_id: str):
         """Store Reddit comment data"""
         try:
-            gender_inferred = self._infer_gender_from_username(comment.author.name if comment.author else "deleted")
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO reddit_comments 
-                (comment_id, post_id, username, subreddit, body, score, 
-                 created_utc, gender_inferred)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                comment.id,
-                post_id,
-                comment.author.name if comment.author else "deleted",
-                comment.subreddit.display_name,
-                comment.body,
-                comment.score,
-                comment.created_utc,
-                gender_inferred
-            ))
-            
+            self._emit('reddit_comments', dict(comment, post_id=post_id))
+        except Exception as e:
+            logger.error(f"Error storing Reddit comment {comment.get('id')}: {e}")
+    
+    def _reddit_comment_row(self, comment: Dict) -> tuple:
+        """Normalize a Reddit comment record into a reddit_comments row"""
+        gender_inferred = self._infer_gender_from_username(comment['author'])
+        return (
+            comment['id'],
+            comment['post_id'],
+            comment['author'],
+            comment['subreddit'],
+            comment['body'],
+            len(comment['body']),
+            comment['score'],
+            comment['created_utc'],
+            gender_inferred
+        )
+    
+    def _transform_item(self, table: str, item: Dict) -> Optional[Tuple[str, tuple]]:
+        """Normalize a raw item destined for a table into a (table, row) pair"""
+        row_builders = {
+            'stackoverflow_users': self._stackoverflow_user_row,
+            'stackoverflow_questions': self._stackoverflow_question_row,
+            'stackoverflow_answers': self._stackoverflow_answer_row,
+            'github_users': self._github_user_row,
+            'github_repositories': self._github_repository_row,
+            'reddit_posts': self._reddit_post_row,
+            'reddit_comments': self._reddit_comment_row
+        }
+        row = row_builders[table](item)
+        if row is None:
+            return None
+        return table, row
+    
+    def _write_rows(self, conn: sqlite3.Connection, table: str, rows: List[tuple]):
+        """
+        Write a batch of normalized rows to a table and fold new keys into its
+        quantile sketches; re-collected rows that changed mark the sketches
+        stale. The caller commits
+        """
+        rows = intern_texts(conn, table, INSERT_COLUMNS[table], rows)
+        fresh, changed = new_rows(conn, table, INSERT_COLUMNS[table], rows)
+        conn.executemany(INSERT_STATEMENTS[table], rows)
+        if changed:
+            mark_stale(conn, table)
+        else:
+            update_sketches(conn, table, INSERT_COLUMNS[table], fresh)
+    
+    def _write_row(self, conn: sqlite3.Connection, table: str, row: tuple):
+        """
+        Write one row outside the pipeline. Folding a single value costs a
+        load and save of every sketch it touches, so the table is marked stale
+        instead and refresh_sketches() rebuilds it once collection is done
+        """
+        (row,) = intern_texts(conn, table, INSERT_COLUMNS[table], [row])
+        conn.execute(INSERT_STATEMENTS[table], row)
+        mark_stale(conn, table)
+    
+    def refresh_sketches(self) -> List[str]:
+        """Rebuild the quantile sketches of tables written since they were last built"""
+        conn = self.storage.connect()
+        try:
+            rebuilt = ensure_sketches(conn)
             conn.commit()
+        finally:
             conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error storing Reddit comment {comment.id}: {e}")
+        if rebuilt:
+            logger.info(f"Rebuilt quantile sketches for {', '.join(rebuilt)}")
+        return rebuilt
+    
+    def _emit(self, table: str, item: Dict):
+        """
+        Hand a raw item to the running collection pipeline, or transform
+        and store it inline when no pipeline is active
+        """
+        self.stats.record_item(table)
+        tracing.add_rows(1)
+        pipeline = getattr(self._local, 'pipeline', None) or self.pipeline
+        if pipeline is not None:
+            pipeline.put(table, item)
+            return
+        
+        result = self._transform_item(table, item)
+        if result is None:
+            return
+        conn = self.storage.connect()
+        try:
+            self._write_row(conn, *result)
+            conn.commit()
+        finally:
+            conn.close()
+        self._summary = None
+    
+    @contextmanager
+    def collection_pipeline(self, per_thread: bool = False, **pipeline_kwargs):
+        """
+        Run collection through a staged pipeline: fetchers queue raw items,
+        a transform stage normalizes them and infers gender, and a single
+        writer thread commits rows in batches. With per_thread, only stores
+        made by the calling thread go through it, so concurrent callers (the
+        scheduler's workers) can each run their own
+        """
+        pipeline = CollectionPipeline(
+            self.db_path,
+            transform=self._transform_item,
+            writer=self._write_rows,
+            **pipeline_kwargs
+        )
+        pipeline.start()
+        if per_thread:
+            self._local.pipeline = pipeline
+        else:
+            self.pipeline = pipeline
+        try:
+            yield pipeline
+        finally:
+            if per_thread:
+                self._local.pipeline = None
+            else:
+                self.pipeline = None
+            try:
+                pipeline.close()
+            finally:
+                # Rows committed before a writer failure still count
+                self.refresh_sketches()
+                self._summary = None
+                logger.info(f"Collection pipeline metrics: {json.dumps(pipeline.metrics())}")
+    
+    def collect_concurrently(self, stackoverflow_kwargs: Optional[Dict] = None,
+                             github_kwargs: Optional[Dict] = None,
+                             reddit_kwargs: Optional[Dict] = None,
+                             progress_interval: float = 5.0, **pipeline_kwargs) -> Dict:
+        """
+        Run the Stack Overflow, GitHub and Reddit collectors at the same time.
+        Each platform is throttled by its own rate limiter and all of them share
+        one collection pipeline (and so one writer) into the database. Progress
+        is logged every progress_interval seconds; returns per-platform timings.
+        """
+        collectors = {
+            'stackoverflow': (self.collect_stackoverflow_data, stackoverflow_kwargs or {}),
+            'github': (self.collect_github_data, github_kwargs or {}),
+            'reddit': (self.collect_reddit_data, reddit_kwargs or {})
+        }
+        durations = {}
+        
+        def run(platform, collect, kwargs):
+            start = time.perf_counter()
+            try:
+                collect(**kwargs)
+            finally:
+                durations[platform] = round(time.perf_counter() - start, 2)
+                logger.info(f"{platform} collection finished in {durations[platform]:.1f}s")
+        
+        start = time.perf_counter()
+        with self.collection_pipeline(**pipeline_kwargs) as pipeline:
+            with ThreadPoolExecutor(max_workers=len(collectors), thread_name_prefix="collector") as executor:
+                pending = {
+                    executor.submit(run, platform, collect, kwargs)
+                    for platform, (collect, kwargs) in collectors.items()
+                }
+                while pending:
+                    done, pending = wait(pending, timeout=progress_interval, return_when=FIRST_EXCEPTION)
+                    for future in done:
+                        if future.exception():
+                            logger.error(f"Collector failed: {future.exception()}")
+                    self._log_progress(pipeline, time.perf_counter() - start)
+        
+        elapsed = time.perf_counter() - start
+        self._log_progress(pipeline, elapsed)
+        return {'platform_seconds': durations, 'total_seconds': round(elapsed, 2)}
+    
+    def _log_progress(self, pipeline: CollectionPipeline, elapsed: float):
+        """Log a one-line progress and throughput summary of a running collection"""
+        stats = self.stats.snapshot()
+        per_platform = {}
+        for table, count in stats['items'].items():
+            platform = table.split('_')[0]
+            per_platform[platform] = per_platform.get(platform, 0) + count
+        
+        parts = [
+            f"{platform}: {count} items, {stats['api_calls'].get(platform, 0)} calls"
+            for platform, count in sorted(per_platform.items())
+        ]
+        metrics = pipeline.metrics()
+        logger.info(
+            f"[{elapsed:6.1f}s] " + " | ".join(parts) +
+            f" | written {metrics['write']['items']} rows ({metrics['write']['items_per_second']}/s),"
+            f" queued {metrics['fetch']['queue_depth']}+{metrics['transform']['queue_depth']}"
+        )
     
     def _infer_gender_from_username(self, username: str) -> str:
         """
         Infer gender from username using various heuristics
         This is a simplified approach - in practice, more sophisticated methods would be used
         """
-        if not username or username.lower() in ['deleted', 'anonymous', 'unknown']:
+        if not username or username.lower() in ANONYMOUS_USERNAMES:
             return 'anonymous'
         username_lower = username.lower()
-        female_indicators = ['sarah', 'emma', 'olivia', 'ava', 'isabella', 'sophia', 'charlotte', 'mia', 'amelia', 'harper']
-        male_indicators = ['james', 'john', 'robert', 'michael', 'william', 'david', 'richard', 'joseph', 'thomas', 'christopher']
-        if any(indicator in username_lower for indicator in female_indicators):
+        if any(indicator in username_lower for indicator in FEMALE_NAME_INDICATORS):
             return 'female'
-        elif any(indicator in username_lower for indicator in male_indicators):
+        elif any(indicator in username_lower for indicator in MALE_NAME_INDICATORS):
             return 'male'
-        if any(pattern in username_lower for pattern in ['girl', 'woman', 'lady', 'ms', 'miss', 'mrs']):
+        if any(pattern in username_lower for pattern in FEMALE_PATTERNS):
             return 'female'
-        elif any(pattern in username_lower for pattern in ['guy', 'man', 'mr', 'dude']):
+        elif any(pattern in username_lower for pattern in MALE_PATTERNS):
             return 'male'
         return 'anonymous'
     
     def get_collected_data_summary(self) -> Dict:
-        """Get summary of collected data"""
-        conn = sqlite3.connect(self.db_path)
-        
-        summary = {}
-        
-        # Stack Overflow summary
-        so_users = pd.read_sql_query("SELECT COUNT(*) as count FROM stackoverflow_users", conn)
-        so_questions = pd.read_sql_query("SELECT COUNT(*) as count FROM stackoverflow_questions", conn)
-        so_gender_dist = pd.read_sql_query(
-            "SELECT gender_inferred, COUNT(*) as count FROM stackoverflow_users GROUP BY gender_inferred", 
-            conn
-        )
-        
-        # GitHub summary
-        gh_users = pd.read_sql_query("SELECT COUNT(*) as count FROM github_users", conn)
-        gh_repos = pd.read_sql_query("SELECT COUNT(*) as count FROM github_repositories", conn)
-        gh_gender_dist = pd.read_sql_query(
-            "SELECT gender_inferred, COUNT(*) as count FROM github_users GROUP BY gender_inferred", 
-            conn
-        )
-        
-        # Reddit summary
-        reddit_posts = pd.read_sql_query("SELECT COUNT(*) as count FROM reddit_posts", conn)
-        reddit_gender_dist = pd.read_sql_query(
-            "SELECT gender_inferred, COUNT(*) as count FROM reddit_posts GROUP BY gender_inferred", 
-            conn
-        )
-        
-        conn.close()
-        
-        summary = {
-            'stackoverflow': {
-                'total_users': so_users['count'].iloc[0],
-                'total_questions': so_questions['count'].iloc[0],
-                'gender_distribution': so_gender_dist.to_dict('records')
-            },
-            'github': {
-                'total_users': gh_users['count'].iloc[0],
-                'total_repositories': gh_repos['count'].iloc[0],
-                'gender_distribution': gh_gender_dist.to_dict('records')
-            },
-            'reddit': {
-                'total_posts': reddit_posts['count'].iloc[0],
-                'gender_distribution': reddit_gender_dist.to_dict('records')
-            }
-        }
-        
+        """
+        Row counts and gender distributions of every table as plain Python
+        types; repeat calls are served from memory until the database changes
+        """
+        version = data_version(self.db_path)
+        if self._summary is not None and self._summary[0] == version:
+            return self._summary[1]
+        conn = self.storage.connect()
+        try:
+            summary = summarize(conn)
+        finally:
+            conn.close()
+        self._summary = (version, summary)
         return summary
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """Main function to run data collection"""
-    collector = SocialComputingDataCollector()
+    parser = argparse.ArgumentParser(description="Collect engagement traces from Stack Overflow, GitHub and Reddit")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to write to")
+    parser.add_argument('--cache-dir', help="Cache API responses on disk in this directory (development re-runs)")
+    parser.add_argument('--cache-ttl', type=float, help="Treat cached responses older than this many seconds as missing")
+    parser.add_argument('--cache-max-mb', type=float, default=512, help="Evict least recently used responses beyond this size")
+    parser.add_argument('--replay', action='store_true', help="Serve every request from the cache and never touch the network")
+    parser.add_argument('--inline', action='store_true', help="Store each item as it is fetched instead of using the collection pipeline")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per commit in the pipeline writer")
+    parser.add_argument('--concurrent', action='store_true', help="Run the three platform collectors at the same time")
+    parser.add_argument('--answers', action='store_true',
+                        help="Only collect answers to the stored Stack Overflow questions that have none collected yet")
+    parser.add_argument('--answer-workers', type=int, default=4, help="Answer batches paged at the same time")
+    parser.add_argument('--user-staleness-days', type=float, default=7, help="Re-fetch stored Stack Overflow users older than this")
+    parser.add_argument('--trace', help="Record a trace of collector calls to this file (Chrome trace format; .spans.json for plain JSON)")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG adds per-item diagnostics")
+    parser.add_argument('--log-json', action='store_true', help="Log one JSON object per line")
+    args = parser.parse_args(argv)
+    
+    configure_logging(args.log_level, args.log_json)
+    if args.trace:
+        tracing.trace_to(args.trace)
+    
+    response_cache = None
+    if args.cache_dir or args.replay:
+        response_cache = ResponseCache(
+            cache_dir=args.cache_dir or "data/http_cache",
+            ttl=args.cache_ttl,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            replay_only=args.replay
+        )
+    
+    collector = SocialComputingDataCollector(
+        db_path=args.db_path,
+        response_cache=response_cache,
+        user_staleness=timedelta(days=args.user_staleness_days)
+    )
     
     # Collect data from all platforms
     print("Starting comprehensive data collection...")
     
-    # Stack Overflow data collection
-    print("Collecting Stack Overflow data...")
-    collector.collect_stackoverflow_data(max_users=500)
-    
-    # GitHub data collection
-    print("Collecting GitHub data...")
-    collector.collect_github_data(max_repos=300)
+    def collect_all():
+        # Stack Overflow data collection
+        print("Collecting Stack Overflow data...")
+        collector.collect_stackoverflow_data(max_users=500)
+        
+        # GitHub data collection
+        print("Collecting GitHub data...")
+        collector.collect_github_data(max_repos=300)
+        
+        # Reddit data collection
+        print("Collecting Reddit data...")
+        collector.collect_reddit_data(max_posts=500)
     
-    # Reddit data collection
-    print("Collecting Reddit data...")
-    collector.collect_reddit_data(max_posts=500)
+    if args.answers:
+        with collector.collection_pipeline(batch_size=args.batch_size) as pipeline:
+            collector.collect_stackoverflow_answers(workers=args.answer_workers)
+        print(f"Pipeline metrics: {json.dumps(pipeline.metrics(), indent=2)}")
+    elif args.concurrent:
+        timings = collector.collect_concurrently(
+            stackoverflow_kwargs={'max_users': 500},
+            github_kwargs={'max_repos': 300},
+            reddit_kwargs={'max_posts': 500},
+            batch_size=args.batch_size
+        )
+        print(f"Concurrent collection timings: {json.dumps(timings)}")
+    elif args.inline:
+        collect_all()
+        collector.refresh_sketches()
+    else:
+        with collector.collection_pipeline(batch_size=args.batch_size) as pipeline:
+            collect_all()
+        print(f"Pipeline metrics: {json.dumps(pipeline.metrics(), indent=2)}")
     
     # Print summary
     summary = collector.get_collected_data_summary()
     print("\nData Collection Summary:")
+    print(json.dumps(summary, indent=2))
     
-    def convert(o):
-        if isinstance(o, np.generic):
-            return o.item()
-        raise TypeError
-
-    print(json.dumps(summary, indent=2, default=convert))
+    if response_cache is not None:
+        print(f"Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,64 @@
+"""
+Row counts and gender distributions of every collected table.
+
+summarize() answers all of them with one compound query (a UNION ALL of
+per-table GROUP BYs) and returns plain Python types, so the result can go
+straight to json.dumps. data_version() is a cheap token that changes with
+every committed write to the database file, from this process or any
+other; callers cache a summary against it.
+"""
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+# Table -> (platform, total key, gender distribution key)
+SUMMARY_TABLES = {
+    'stackoverflow_users': ('stackoverflow', 'total_users', 'gender_distribution'),
+    'stackoverflow_questions': ('stackoverflow', 'total_questions', 'question_gender_distribution'),
+    'stackoverflow_answers': ('stackoverflow', 'total_answers', 'answer_gender_distribution'),
+    'github_users': ('github', 'total_users', 'gender_distribution'),
+    'github_repositories': ('github', 'total_repositories', 'repository_gender_distribution'),
+    'reddit_posts': ('reddit', 'total_posts', 'gender_distribution'),
+    'reddit_comments': ('reddit', 'total_comments', 'comment_gender_distribution')
+}
+
+
+def data_version(db_path: Union[str, Path]) -> Tuple:
+    """
+    (mtime_ns, size) of the database file and its write-ahead log; any
+    committed write changes at least one of them
+    """
+    version = []
+    for path in (str(db_path), f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            version += [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            version += [None, None]
+    return tuple(version)
+
+
+def summarize(conn: sqlite3.Connection) -> Dict:
+    """Totals and gender distributions per platform from a single query"""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ','.join('?' * len(SUMMARY_TABLES))), list(SUMMARY_TABLES)
+    )]
+    summary = {}
+    for table, (platform, total_key, distribution_key) in SUMMARY_TABLES.items():
+        section = summary.setdefault(platform, {})
+        section[total_key] = 0
+        section[distribution_key] = []
+    if not tables:
+        return summary
+
+    query = ' UNION ALL '.join(
+        f"SELECT '{table}', gender_inferred, COUNT(*) FROM {table} GROUP BY gender_inferred"
+        for table in tables
+    )
+    for table, gender, count in conn.execute(f"SELECT * FROM ({query}) ORDER BY 1, 2"):
+        platform, total_key, distribution_key = SUMMARY_TABLES[table]
+        summary[platform][total_key] += count
+        summary[platform][distribution_key].append({'gender_inferred': gender, 'count': count})
+    return summary
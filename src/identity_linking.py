@@ -0,0 +1,254 @@
+"""
+Propose links between accounts on different platforms with similar usernames.
+
+Usernames are lowercased and stripped of separators. Accounts with the same
+normalized name are always paired. The distinct names are cut into character
+trigrams and summarised by a MinHash signature; locality-sensitive hashing
+splits each signature into bands, and names sharing any band land in the
+same bucket and become candidate pairs, so only similar names are ever
+compared and the stage runs in near-linear time instead of comparing all
+pairs. The fraction of equal signature entries estimates the trigram
+Jaccard similarity of each candidate pair, which is turned into a
+confidence score.
+
+Matching handles is evidence, not proof: short or common names (e.g. "alex")
+link many unrelated people, so confidence is discounted for short names.
+"""
+import logging
+import re
+import sqlite3
+import zlib
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from time_series import gender_sql
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+BANDS = 32  # 4 rows per band: pairs above ~0.4 Jaccard are very likely to collide
+SHINGLE_SIZE = 3
+# Buckets of this many distinct names are dominated by common fragments and would
+# make pairing quadratic; they are skipped and counted in the log
+MAX_BUCKET_SIZE = 50
+# Normalized names shorter than this get proportionally lower confidence
+FULL_CONFIDENCE_LENGTH = 8
+
+ACCOUNT_QUERIES = {
+    'stackoverflow': f"SELECT CAST(user_id AS TEXT) AS account_id, username, {gender_sql('u')} AS gender "
+                     f"FROM stackoverflow_users u",
+    'github': f"SELECT CAST(user_id AS TEXT) AS account_id, username, {gender_sql('u')} AS gender "
+              f"FROM github_users u",
+    'reddit': f'''
+        SELECT username AS account_id, username, MAX({gender_sql('u')}) AS gender
+        FROM (SELECT username, gender_inferred FROM reddit_posts
+              UNION ALL SELECT username, gender_inferred FROM reddit_comments) u
+        WHERE username NOT IN ('deleted', '[deleted]', 'AutoModerator')
+        GROUP BY username
+    '''
+}
+
+
+def normalize_username(username: str) -> str:
+    """Lowercase with punctuation, spaces and underscores removed"""
+    return re.sub(r'[\W_]+', '', str(username).lower())
+
+
+def _shingles(name: str) -> List[str]:
+    padded = f"^{name}$"
+    return [padded[i:i + SHINGLE_SIZE] for i in range(max(len(padded) - SHINGLE_SIZE + 1, 1))]
+
+
+def load_accounts(conn: sqlite3.Connection) -> pd.DataFrame:
+    """platform, account_id, username, gender and normalized name of every account with a usable name"""
+    frames = []
+    for platform, query in ACCOUNT_QUERIES.items():
+        try:
+            frame = pd.read_sql_query(query, conn)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            # Table not collected yet
+            continue
+        frames.append(frame.assign(platform=platform))
+    if not frames:
+        return pd.DataFrame(columns=['platform', 'account_id', 'username', 'gender', 'normalized'])
+    accounts = pd.concat(frames, ignore_index=True).dropna(subset=['username'])
+    accounts['normalized'] = accounts['username'].map(normalize_username)
+    accounts = accounts[accounts['normalized'].str.len() > 0]
+    return accounts[['platform', 'account_id', 'username', 'gender', 'normalized']].reset_index(drop=True)
+
+
+def minhash_signatures(names: pd.Series, num_perm: int = NUM_PERM, seed: int = 1,
+                       chunk_names: int = 20_000) -> np.ndarray:
+    """(len(names), num_perm) MinHash signatures of the names' trigram sets"""
+    shingle_lists = [_shingles(name) for name in names]
+    lengths = np.fromiter((len(s) for s in shingle_lists), dtype=np.int64, count=len(shingle_lists))
+    codes, uniques = pd.factorize(pd.Series([s for shingles in shingle_lists for s in shingles], dtype=object))
+    # Stable 32-bit hash per distinct trigram
+    unique_hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in uniques), dtype=np.uint64, count=len(uniques))
+    hashes = unique_hashes[codes]
+
+    rng = np.random.default_rng(seed)
+    # Multiply-shift hashing: the top 32 bits of a * h + b (mod 2**64), no division needed
+    a = (rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)[:, None]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    signatures = np.empty((len(names), num_perm), dtype=np.uint32)
+    for start in range(0, len(names), chunk_names):
+        stop = min(start + chunk_names, len(names))
+        block = hashes[offsets[start]:offsets[stop]]
+        values = (a * block[None, :] + b) >> np.uint64(32)
+        signatures[start:stop] = np.minimum.reduceat(values, offsets[start:stop] - offsets[start], axis=1).T
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int = BANDS,
+                    max_bucket_size: int = MAX_BUCKET_SIZE) -> np.ndarray:
+    """(k, 2) array of row index pairs (i < j) sharing at least one LSH band"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    mixers = np.random.default_rng(7).integers(1, 2 ** 63, rows, dtype=np.uint64)
+    found = []
+    skipped = 0
+    for band in range(bands):
+        keys = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) @ mixers
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        skipped += int((sizes > max_bucket_size).sum())
+        # Pair up the members of all buckets of the same size at once
+        for size in np.unique(sizes[(sizes >= 2) & (sizes <= max_bucket_size)]):
+            members = order[starts[sizes == size][:, None] + np.arange(size)]
+            first, second = np.triu_indices(size, k=1)
+            pairs = np.stack([members[:, first].ravel(), members[:, second].ravel()], axis=1)
+            found.append(np.sort(pairs, axis=1))
+    if skipped:
+        logger.info(f"Skipped {skipped} LSH buckets of more than {max_bucket_size} names")
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found).astype(np.int64)
+    encoded = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    return np.stack([encoded // n, encoded % n], axis=1)
+
+
+def _account_pairs(codes: np.ndarray, platforms: np.ndarray, name_pairs: np.ndarray,
+                   name_similarity: np.ndarray) -> tuple:
+    """Cross-platform (i, j) account row pairs behind pairs of name codes, with each pair's similarity"""
+    members = pd.DataFrame({'code': codes, 'row': np.arange(len(codes)), 'platform': platforms})
+    pairs = pd.DataFrame({'code_a': name_pairs[:, 0], 'code_b': name_pairs[:, 1], 'similarity': name_similarity})
+    pairs = pairs.merge(members.add_suffix('_a'), on='code_a').merge(members.add_suffix('_b'), on='code_b')
+    # A name paired with itself yields each account pair twice
+    pairs = pairs[(pairs['platform_a'] != pairs['platform_b'])
+                  & ((pairs['code_a'] != pairs['code_b']) | (pairs['row_a'] < pairs['row_b']))]
+    return pairs[['row_a', 'row_b']].to_numpy(dtype=np.int64), pairs['similarity'].to_numpy()
+
+
+def _confidence(similarity: np.ndarray, left: pd.Series, right: pd.Series, exact: np.ndarray) -> np.ndarray:
+    lengths = np.minimum(left.str.len().to_numpy(), right.str.len().to_numpy())
+    score = np.where(exact, 1.0, similarity)
+    return score * np.minimum(lengths / FULL_CONFIDENCE_LENGTH, 1.0)
+
+
+def link_accounts(accounts: pd.DataFrame, min_similarity: float = 0.5,
+                  num_perm: int = NUM_PERM, bands: int = BANDS) -> pd.DataFrame:
+    """
+    Cross-platform account pairs whose usernames look alike, with the estimated
+    trigram Jaccard similarity and a 0-1 confidence, best matches first
+    """
+    columns = ['platform_a', 'account_a', 'username_a', 'gender_a',
+               'platform_b', 'account_b', 'username_b', 'gender_b', 'similarity', 'confidence']
+    if len(accounts) < 2:
+        return pd.DataFrame(columns=columns)
+
+    # Identical names would share every band and overflow their buckets, so LSH
+    # compares distinct names and each name is paired with itself directly
+    codes, names = pd.factorize(accounts['normalized'])
+    signatures = minhash_signatures(pd.Series(names), num_perm)
+    name_pairs = candidate_pairs(signatures, bands)
+    similarity = (signatures[name_pairs[:, 0]] == signatures[name_pairs[:, 1]]).mean(axis=1)
+    keep = similarity >= min_similarity
+    same_name = np.repeat(np.arange(len(names)), 2).reshape(-1, 2)
+    pairs, similarity = _account_pairs(
+        codes, accounts['platform'].to_numpy(),
+        np.concatenate([same_name, name_pairs[keep]]), np.concatenate([np.ones(len(names)), similarity[keep]])
+    )
+    if len(pairs) == 0:
+        return pd.DataFrame(columns=columns)
+
+    left = accounts.iloc[pairs[:, 0]].reset_index(drop=True)
+    right = accounts.iloc[pairs[:, 1]].reset_index(drop=True)
+    exact = (left['normalized'] == right['normalized']).to_numpy()
+    links = pd.DataFrame({
+        'platform_a': left['platform'], 'account_a': left['account_id'],
+        'username_a': left['username'], 'gender_a': left['gender'],
+        'platform_b': right['platform'], 'account_b': right['account_id'],
+        'username_b': right['username'], 'gender_b': right['gender'],
+        'similarity': np.where(exact, 1.0, similarity),
+        'confidence': _confidence(similarity, left['normalized'], right['normalized'], exact)
+    })
+    # Keep a consistent platform order within each pair
+    swap = links['platform_a'] > links['platform_b']
+    for suffix in ('platform', 'account', 'username', 'gender'):
+        a, b = f"{suffix}_a", f"{suffix}_b"
+        links.loc[swap, [a, b]] = links.loc[swap, [b, a]].to_numpy()
+    return links.sort_values('confidence', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def store_links(conn: sqlite3.Connection, links: pd.DataFrame):
+    """Replace the identity_links table with a fresh linking run; the caller commits"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS identity_links (
+            platform_a TEXT,
+            account_a TEXT,
+            username_a TEXT,
+            platform_b TEXT,
+            account_b TEXT,
+            username_b TEXT,
+            similarity REAL,
+            confidence REAL,
+            linked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (platform_a, account_a, platform_b, account_b)
+        )
+    ''')
+    conn.execute("DELETE FROM identity_links")
+    conn.executemany('''
+        INSERT OR REPLACE INTO identity_links
+        (platform_a, account_a, username_a, platform_b, account_b, username_b, similarity, confidence)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', links[['platform_a', 'account_a', 'username_a', 'platform_b', 'account_b', 'username_b',
+                'similarity', 'confidence']].itertuples(index=False, name=None))
+
+
+def load_links(conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    The links stored by the last linking run, shaped like link_accounts()
+    with each side's current gender; empty if linking has not been run
+    """
+    columns = ['platform_a', 'account_a', 'username_a', 'gender_a',
+               'platform_b', 'account_b', 'username_b', 'gender_b', 'similarity', 'confidence']
+    try:
+        links = pd.read_sql_query('''
+            SELECT platform_a, account_a, username_a, platform_b, account_b, username_b, similarity, confidence
+            FROM identity_links ORDER BY confidence DESC
+        ''', conn)
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=columns)
+    genders = load_accounts(conn).drop_duplicates(['platform', 'account_id']).set_index(['platform', 'account_id'])['gender']
+    for side in ('a', 'b'):
+        keys = pd.MultiIndex.from_arrays([links[f"platform_{side}"], links[f"account_{side}"]])
+        links[f"gender_{side}"] = genders.reindex(keys).to_numpy()
+    return links[columns]
+
+
+def links_summary(links: pd.DataFrame, min_confidence: float = 0.8) -> Dict:
+    """Number of confident links per platform pair and how often both sides got the same gender"""
+    confident = links[links['confidence'] >= min_confidence]
+    summary = {'links': len(confident), 'min_confidence': min_confidence, 'platform_pairs': {}}
+    for (first, second), group in confident.groupby(['platform_a', 'platform_b']):
+        summary['platform_pairs'][f"{first}-{second}"] = {
+            'links': len(group),
+            'gender_agreement': float((group['gender_a'] == group['gender_b']).mean())
+        }
+    return summary
@@ -0,0 +1,185 @@
+"""
+Who replies to whom on Reddit, by gender.
+
+Each comment is an edge from its author to the author of the post it was
+made on. Users are numbered once, and edges are held in scipy CSR matrices
+(one counting comments, one summing their scores) next to an integer
+gender code per user, so building and analysing a graph of millions of
+edges needs a few arrays rather than a Python object per node and edge.
+Per-gender aggregates are sparse products with a user-by-gender indicator
+matrix. to_networkx() converts small graphs for ad-hoc exploration.
+"""
+import sqlite3
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from time_series import gender_sql
+
+GENDERS = ['female', 'male', 'anonymous']
+# Placeholder authors that are not real accounts
+EXCLUDED_USERS = ('deleted', '[deleted]', 'AutoModerator')
+
+EDGE_QUERY = f'''
+    SELECT c.username AS commenter, {gender_sql('c')} AS commenter_gender,
+           p.username AS author, {gender_sql('p')} AS author_gender,
+           COALESCE(c.score, 0) AS score
+    FROM reddit_comments c
+    JOIN reddit_posts p ON p.post_id = c.post_id
+    WHERE c.username NOT IN ({','.join('?' * len(EXCLUDED_USERS))})
+      AND p.username NOT IN ({','.join('?' * len(EXCLUDED_USERS))})
+      AND c.username != p.username
+'''
+
+
+class InteractionGraph:
+    """Directed commenter-to-post-author graph in CSR form with a gender per user"""
+
+    def __init__(self, users: np.ndarray, genders: np.ndarray, counts: sparse.csr_matrix,
+                 scores: sparse.csr_matrix):
+        self.users = users
+        self.genders = genders
+        self.counts = counts
+        self.scores = scores
+        n = len(users)
+        self.indicator = sparse.csr_matrix(
+            (np.ones(n), (np.arange(n), genders)), shape=(n, len(GENDERS))
+        )
+
+    @classmethod
+    def from_edges(cls, edges: pd.DataFrame) -> 'InteractionGraph':
+        """Build from rows of commenter, commenter_gender, author, author_gender, score"""
+        codes, users = pd.factorize(pd.concat([edges['commenter'], edges['author']], ignore_index=True))
+        source, target = codes[:len(edges)], codes[len(edges):]
+        gender_codes = pd.Categorical(
+            pd.concat([edges['commenter_gender'], edges['author_gender']], ignore_index=True),
+            categories=GENDERS
+        ).codes
+        genders = np.full(len(users), GENDERS.index('anonymous'), dtype=np.int8)
+        known = gender_codes >= 0
+        genders[codes[known]] = gender_codes[known]
+
+        shape = (len(users), len(users))
+        # Duplicate (source, target) pairs are summed when converting to CSR
+        counts = sparse.coo_matrix((np.ones(len(edges)), (source, target)), shape=shape).tocsr()
+        scores = sparse.coo_matrix((edges['score'].to_numpy(dtype=float), (source, target)), shape=shape).tocsr()
+        return cls(np.asarray(users, dtype=object), genders, counts, scores)
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> 'InteractionGraph':
+        edges = pd.read_sql_query(EDGE_QUERY, conn, params=EXCLUDED_USERS * 2)
+        return cls.from_edges(edges)
+
+    @property
+    def num_users(self) -> int:
+        return len(self.users)
+
+    @property
+    def num_edges(self) -> int:
+        """Distinct commenter-author pairs"""
+        return self.counts.nnz
+
+    def mixing_matrix(self, weight: str = 'count') -> pd.DataFrame:
+        """
+        Commenter gender (rows) by post author gender (columns), weighted by
+        comments ('count'), summed comment score ('score') or distinct pairs ('pairs')
+        """
+        matrix = {'count': self.counts, 'score': self.scores,
+                  'pairs': (self.counts > 0).astype(float)}[weight]
+        mixed = (self.indicator.T @ matrix @ self.indicator).toarray()
+        return pd.DataFrame(mixed, index=GENDERS, columns=GENDERS)
+
+    def gender_assortativity(self, weight: str = 'count') -> Optional[float]:
+        """
+        Newman's assortativity coefficient for gender: 1 when users only reply
+        to their own gender, 0 when replies ignore gender
+        """
+        e = self.mixing_matrix(weight).to_numpy()
+        total = e.sum()
+        if total == 0:
+            return None
+        e = e / total
+        expected = float(e.sum(axis=1) @ e.sum(axis=0))
+        if expected == 1:
+            return None
+        return float((np.trace(e) - expected) / (1 - expected))
+
+    def degree_distribution(self) -> Dict[str, Dict]:
+        """
+        Per gender, summary stats and histograms of out-degree (distinct authors
+        replied to), in-degree (distinct commenters received) and comments sent
+        and received
+        """
+        pairs = (self.counts > 0).astype(np.int64)
+        degrees = {
+            'out_degree': np.asarray(pairs.sum(axis=1)).ravel(),
+            'in_degree': np.asarray(pairs.sum(axis=0)).ravel(),
+            'comments_sent': np.asarray(self.counts.sum(axis=1)).ravel(),
+            'comments_received': np.asarray(self.counts.sum(axis=0)).ravel()
+        }
+        result = {}
+        for code, gender in enumerate(GENDERS):
+            members = self.genders == code
+            if not members.any():
+                continue
+            result[gender] = {}
+            for name, values in degrees.items():
+                values = values[members].astype(np.int64)
+                histogram = np.bincount(values)
+                result[gender][name] = {
+                    'mean': float(values.mean()),
+                    'median': float(np.median(values)),
+                    'max': int(values.max()),
+                    'histogram': {int(d): int(c) for d, c in zip(np.nonzero(histogram)[0], histogram[histogram > 0])}
+                }
+        return result
+
+    def reply_score_asymmetry(self) -> Dict:
+        """
+        Mean comment score for each commenter-to-author gender pair, and the
+        difference between each pair and its reverse (e.g. female->male minus male->female)
+        """
+        counts = self.mixing_matrix('count')
+        means = self.mixing_matrix('score') / counts.where(counts > 0)
+        asymmetry = {}
+        for i, first in enumerate(GENDERS):
+            for second in GENDERS[i + 1:]:
+                forward, backward = means.loc[first, second], means.loc[second, first]
+                if pd.notna(forward) and pd.notna(backward):
+                    asymmetry[f"{first}->{second} vs {second}->{first}"] = float(forward - backward)
+        return {
+            'mean_score': {
+                f"{commenter}->{author}": float(means.loc[commenter, author])
+                for commenter in GENDERS for author in GENDERS if pd.notna(means.loc[commenter, author])
+            },
+            'asymmetry': asymmetry
+        }
+
+    def summary(self) -> Dict:
+        """Everything above in one dict for reports"""
+        return {
+            'users': self.num_users,
+            'edges': self.num_edges,
+            'comments': int(self.counts.sum()),
+            'gender_assortativity': self.gender_assortativity(),
+            'mixing_matrix': self.mixing_matrix().to_dict(),
+            'degree_distribution': self.degree_distribution(),
+            'reply_score_asymmetry': self.reply_score_asymmetry()
+        }
+
+    def to_networkx(self, max_edges: int = 100_000):
+        """networkx DiGraph with gender node attributes and comments/score edge weights"""
+        if self.num_edges > max_edges:
+            raise ValueError(f"Graph has {self.num_edges} edges; raise max_edges to convert it anyway")
+        import networkx as nx
+        graph = nx.DiGraph()
+        graph.add_nodes_from((user, {'gender': GENDERS[code]}) for user, code in zip(self.users, self.genders))
+        coo = self.counts.tocoo()
+        scores = self.scores.tocsr()
+        graph.add_edges_from(
+            (self.users[i], self.users[j], {'comments': int(c), 'score': float(scores[i, j])})
+            for i, j, c in zip(coo.row, coo.col, coo.data)
+        )
+        return graph
@@ -0,0 +1,252 @@
+"""
+Pre-aggregated cube of engagement metrics for interactive filtering.
+
+Each cell of olap_cube is one (source table, metric, dimension value, gender,
+month) with the count, sum and sum of squares of the metric plus a KLL
+sketch for quantiles. Dimensions are the subreddit for Reddit, the language
+for GitHub repositories and the tag for Stack Overflow questions; the
+dimension '*' holds every row once. A question with several tags is counted
+under each of them, so summing several tags can count a question twice,
+while subreddits and languages are exact.
+
+OlapCube loads the cells into arrays once; a filter on dates and dimension
+values is a boolean mask over a few thousand cells and a group-by on
+gender, independent of how many rows were collected. Triggers on the source
+tables flag a table in olap_cube_stale whenever a row is inserted, deleted
+or has a cube column changed (a metric, the gender, the dimension or the
+date), whoever the writer is; ensure_cube() rebuilds the flagged tables.
+"""
+import re
+import sqlite3
+from typing import Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from quantile_sketch import KLLSketch
+from time_series import gender_sql
+
+ALL_DIMENSIONS = '*'
+
+CUBE_SOURCES = {
+    'stackoverflow_questions': {
+        'dimension': 'tag',
+        'month': "strftime('%Y-%m-01', s.creation_date)",
+        'metrics': {'score': 's.score', 'view_count': 's.view_count', 'answer_count': 's.answer_count'}
+    },
+    'github_repositories': {
+        'dimension': 's.language',
+        'month': "strftime('%Y-%m-01', s.created_at)",
+        'metrics': {'stars': 's.stars', 'forks': 's.forks'}
+    },
+    'reddit_posts': {
+        'dimension': 's.subreddit',
+        'month': "strftime('%Y-%m-01', s.created_utc, 'unixepoch')",
+        'metrics': {'score': 's.score', 'num_comments': 's.num_comments'}
+    },
+    'reddit_comments': {
+        'dimension': 's.subreddit',
+        'month': "strftime('%Y-%m-01', s.created_utc, 'unixepoch')",
+        'metrics': {'score': 's.score', 'comment_length': 's.body_length'}
+    }
+}
+KEYS = ['dimension', 'gender', 'month']
+
+
+def create_cube_tables(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS olap_cube (
+            source TEXT,
+            metric TEXT,
+            dimension TEXT,
+            gender TEXT,
+            month TEXT,
+            n INTEGER,
+            total REAL,
+            total_sq REAL,
+            sketch BLOB,
+            PRIMARY KEY (source, metric, dimension, gender, month)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS olap_cube_meta (
+            source TEXT PRIMARY KEY,
+            built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'olap_cube_stale'"
+    ).fetchone()
+    # Tables written since their cells were built
+    conn.execute("CREATE TABLE IF NOT EXISTS olap_cube_stale (source TEXT PRIMARY KEY)")
+    sources = _existing_sources(conn)
+    if not existed:
+        # Cubes built before the flags existed may be behind their tables
+        conn.executemany("INSERT OR IGNORE INTO olap_cube_stale (source) VALUES (?)", [(s,) for s in sources])
+    for source in sources:
+        _create_stale_triggers(conn, source)
+
+
+def _create_stale_triggers(conn: sqlite3.Connection, source: str):
+    spec = CUBE_SOURCES[source]
+    columns = ['gender_inferred'] + [expr[2:] for expr in spec['metrics'].values()]
+    columns += re.findall(r'\bs\.(\w+)', spec['month'] + ' ' + spec['dimension'])
+    if spec['dimension'] == 'tag':
+        columns.append('tags')
+    flag = f"INSERT OR IGNORE INTO olap_cube_stale (source) VALUES ('{source}')"
+    for event in ('INSERT', 'DELETE', f"UPDATE OF {', '.join(dict.fromkeys(columns))}"):
+        name = f"olap_cube_stale_{source}_{event.split()[0].lower()}"
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {source} BEGIN {flag}; END")
+
+
+def _existing_sources(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ','.join('?' * len(CUBE_SOURCES))), list(CUBE_SOURCES)
+    )]
+
+
+def stale_sources(conn: sqlite3.Connection) -> List[str]:
+    """Source tables never built into the cube or written since they were"""
+    built = {row[0] for row in conn.execute("SELECT source FROM olap_cube_meta")}
+    flagged = {row[0] for row in conn.execute("SELECT source FROM olap_cube_stale")}
+    return [source for source in _existing_sources(conn) if source not in built or source in flagged]
+
+
+def _rows(conn: sqlite3.Connection, source: str, by_tag: bool = False) -> pd.DataFrame:
+    spec = CUBE_SOURCES[source]
+    metrics = ', '.join(f"{expr} AS {name}" for name, expr in spec['metrics'].items())
+    if by_tag:
+        dimension, join = "t.tag", "JOIN question_tags t ON t.question_id = s.question_id"
+    elif spec['dimension'] == 'tag':
+        dimension, join = f"'{ALL_DIMENSIONS}'", ""
+    else:
+        dimension, join = f"COALESCE({spec['dimension']}, 'unknown')", ""
+    return pd.read_sql_query(f'''
+        SELECT {dimension} AS dimension, {gender_sql('s')} AS gender,
+               COALESCE({spec['month']}, '') AS month, {metrics}
+        FROM {source} s {join}
+    ''', conn)
+
+
+def _cells(df: pd.DataFrame, source: str, metric: str) -> List[tuple]:
+    values = df[metric].astype(float)
+    df = df.assign(_value=values, _sq=values ** 2)[KEYS + ['_value', '_sq']].dropna(subset=['_value'])
+    grouped = df.groupby(KEYS, sort=False)
+    stats = grouped['_value'].agg(['count', 'sum']).join(grouped['_sq'].sum())
+    positions = grouped.indices
+    array = df['_value'].to_numpy()
+    cells = []
+    for key, count, total, total_sq in stats.itertuples(name=None):
+        sketch = KLLSketch()
+        sketch.update_many(array[positions[key]])
+        cells.append((source, metric, *key, int(count), float(total), float(total_sq), sketch.to_bytes()))
+    return cells
+
+
+def build_cube(conn: sqlite3.Connection, sources: Optional[Iterable[str]] = None):
+    """Recompute the cube cells of the given tables (all by default); the caller commits"""
+    create_cube_tables(conn)
+    for source in sources or _existing_sources(conn):
+        frames = [_rows(conn, source)]
+        if CUBE_SOURCES[source]['dimension'] == 'tag':
+            frames.append(_rows(conn, source, by_tag=True))
+        else:
+            frames.append(frames[0].assign(dimension=ALL_DIMENSIONS))
+        conn.execute("DELETE FROM olap_cube WHERE source = ?", (source,))
+        for metric in CUBE_SOURCES[source]['metrics']:
+            for frame in frames:
+                if not frame.empty:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO olap_cube VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        _cells(frame, source, metric)
+                    )
+        conn.execute("INSERT OR REPLACE INTO olap_cube_meta (source) VALUES (?)", (source,))
+        conn.execute("DELETE FROM olap_cube_stale WHERE source = ?", (source,))
+
+
+def ensure_cube(conn: sqlite3.Connection) -> List[str]:
+    """Rebuild the cube for tables written since it was built; returns the rebuilt tables; the caller commits"""
+    create_cube_tables(conn)
+    stale = stale_sources(conn)
+    if stale:
+        build_cube(conn, stale)
+    return stale
+
+
+class OlapCube:
+    """The cube cells held in memory, sliced by source, metric, dimension values and months"""
+
+    def __init__(self, cells: pd.DataFrame):
+        self.cells = {key: part.reset_index(drop=True) for key, part in cells.groupby(['source', 'metric'])}
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> 'OlapCube':
+        return cls(pd.read_sql_query("SELECT * FROM olap_cube", conn))
+
+    def metrics(self, source: str) -> List[str]:
+        return [metric for (table, metric) in self.cells if table == source]
+
+    def dimension_values(self, source: str) -> List[str]:
+        """Dimension values of a table, most frequent first"""
+        metric = self.metrics(source)[0]
+        cells = self.cells[(source, metric)]
+        cells = cells[cells['dimension'] != ALL_DIMENSIONS]
+        return cells.groupby('dimension')['n'].sum().sort_values(ascending=False).index.tolist()
+
+    def month_range(self, source: str) -> tuple:
+        months = self.cells[(source, self.metrics(source)[0])]['month']
+        months = months[months != '']
+        return (months.min(), months.max()) if len(months) else (None, None)
+
+    def _select(self, source: str, metric: str, dimensions: Optional[Sequence[str]],
+                start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+        cells = self.cells.get((source, metric))
+        if cells is None:
+            raise ValueError(f"No cube cells for {source}.{metric}")
+        if dimensions:
+            mask = cells['dimension'].isin(list(dimensions))
+        else:
+            mask = cells['dimension'] == ALL_DIMENSIONS
+        # Months are stored as the first of the month, so compare month starts
+        if start:
+            mask = mask & (cells['month'] >= start[:7] + '-01')
+        if end:
+            mask = mask & (cells['month'] <= end[:7] + '-01') & (cells['month'] != '')
+        return cells[mask]
+
+    def gender_stats(self, source: str, metric: str, dimensions: Optional[Sequence[str]] = None,
+                     start: Optional[str] = None, end: Optional[str] = None,
+                     quantiles: bool = False) -> pd.DataFrame:
+        """Count, share, mean and std per gender of the selected cells, with quartiles if asked"""
+        cells = self._select(source, metric, dimensions, start, end)
+        stats = cells.groupby('gender')[['n', 'total', 'total_sq']].sum()
+        stats = stats[stats['n'] > 0]
+        result = pd.DataFrame({
+            'count': stats['n'],
+            'share': stats['n'] / stats['n'].sum(),
+            'mean': stats['total'] / stats['n'],
+            'std': (stats['total_sq'] / stats['n'] - (stats['total'] / stats['n']) ** 2).clip(lower=0) ** 0.5
+        })
+        if quantiles:
+            for gender in result.index:
+                sketch = KLLSketch()
+                for blob in cells.loc[cells['gender'] == gender, 'sketch']:
+                    sketch.merge(KLLSketch.from_bytes(blob))
+                q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+                result.loc[gender, ['q1', 'median', 'q3']] = [q1, median, q3]
+        return result
+
+    def breakdown(self, source: str, metric: str, by: str = 'dimension',
+                  dimensions: Optional[Sequence[str]] = None, start: Optional[str] = None,
+                  end: Optional[str] = None, top: Optional[int] = None) -> pd.DataFrame:
+        """Count, mean and gender share per dimension value or per month"""
+        if by == 'dimension' and not dimensions:
+            dimensions = self.dimension_values(source)[:top] if top else self.dimension_values(source)
+        cells = self._select(source, metric, dimensions, start, end)
+        if by == 'month':
+            cells = cells[cells['month'] != '']
+        grouped = cells.groupby([by, 'gender'])[['n', 'total']].sum().reset_index()
+        grouped = grouped[grouped['n'] > 0]
+        grouped['mean'] = grouped['total'] / grouped['n']
+        grouped['share'] = grouped['n'] / grouped.groupby(by)['n'].transform('sum')
+        return grouped.rename(columns={'n': 'count'}).drop(columns='total')
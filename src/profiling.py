@@ -0,0 +1,190 @@
+"""
+Profile a slow analysis run in one go.
+
+Profiler runs a block under cProfile, tracemalloc and a stack sampler, then
+writes three reports to the output directory:
+
+    <name>_hotspots.txt     functions ranked by self time and by cumulative time
+    <name>_allocations.txt  allocation sites at peak traced memory
+    <name>.collapsed        sampled stacks in collapsed format for flamegraph.pl,
+                            speedscope or inferno
+
+plus <name>.prof, the raw cProfile stats for snakeviz or pstats. The three
+instruments run at the same time, so absolute timings are inflated; the
+rankings are what to read.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Directory of the project's modules, used to point allocation sites at our own code
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTRUMENTATION_MODULES = {'profiling.py', 'tracing.py'}
+
+
+def _frame_label(code) -> str:
+    # co_qualname is new in Python 3.11
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}".replace(';', ':')
+
+
+class Profiler:
+    """Context manager profiling the calling thread; see the module docstring"""
+
+    def __init__(self, output_dir: str = "visualizations", name: str = "analysis_profile",
+                 sample_interval: float = 0.005, memory: bool = True, traceback_frames: int = 15):
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.sample_interval = sample_interval
+        self.memory = memory
+        self.traceback_frames = traceback_frames
+        self.profile = cProfile.Profile()
+        self.stacks: Counter = Counter()
+        self.peak_bytes = 0
+        self._snapshot_bytes = 0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._target_thread = None
+
+    def __enter__(self) -> 'Profiler':
+        self._target_thread = threading.get_ident()
+        if self.memory:
+            tracemalloc.start(self.traceback_frames)
+        self._sampler = threading.Thread(target=self._sample, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        self._started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self._started
+        self._stop.set()
+        self._sampler.join()
+        if self.memory:
+            self._check_peak(force=True)
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return False
+
+    def _sample(self):
+        """Record the target thread's stack every sample_interval, and snapshot memory at new peaks"""
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is not None:
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(labels))] += 1
+            if self.memory:
+                self._check_peak()
+
+    def _check_peak(self, force: bool = False):
+        # Snapshots are costly on big heaps, so only retake one when the peak grows by 25%
+        current, _ = tracemalloc.get_traced_memory()
+        if current > self._snapshot_bytes * 1.25 or (force and self.peak_snapshot is None):
+            self._snapshot_bytes = current
+            self.peak_snapshot = tracemalloc.take_snapshot()
+
+    def hotspots(self, top: int = 30, sort: str = 'tottime') -> List[Dict[str, Any]]:
+        """Top functions by 'tottime' (self) or 'cumtime' (inclusive) as rows"""
+        stats = pstats.Stats(self.profile)
+        rows = []
+        for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                'function': function,
+                'location': f"{os.path.basename(filename)}:{line}",
+                'calls': ncalls,
+                'self_s': round(tottime, 4),
+                'cumulative_s': round(cumtime, 4),
+                'self_pct': round(100 * tottime / self.elapsed, 1) if self.elapsed else 0.0
+            })
+        key = 'self_s' if sort == 'tottime' else 'cumulative_s'
+        return sorted(rows, key=lambda r: r[key], reverse=True)[:top]
+
+    def allocation_sites(self, top: int = 25) -> List[Dict[str, Any]]:
+        """Largest allocation sites in the snapshot taken at peak traced memory"""
+        if self.peak_snapshot is None:
+            return []
+        # Group by allocating line and the project line that led to it
+        grouped: Dict[Tuple[str, str], List[int]] = {}
+        for stat in self.peak_snapshot.statistics('traceback'):
+            frame = stat.traceback[-1]  # tracebacks run oldest to most recent
+            if frame.filename in (tracemalloc.__file__, __file__):
+                continue
+            key = (f"{frame.filename}:{frame.lineno}", self._project_caller(stat.traceback))
+            totals = grouped.setdefault(key, [0, 0])
+            totals[0] += stat.size
+            totals[1] += stat.count
+
+        ranked = sorted(grouped.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        return [{
+            'location': location,
+            'called_from': caller,
+            'size_mb': round(size / 1e6, 3),
+            'blocks': count
+        } for (location, caller), (size, count) in ranked]
+
+    @staticmethod
+    def _project_caller(traceback: tracemalloc.Traceback) -> str:
+        """Innermost frame in this project's own modules, which is usually the line to fix"""
+        for frame in reversed(traceback):
+            if (os.path.dirname(os.path.abspath(frame.filename)) == PROJECT_DIR
+                    and os.path.basename(frame.filename) not in INSTRUMENTATION_MODULES):
+                return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+        return "<external>"
+
+    def write_reports(self, top: int = 30) -> Dict[str, Path]:
+        """Write the hotspot table, allocation sites, collapsed stacks and raw stats"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = {
+            'hotspots': self.output_dir / f"{self.name}_hotspots.txt",
+            'allocations': self.output_dir / f"{self.name}_allocations.txt",
+            'collapsed': self.output_dir / f"{self.name}.collapsed",
+            'pstats': self.output_dir / f"{self.name}.prof"
+        }
+
+        with open(paths['hotspots'], 'w', encoding='utf-8') as f:
+            f.write(f"Wall time under profiler: {self.elapsed:.3f}s\n")
+            for sort, title in (('tottime', 'self time'), ('cumtime', 'cumulative time')):
+                f.write(f"\nTop {top} functions by {title}\n")
+                f.write(f"{'self s':>9} {'cum s':>9} {'self %':>7} {'calls':>9}  function (location)\n")
+                for row in self.hotspots(top, sort):
+                    f.write(f"{row['self_s']:>9.3f} {row['cumulative_s']:>9.3f} {row['self_pct']:>7.1f} "
+                            f"{row['calls']:>9}  {row['function']} ({row['location']})\n")
+
+        with open(paths['allocations'], 'w', encoding='utf-8') as f:
+            if not self.memory:
+                f.write("Memory tracing was disabled for this run\n")
+            else:
+                f.write(f"Peak traced memory: {self.peak_bytes / 1e6:.1f} MB "
+                        f"(sites below from a snapshot at {self._snapshot_bytes / 1e6:.1f} MB)\n\n")
+                f.write(f"{'MB':>10} {'blocks':>10}  location [called from]\n")
+                for site in self.allocation_sites(top):
+                    caller = f" [{site['called_from']}]" if site['called_from'] else ""
+                    f.write(f"{site['size_mb']:>10.3f} {site['blocks']:>10}  {site['location']}{caller}\n")
+
+        with open(paths['collapsed'], 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self.profile.dump_stats(paths['pstats'])
+        return paths
+
+
+def profile_call(fn: Callable[[], Any], output_dir: str = "visualizations", name: str = "analysis_profile",
+                 **profiler_kwargs) -> Tuple[Any, Profiler, Dict[str, Path]]:
+    """Run fn under a Profiler and write its reports; returns (result, profiler, report paths)"""
+    with Profiler(output_dir, name, **profiler_kwargs) as profiler:
+        result = fn()
+    return result, profiler, profiler.write_reports()
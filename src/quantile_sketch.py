@@ -0,0 +1,412 @@
+"""
+Mergeable quantile sketches of engagement metrics, kept in the database.
+
+Each (table, metric, gender, group) has a KLL sketch plus exact count, sum,
+sum of squares, min and max. Groups are subreddits for Reddit and languages
+for GitHub repositories; the group '*' holds every group merged and is
+maintained alongside, so the per-gender summary is a single row lookup.
+Quartiles are cached in their own columns when a sketch is written.
+
+Sketches are updated at write time for rows whose key is new. Sketches
+cannot forget a value, so a re-collected row (INSERT OR REPLACE of an
+existing key) whose gender, group or metrics changed marks its table stale
+instead, and ensure_sketches() recomputes stale tables from the raw rows the
+way olap_cube.ensure_cube() rebuilds the cube. rebuild_sketches() does the
+same unconditionally after bulk loads or gender re-inference.
+"""
+import json
+import math
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chart_data import GENDER_CLEANUP
+
+ALL_GROUPS = '*'
+
+# Coin flips for compaction; shared because a Generator costs more to build than a small update
+_RNG = np.random.default_rng()
+
+# Sketched columns per table: (group column or None, metric columns)
+SKETCHED_COLUMNS = {
+    'stackoverflow_users': (None, ['reputation', 'badge_count']),
+    'stackoverflow_questions': (None, ['score', 'view_count']),
+    'github_users': (None, ['public_repos', 'followers', 'following']),
+    'github_repositories': ('language', ['stars', 'forks']),
+    'reddit_posts': ('subreddit', ['score', 'num_comments']),
+    'reddit_comments': ('subreddit', ['score', 'comment_length'])
+}
+# Metrics stored under another column name
+METRIC_COLUMNS = {'comment_length': 'body_length'}
+
+PRIMARY_KEYS = {
+    'stackoverflow_users': 'user_id',
+    'stackoverflow_questions': 'question_id',
+    'github_users': 'user_id',
+    'github_repositories': 'repo_id',
+    'reddit_posts': 'post_id',
+    'reddit_comments': 'comment_id'
+}
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty 2016) over floats. Rank error
+    is about 1.7/k of n with high probability; k=200 keeps at most ~600 values.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3):
+        self.k = k
+        self.c = c
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * self.c ** depth)))
+
+    def update(self, value: float):
+        self.update_many(np.array([value], dtype=float))
+
+    def update_many(self, values: np.ndarray):
+        """Add an array of values; NaNs are skipped"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        self._sorted = None
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so the promoted half has even weight
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                promoted = pairs[_RNG.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Capacities shrink as levels are added, so start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Fold another sketch into this one"""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Approximate quantiles; the 0 and 1 quantiles are the exact min and max"""
+        if self.n == 0:
+            return [None for _ in qs]
+        if self._sorted is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+            order = np.argsort(values, kind='stable')
+            self._sorted = (values[order], np.cumsum(weights[order]))
+        values, cumulative = self._sorted
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+            elif q >= 1:
+                result.append(self.max)
+            else:
+                idx = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+                result.append(float(values[min(idx, len(values) - 1)]))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles([q])[0]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.n if self.n else None
+
+    @property
+    def std(self) -> Optional[float]:
+        """Sample standard deviation, matching pandas' std()"""
+        if self.n < 2:
+            return None
+        variance = (self.total_sq - self.total ** 2 / self.n) / (self.n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def to_bytes(self) -> bytes:
+        header = json.dumps({
+            'k': self.k, 'c': self.c, 'n': self.n, 'sum': self.total, 'sumsq': self.total_sq,
+            'min': self.min, 'max': self.max, 'sizes': [len(items) for items in self.levels]
+        }).encode('utf-8')
+        return header + b'\n' + np.concatenate(self.levels).astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'KLLSketch':
+        header, _, body = blob.partition(b'\n')
+        meta = json.loads(header)
+        sketch = cls(meta['k'], meta['c'])
+        values = np.frombuffer(body, dtype='<f8')
+        offsets = np.cumsum([0] + meta['sizes'])
+        sketch.levels = [values[offsets[i]:offsets[i + 1]].copy() for i in range(len(meta['sizes']))]
+        sketch.n = meta['n']
+        sketch.total = meta['sum']
+        sketch.total_sq = meta['sumsq']
+        sketch.min = meta['min']
+        sketch.max = meta['max']
+        return sketch
+
+
+def create_sketch_table(conn: sqlite3.Connection):
+    """Create the sketch table; on first creation, sketch any rows already collected"""
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quantile_sketches'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quantile_sketches (
+            source TEXT,
+            metric TEXT,
+            gender TEXT,
+            grp TEXT,
+            n INTEGER,
+            mean REAL,
+            std REAL,
+            min REAL,
+            q1 REAL,
+            median REAL,
+            q3 REAL,
+            max REAL,
+            sketch BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, metric, gender, grp)
+        )
+    ''')
+    # Tables whose sketches no longer match their rows
+    conn.execute("CREATE TABLE IF NOT EXISTS quantile_sketch_stale (source TEXT PRIMARY KEY)")
+    if not existed:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+                ','.join('?' * len(SKETCHED_COLUMNS))), list(SKETCHED_COLUMNS)
+        )]
+        if tables:
+            rebuild_sketches(conn, tables)
+
+
+def _save(conn: sqlite3.Connection, source: str, metric: str, gender: str, group: str, sketch: KLLSketch):
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    conn.execute('''
+        INSERT OR REPLACE INTO quantile_sketches
+        (source, metric, gender, grp, n, mean, std, min, q1, median, q3, max, sketch)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (source, metric, gender, group, sketch.n, sketch.mean, sketch.std, sketch.min,
+          q1, median, q3, sketch.max, sketch.to_bytes()))
+
+
+def _load(conn: sqlite3.Connection, source: str, metric: str, gender: str, group: str) -> KLLSketch:
+    row = conn.execute(
+        "SELECT sketch FROM quantile_sketches WHERE source = ? AND metric = ? AND gender = ? AND grp = ?",
+        (source, metric, gender, group)
+    ).fetchone()
+    return KLLSketch.from_bytes(row[0]) if row else KLLSketch()
+
+
+def _clean_gender(gender: Optional[str]) -> str:
+    gender = gender or 'anonymous'
+    return GENDER_CLEANUP.get(gender, gender)
+
+
+def _group_frame(table: str, df: pd.DataFrame) -> Dict[Tuple[str, str], Dict[str, np.ndarray]]:
+    """Metric arrays per (gender, group) from a frame of raw rows"""
+    group_col, metrics = SKETCHED_COLUMNS[table]
+    frame = pd.DataFrame({
+        'gender': df['gender_inferred'].fillna('anonymous').replace(GENDER_CLEANUP),
+        'grp': df[group_col].fillna('').astype(str) if group_col else ALL_GROUPS
+    })
+    for metric in metrics:
+        frame[metric] = pd.to_numeric(df[METRIC_COLUMNS.get(metric, metric)], errors='coerce').astype(float)
+    return {
+        key: {metric: part[metric].to_numpy() for metric in metrics}
+        for key, part in frame.groupby(['gender', 'grp'])
+    }
+
+
+def _group_rows(table: str, columns: Sequence[str], rows: List[tuple]) -> Dict[Tuple[str, str], Dict[str, np.ndarray]]:
+    """Metric arrays per (gender, group) from row tuples; cheaper than pandas for small batches"""
+    group_col, metrics = SKETCHED_COLUMNS[table]
+    index = {name: i for i, name in enumerate(columns)}
+    gender_at = index['gender_inferred']
+    group_at = index[group_col] if group_col else None
+    metric_at = [(metric, index[METRIC_COLUMNS.get(metric, metric)]) for metric in metrics]
+
+    grouped: Dict[Tuple[str, str], Dict[str, list]] = {}
+    for row in rows:
+        group = ALL_GROUPS if group_at is None else (row[group_at] or '')
+        values = grouped.setdefault((_clean_gender(row[gender_at]), str(group)), {m: [] for m in metrics})
+        for metric, at in metric_at:
+            values[metric].append(np.nan if row[at] is None else row[at])
+    return {
+        key: {metric: np.asarray(values, dtype=float) for metric, values in per_metric.items()}
+        for key, per_metric in grouped.items()
+    }
+
+
+def _apply(conn: sqlite3.Connection, table: str, grouped: Dict[Tuple[str, str], Dict[str, np.ndarray]],
+           replace: bool = False):
+    """Fold metric arrays into the stored sketches (or replace them) per gender and group"""
+    group_col, metrics = SKETCHED_COLUMNS[table]
+    for metric in metrics:
+        overall: Dict[str, KLLSketch] = {}
+        for (gender, group), arrays in grouped.items():
+            partial = KLLSketch()
+            partial.update_many(arrays[metric])
+            if group_col is not None:
+                sketch = partial if replace else _load(conn, table, metric, gender, group).merge(partial)
+                _save(conn, table, metric, gender, group, sketch)
+            overall.setdefault(gender, KLLSketch()).merge(partial)
+        for gender, partial in overall.items():
+            sketch = partial if replace else _load(conn, table, metric, gender, ALL_GROUPS).merge(partial)
+            _save(conn, table, metric, gender, ALL_GROUPS, sketch)
+
+
+def update_sketches(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: List[tuple]):
+    """
+    Fold freshly written rows into the sketches. Only rows whose primary key
+    was not in the table before the write should be passed (see new_rows).
+    """
+    if table not in SKETCHED_COLUMNS or not rows:
+        return
+    _apply(conn, table, _group_rows(table, columns, rows))
+
+
+def new_rows(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: List[tuple],
+             chunk_size: int = 500) -> Tuple[List[tuple], bool]:
+    """
+    Rows whose primary key (first element) is not stored yet, and whether any
+    stored row's gender, group or metrics differ from its replacement; call
+    before writing them
+    """
+    if table not in SKETCHED_COLUMNS or not rows:
+        return [], False
+    group_col, metrics = SKETCHED_COLUMNS[table]
+    sketched = ['gender_inferred'] + ([group_col] if group_col else [])
+    sketched += [METRIC_COLUMNS.get(metric, metric) for metric in metrics]
+    index = {name: i for i, name in enumerate(columns)}
+    positions = [index[name] for name in sketched]
+
+    key = PRIMARY_KEYS[table]
+    stored = {}
+    keys = [row[0] for row in rows]
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        placeholders = ','.join('?' * len(chunk))
+        stored.update((r[0], r[1:]) for r in conn.execute(
+            f"SELECT {key}, {', '.join(sketched)} FROM {table} WHERE {key} IN ({placeholders})", chunk
+        ))
+    # A key repeated within the batch is written once, so count it once
+    fresh, seen, changed = [], set(), False
+    for row in rows:
+        if row[0] in stored:
+            changed = changed or stored[row[0]] != tuple(row[at] for at in positions)
+        elif row[0] not in seen:
+            seen.add(row[0])
+            fresh.append(row)
+    return fresh, changed
+
+
+def mark_stale(conn: sqlite3.Connection, table: str):
+    """Flag a table's sketches for rebuilding by ensure_sketches; the caller commits"""
+    if table in SKETCHED_COLUMNS:
+        conn.execute("INSERT OR IGNORE INTO quantile_sketch_stale (source) VALUES (?)", (table,))
+
+
+def ensure_sketches(conn: sqlite3.Connection) -> List[str]:
+    """Rebuild the sketches of tables marked stale; returns the rebuilt tables; the caller commits"""
+    create_sketch_table(conn)
+    stale = [row[0] for row in conn.execute("SELECT source FROM quantile_sketch_stale")]
+    if stale:
+        rebuild_sketches(conn, stale)
+    return stale
+
+
+def rebuild_sketches(conn: sqlite3.Connection, tables: Optional[Iterable[str]] = None):
+    """Recompute sketches from the raw rows; the caller commits"""
+    create_sketch_table(conn)
+    for table in tables or SKETCHED_COLUMNS:
+        group_col, metrics = SKETCHED_COLUMNS[table]
+        wanted = ['gender_inferred'] + ([group_col] if group_col else [])
+        wanted += [METRIC_COLUMNS.get(metric, metric) for metric in metrics]
+        df = pd.read_sql_query(f"SELECT {', '.join(dict.fromkeys(wanted))} FROM {table}", conn)
+        conn.execute("DELETE FROM quantile_sketches WHERE source = ?", (table,))
+        if not df.empty:
+            _apply(conn, table, _group_frame(table, df), replace=True)
+        conn.execute("DELETE FROM quantile_sketch_stale WHERE source = ?", (table,))
+
+
+def merged_sketch(conn: sqlite3.Connection, table: str, metric: str, gender: str,
+                  groups: Optional[Iterable[str]] = None) -> KLLSketch:
+    """One gender's sketch merged across the given groups (all groups if None)"""
+    if groups is None:
+        return _load(conn, table, metric, gender, ALL_GROUPS)
+    merged = KLLSketch()
+    for group in groups:
+        merged.merge(_load(conn, table, metric, gender, group))
+    return merged
+
+
+def sketch_summary(conn: sqlite3.Connection, table: str, metric: str, by_group: bool = False) -> pd.DataFrame:
+    """
+    Cached count, mean, std, min, quartiles and max per gender (and per group
+    when by_group), read straight from the sketch table
+    """
+    group_filter = "grp != ?" if by_group else "grp = ?"
+    df = pd.read_sql_query(f'''
+        SELECT gender, grp, n AS count, mean, std, min, q1, median, q3, max
+        FROM quantile_sketches
+        WHERE source = ? AND metric = ? AND {group_filter}
+    ''', conn, params=(table, metric, ALL_GROUPS))
+    if by_group:
+        return df.set_index(['grp', 'gender']).sort_index()
+    return df.drop(columns='grp').set_index('gender').sort_index()
+
+
+def gender_summary_from_sketches(conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> Optional[pd.DataFrame]:
+    """
+    Mean, median and std per gender for each column, shaped like
+    chart_data.gender_summary; None if any column has no sketch
+    """
+    parts = {}
+    for column in columns:
+        if column not in SKETCHED_COLUMNS.get(table, (None, []))[1]:
+            return None
+        summary = sketch_summary(conn, table, column)
+        if summary.empty:
+            return None
+        parts[column] = summary[['mean', 'median', 'std']]
+    return pd.concat(parts, axis=1).round(2)
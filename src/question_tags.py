@@ -0,0 +1,178 @@
+"""
+Inverted index of Stack Overflow question tags with per-tag gender totals.
+
+stackoverflow_questions.tags stays a comma-joined string as returned by the
+API. question_tags maps each tag to its questions, and tag_stats keeps, per
+tag and gender, the number of questions and the sums of score, squared
+score, views and answers. Triggers on stackoverflow_questions maintain both
+on insert, replace, update and delete, so per-tag statistics for every tag
+are read from a few thousand tag_stats rows without splitting any strings.
+"""
+import sqlite3
+from typing import Iterable, Optional
+
+import pandas as pd
+
+from time_series import gender_sql
+
+# Columns summed per tag and gender
+STAT_COLUMNS = {'score': 'score_sum', 'view_count': 'views_sum', 'answer_count': 'answers_sum'}
+
+
+def _tagged(source: str) -> str:
+    """One row per distinct tag of each question in source, with the question's gender and stats"""
+    # json_quote escapes the tag string, so splitting on commas yields a valid JSON array
+    return f'''
+        SELECT DISTINCT r.question_id, j.value AS tag, {gender_sql('r')} AS gender,
+               COALESCE(r.score, 0) AS score, COALESCE(r.view_count, 0) AS view_count,
+               COALESCE(r.answer_count, 0) AS answer_count
+        FROM {source} AS r,
+             json_each('[' || replace(json_quote(COALESCE(r.tags, '')), ',', '","') || ']') AS j
+        WHERE j.value != ''
+    '''
+
+
+def _row(prefix: str) -> str:
+    return (f"(SELECT {prefix}.question_id AS question_id, {prefix}.tags AS tags, "
+            f"{prefix}.gender_inferred AS gender_inferred, {prefix}.score AS score, "
+            f"{prefix}.view_count AS view_count, {prefix}.answer_count AS answer_count)")
+
+
+def _add_stats(source: str, sign: str) -> str:
+    return f'''
+        INSERT INTO tag_stats (tag, gender, n, score_sum, score_sumsq, views_sum, answers_sum)
+        SELECT tag, gender, {sign}1, {sign}score, {sign}score * score, {sign}view_count, {sign}answer_count
+        FROM ({_tagged(source)})
+        WHERE true
+        ON CONFLICT (tag, gender) DO UPDATE SET
+            n = n + excluded.n,
+            score_sum = score_sum + excluded.score_sum,
+            score_sumsq = score_sumsq + excluded.score_sumsq,
+            views_sum = views_sum + excluded.views_sum,
+            answers_sum = answers_sum + excluded.answers_sum;
+    '''
+
+
+def _index(source: str) -> str:
+    return f'''
+        INSERT OR IGNORE INTO question_tags (tag, question_id)
+        SELECT tag, question_id FROM ({_tagged(source)}) WHERE true;
+    '''
+
+
+def _triggers():
+    replaced = "(SELECT * FROM stackoverflow_questions WHERE question_id = NEW.question_id)"
+    watched = "tags, score, view_count, answer_count, gender_inferred"
+    return [
+        # INSERT OR REPLACE deletes the old row without firing delete triggers
+        f'''CREATE TRIGGER IF NOT EXISTS stackoverflow_questions_tags_replace
+            BEFORE INSERT ON stackoverflow_questions
+            BEGIN
+                {_add_stats(replaced, '-')}
+                DELETE FROM question_tags WHERE question_id = NEW.question_id;
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS stackoverflow_questions_tags_insert
+            AFTER INSERT ON stackoverflow_questions
+            BEGIN {_add_stats(_row('NEW'), '')} {_index(_row('NEW'))} END''',
+        f'''CREATE TRIGGER IF NOT EXISTS stackoverflow_questions_tags_update
+            AFTER UPDATE OF {watched} ON stackoverflow_questions
+            BEGIN
+                {_add_stats(_row('OLD'), '-')}
+                {_add_stats(_row('NEW'), '')}
+                DELETE FROM question_tags WHERE question_id = OLD.question_id;
+                {_index(_row('NEW'))}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS stackoverflow_questions_tags_delete
+            AFTER DELETE ON stackoverflow_questions
+            BEGIN
+                {_add_stats(_row('OLD'), '-')}
+                DELETE FROM question_tags WHERE question_id = OLD.question_id;
+            END'''
+    ]
+
+
+def create_tag_index(conn: sqlite3.Connection):
+    """
+    Create question_tags, tag_stats and their triggers; on first creation,
+    index the questions already collected
+    """
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stackoverflow_questions'"
+    ).fetchone():
+        return
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'question_tags'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS question_tags (
+            tag TEXT,
+            question_id INTEGER,
+            PRIMARY KEY (tag, question_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_question_tags_question ON question_tags(question_id)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tag_stats (
+            tag TEXT,
+            gender TEXT,
+            n INTEGER,
+            score_sum REAL,
+            score_sumsq REAL,
+            views_sum REAL,
+            answers_sum REAL,
+            PRIMARY KEY (tag, gender)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in _triggers():
+        conn.execute(trigger)
+    if not existed:
+        rebuild_tag_index(conn)
+
+
+def rebuild_tag_index(conn: sqlite3.Connection):
+    """Recompute question_tags and tag_stats from stackoverflow_questions; the caller commits"""
+    conn.execute("DELETE FROM question_tags")
+    conn.execute("DELETE FROM tag_stats")
+    tagged = _tagged('stackoverflow_questions')
+    conn.execute(f"INSERT OR IGNORE INTO question_tags (tag, question_id) SELECT tag, question_id FROM ({tagged})")
+    conn.execute(f'''
+        INSERT INTO tag_stats (tag, gender, n, score_sum, score_sumsq, views_sum, answers_sum)
+        SELECT tag, gender, COUNT(*), SUM(score), SUM(score * score), SUM(view_count), SUM(answer_count)
+        FROM ({tagged})
+        GROUP BY tag, gender
+    ''')
+
+
+def tag_gender_breakdown(conn: sqlite3.Connection, tags: Optional[Iterable[str]] = None,
+                         min_questions: int = 1) -> pd.DataFrame:
+    """
+    Questions per tag and gender with each gender's share of the tag and the
+    mean and standard deviation of score, mean views and mean answers.
+    Tags with fewer than min_questions questions in total are left out.
+    """
+    query = "SELECT * FROM tag_stats WHERE n > 0"
+    params = []
+    if tags is not None:
+        tags = list(tags)
+        query += f" AND tag IN ({','.join('?' * len(tags))})"
+        params = tags
+    df = pd.read_sql_query(query, conn, params=params)
+    if df.empty:
+        return pd.DataFrame(columns=['tag', 'gender', 'questions', 'share', 'tag_questions',
+                                     'mean_score', 'std_score', 'mean_views', 'mean_answers'])
+
+    df['tag_questions'] = df.groupby('tag')['n'].transform('sum')
+    df = df[df['tag_questions'] >= min_questions]
+    mean_score = df['score_sum'] / df['n']
+    result = pd.DataFrame({
+        'tag': df['tag'],
+        'gender': df['gender'],
+        'questions': df['n'],
+        'share': df['n'] / df['tag_questions'],
+        'tag_questions': df['tag_questions'],
+        'mean_score': mean_score,
+        'std_score': (df['score_sumsq'] / df['n'] - mean_score ** 2).clip(lower=0) ** 0.5,
+        'mean_views': df['views_sum'] / df['n'],
+        'mean_answers': df['answers_sum'] / df['n']
+    })
+    return result.sort_values(['tag_questions', 'tag', 'gender'], ascending=[False, True, True]).reset_index(drop=True)
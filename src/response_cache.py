@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Parameters that identify the caller rather than the resource; they are left
+# out of cache keys (and never written to disk) so entries survive key rotation
+CREDENTIAL_PARAMS = {'key', 'access_token', 'client_secret', 'token'}
+
+
+class CacheMissError(LookupError):
+    """Raised in replay-only mode when a response is not in the cache"""
+
+
+class ResponseCache:
+    """
+    On-disk cache of API responses, addressed by a hash of the request (URL
+    and non-credential params). Entries are keyed by request rather than by
+    response content because the lookup happens before the response is
+    known; a content hash could only deduplicate identical payloads, which
+    API responses (timestamps, quota fields) almost never are.
+
+    Used during development to re-run collection without spending API quota.
+    Entries older than ``ttl`` seconds are treated as missing, and the
+    least recently used entries are evicted once the cache grows beyond
+    ``max_bytes``. In ``replay_only`` mode the network is never touched and
+    a miss raises ``CacheMissError``. One instance may be shared by
+    several collector threads.
+    """
+
+    def __init__(self, cache_dir: str = "data/http_cache", ttl: Optional[float] = None,
+                 max_bytes: int = 512 * 1024 * 1024, replay_only: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        # Guards the counters, the size total and eviction across collector threads
+        self._lock = threading.Lock()
+        self._total_bytes = sum(p.stat().st_size for p in self.cache_dir.glob('*/*.json'))
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Hash a URL and its non-credential params into a stable cache key"""
+        params = {k: v for k, v in (params or {}).items() if k not in CREDENTIAL_PARAMS and v is not None}
+        canonical = json.dumps([url, params], sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """Return the cached payload for a request, or None if missing or expired"""
+        path = self._path(self.make_key(url, params))
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self.ttl is not None and not self.replay_only and time.time() - entry['stored_at'] > self.ttl:
+            return None
+
+        # Touch the file so eviction keeps recently replayed entries
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry['payload']
+
+    def put(self, url: str, params: Optional[Dict[str, Any]], payload: Any):
+        """Store a JSON-serializable payload and evict old entries if over budget"""
+        path = self._path(self.make_key(url, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stored_params = {k: v for k, v in (params or {}).items() if k not in CREDENTIAL_PARAMS}
+        data = json.dumps({
+            'url': url,
+            'params': stored_params,
+            'stored_at': time.time(),
+            'payload': payload
+        }, default=str)
+
+        # Write to a temp file first so concurrent readers never see partial entries
+        # (unique per process and thread, so threads storing the same key do not share one)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - old_size
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for p in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+        logger.info(f"Response cache evicted down to {total / 1e6:.1f} MB")
+
+    def fetch(self, url: str, params: Optional[Dict[str, Any]], fetch_fn: Callable[[], Any]) -> Any:
+        """
+        Return the cached payload for a request, calling fetch_fn on a miss.
+        fetch_fn must return JSON-serializable data.
+        """
+        payload = self.get(url, params)
+        with self._lock:
+            if payload is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if payload is not None:
+            return payload
+
+        if self.replay_only:
+            shown = {k: v for k, v in (params or {}).items() if k not in CREDENTIAL_PARAMS}
+            raise CacheMissError(f"No cached response for {url} {shown} (replay-only mode)")
+
+        payload = fetch_fn()
+        self.put(url, params, payload)
+        return payload
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for p in self.cache_dir.glob('*/*.json'):
+                p.unlink()
+            self._total_bytes = 0
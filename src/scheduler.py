@@ -0,0 +1,337 @@
+"""
+Long-running collection scheduler.
+
+    python src/scheduler.py --workers 3
+    python src/scheduler.py --interval reddit=30 --priority stackoverflow=5 --once
+
+Every tag, language and subreddit is a job that runs on its own interval.
+Due jobs wait in a priority queue and are executed by a small worker pool;
+all workers share one collector, so its per-platform rate limiters are
+shared too, and at most max_per_source jobs hit the same API at once. Each
+run writes through a pipeline of its own, which commits the run's rows and
+refreshes the quantile sketches when the run ends; a run whose writer fails
+is recorded as failed and the next run starts with a fresh one. Start times
+are spread with a little jitter so jobs on the same interval do not fire
+together.
+
+Each run is a row in collection_runs (pending, running, succeeded, failed
+or interrupted) with its duration, rows committed and API calls. The next run
+of a job is inserted as a pending row when the current one finishes, so
+the queue lives in the database: on restart, pending runs are picked up
+again and runs left 'running' by a crash are marked interrupted and
+retried.
+"""
+import argparse
+import logging
+import random
+import signal
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from data_collector import SocialComputingDataCollector
+from response_cache import ResponseCache
+from structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Collector method, keyword for the job's target and keyword/default for the per-run item cap
+SOURCES = {
+    'stackoverflow': ('collect_stackoverflow_data', 'tags', 'max_users', 100),
+    'github': ('collect_github_data', 'languages', 'max_repos', 100),
+    'reddit': ('collect_reddit_data', 'subreddits', 'max_posts', 250)
+}
+DEFAULT_TARGETS = {
+    'stackoverflow': ['python', 'javascript', 'java', 'c++', 'c#'],
+    'github': ['Python', 'JavaScript', 'Java', 'C++', 'C#'],
+    'reddit': ['programming', 'cscareerquestions', 'learnprogramming', 'technology']
+}
+# Reddit moves fastest; repository rankings barely change within a day
+DEFAULT_INTERVALS = {'stackoverflow': timedelta(hours=6), 'github': timedelta(hours=24), 'reddit': timedelta(hours=1)}
+DEFAULT_PRIORITIES = {'stackoverflow': 1, 'github': 0, 'reddit': 2}
+# Start times are pushed back by up to this fraction of the interval
+JITTER = 0.1
+
+
+def create_runs_table(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS collection_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT,
+            target TEXT,
+            priority INTEGER,
+            status TEXT,
+            scheduled_at REAL,
+            started_at REAL,
+            finished_at REAL,
+            duration REAL,
+            rows INTEGER,
+            api_calls INTEGER,
+            error TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_collection_runs_job ON collection_runs(source, target, status)")
+
+
+class Job:
+    """One collection target: a tag, language or subreddit of a source, run every interval"""
+
+    def __init__(self, source: str, target: str, interval: timedelta, priority: int = 0,
+                 max_items: Optional[int] = None):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source {source!r}")
+        self.source = source
+        self.target = target
+        self.interval = interval
+        self.priority = priority
+        self.max_items = max_items or SOURCES[source][3]
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.source, self.target
+
+    def next_start(self, after: float) -> float:
+        return after + self.interval.total_seconds() * (1 + random.uniform(0, JITTER))
+
+
+def default_jobs(targets: Optional[Dict[str, List[str]]] = None, intervals: Optional[Dict[str, timedelta]] = None,
+                 priorities: Optional[Dict[str, int]] = None) -> List[Job]:
+    targets = targets or DEFAULT_TARGETS
+    intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+    priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+    return [Job(source, target, intervals[source], priorities[source])
+            for source, names in targets.items() for target in names]
+
+
+class CollectionScheduler:
+    """Runs jobs on a worker pool as they come due, recording every run in collection_runs"""
+
+    def __init__(self, collector: SocialComputingDataCollector, jobs: List[Job], workers: int = 3,
+                 max_per_source: int = 1):
+        self.collector = collector
+        self.jobs = {job.key: job for job in jobs}
+        self.workers = workers
+        self.max_per_source = max_per_source
+        # Pending runs, as dicts of their collection_runs row
+        self._queue: List[Dict] = []
+        self._running: Dict[str, int] = {source: 0 for source in SOURCES}
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._run_once = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = self.collector.storage.connect()
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def recover(self) -> Dict[str, int]:
+        """
+        Load pending runs into the queue, retry runs interrupted by a previous
+        shutdown, and schedule jobs that have no pending run
+        """
+        conn = self._connect()
+        try:
+            create_runs_table(conn)
+            interrupted = conn.execute('''
+                UPDATE collection_runs SET status = 'interrupted', finished_at = ?
+                WHERE status = 'running' RETURNING source, target, priority
+            ''', (time.time(),)).fetchall()
+            now = time.time()
+            for row in interrupted:
+                self._insert(conn, row['source'], row['target'], row['priority'], now)
+            pending = [dict(row) for row in conn.execute(
+                "SELECT * FROM collection_runs WHERE status = 'pending' ORDER BY scheduled_at")]
+            queued = {(run['source'], run['target']) for run in pending}
+            # A job that never ran starts now; otherwise one interval after its last start
+            last_started = {(row['source'], row['target']): row['last'] for row in conn.execute(
+                "SELECT source, target, MAX(started_at) AS last FROM collection_runs GROUP BY source, target")}
+            for key, job in self.jobs.items():
+                if key not in queued:
+                    last = last_started.get(key)
+                    start = job.next_start(last) if last else now
+                    pending.append(self._insert(conn, job.source, job.target, job.priority, start))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._condition:
+            self._queue = pending
+            self._condition.notify_all()
+        counts = {'pending': len(pending), 'interrupted': len(interrupted)}
+        logger.info("Recovered collection queue", extra={'metrics': counts})
+        return counts
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, source: str, target: str, priority: int, scheduled_at: float) -> Dict:
+        cursor = conn.execute('''
+            INSERT INTO collection_runs (source, target, priority, status, scheduled_at)
+            VALUES (?, ?, ?, 'pending', ?)
+        ''', (source, target, priority, scheduled_at))
+        return {'run_id': cursor.lastrowid, 'source': source, 'target': target,
+                'priority': priority, 'status': 'pending', 'scheduled_at': scheduled_at}
+
+    def _take(self) -> Optional[Dict]:
+        """Highest-priority due run whose source has a free slot, waiting until one is; None when stopping"""
+        with self._condition:
+            while not self._stopping:
+                now = time.time()
+                eligible = [run for run in self._queue
+                            if run['scheduled_at'] <= now and self._running[run['source']] < self.max_per_source]
+                if eligible:
+                    run = min(eligible, key=lambda r: (-r['priority'], r['scheduled_at'], r['run_id']))
+                    self._queue.remove(run)
+                    self._running[run['source']] += 1
+                    return run
+                if self._run_once and not any(run['scheduled_at'] <= now for run in self._queue) \
+                        and not any(self._running.values()):
+                    return None
+                upcoming = [run['scheduled_at'] for run in self._queue if run['scheduled_at'] > now]
+                self._condition.wait(timeout=min(upcoming) - now if upcoming else None)
+            return None
+
+    def _execute(self, run: Dict):
+        method, target_arg, limit_arg, default_limit = SOURCES[run['source']]
+        job = self.jobs.get((run['source'], run['target']))
+        started = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE collection_runs SET status = 'running', started_at = ? WHERE run_id = ?",
+                         (started, run['run_id']))
+            conn.commit()
+        finally:
+            conn.close()
+
+        error = None
+        pipeline = None
+        with self.collector.stats.track() as counts:
+            try:
+                with self.collector.collection_pipeline(per_thread=True) as pipeline:
+                    getattr(self.collector, method)(**{target_arg: [run['target']],
+                                                       limit_arg: job.max_items if job else default_limit})
+            except Exception as e:
+                logger.exception("Run %s (%s %s) failed", run['run_id'], run['source'], run['target'])
+                counts['errors'].append(str(e))
+        written = pipeline.metrics()['write'] if pipeline else {'items': 0, 'errors': 0}
+        if written['errors']:
+            counts['errors'].append(f"{written['errors']} rows failed to write")
+        if counts['errors']:
+            error = '; '.join(counts['errors'])[:2000]
+        finished = time.time()
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE collection_runs
+                SET status = ?, finished_at = ?, duration = ?, rows = ?, api_calls = ?, error = ?
+                WHERE run_id = ?
+            ''', ('failed' if error else 'succeeded', finished, round(finished - started, 3),
+                  written['items'], counts['api_calls'], error, run['run_id']))
+            # Jobs dropped from the configuration finish their last run and are not rescheduled
+            next_run = None
+            if job is not None and not self._run_once:
+                next_run = self._insert(conn, job.source, job.target, job.priority, job.next_start(started))
+            conn.commit()
+        finally:
+            conn.close()
+
+        logger.info("Collection run finished", extra={'metrics': {
+            'run_id': run['run_id'], 'source': run['source'], 'target': run['target'],
+            'status': 'failed' if error else 'succeeded', 'seconds': round(finished - started, 2),
+            'rows': written['items'], 'api_calls': counts['api_calls']}})
+        with self._condition:
+            self._running[run['source']] -= 1
+            if next_run:
+                self._queue.append(next_run)
+            self._condition.notify_all()
+
+    def _worker(self):
+        while True:
+            run = self._take()
+            if run is None:
+                return
+            self._execute(run)
+
+    def run(self, once: bool = False):
+        """
+        Work through the queue until stop() is called; with once, run every
+        job that is due now and return
+        """
+        self._run_once = once
+        self.recover()
+        threads = [threading.Thread(target=self._worker, name=f"scheduler-worker-{i}")
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.info("Scheduler stopped", extra={'metrics': self.collector.stats.snapshot()})
+
+    def stop(self):
+        """Let running jobs finish and stop taking new ones; their pending runs stay queued"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+
+def run_history(conn: sqlite3.Connection, limit: int = 20) -> List[Dict]:
+    """Most recent runs, newest first"""
+    cursor = conn.execute(
+        "SELECT * FROM collection_runs WHERE status != 'pending' ORDER BY started_at DESC LIMIT ?", (limit,))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def _assignments(items: List[str], cast) -> Dict[str, object]:
+    result = {}
+    for item in items:
+        source, _, value = item.partition('=')
+        if source not in SOURCES:
+            raise SystemExit(f"Unknown source {source!r} in {item!r}; choose from {', '.join(SOURCES)}")
+        result[source] = cast(value)
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point for the collection scheduler"""
+    parser = argparse.ArgumentParser(description="Keep the collection database fresh with scheduled per-source jobs")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to write to")
+    parser.add_argument('--workers', type=int, default=3, help="Jobs executed at the same time")
+    parser.add_argument('--max-per-source', type=int, default=1, help="Jobs of one API executed at the same time")
+    parser.add_argument('--tags', help="Comma-separated Stack Overflow tags (default: the collector's)")
+    parser.add_argument('--languages', help="Comma-separated GitHub languages")
+    parser.add_argument('--subreddits', help="Comma-separated subreddits")
+    parser.add_argument('--interval', action='append', default=[], metavar='SOURCE=MINUTES',
+                        help="Minutes between runs of each job of a source, e.g. reddit=30 (repeatable)")
+    parser.add_argument('--priority', action='append', default=[], metavar='SOURCE=N',
+                        help="Higher runs first when several jobs are due (repeatable)")
+    parser.add_argument('--once', action='store_true', help="Run the due jobs once and exit")
+    parser.add_argument('--cache-dir', help="Cache API responses on disk in this directory")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG adds per-item diagnostics")
+    parser.add_argument('--log-json', action='store_true', help="Log one JSON object per line")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level, args.log_json)
+    targets = dict(DEFAULT_TARGETS)
+    for source, option in (('stackoverflow', args.tags), ('github', args.languages), ('reddit', args.subreddits)):
+        if option:
+            targets[source] = [name.strip() for name in option.split(',') if name.strip()]
+    jobs = default_jobs(
+        targets,
+        {source: timedelta(minutes=minutes) for source, minutes in _assignments(args.interval, float).items()},
+        _assignments(args.priority, int)
+    )
+
+    collector = SocialComputingDataCollector(
+        db_path=args.db_path,
+        response_cache=ResponseCache(cache_dir=args.cache_dir) if args.cache_dir else None
+    )
+    scheduler = CollectionScheduler(collector, jobs, workers=args.workers, max_per_source=args.max_per_source)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: scheduler.stop())
+    logger.info(f"Scheduling {len(jobs)} jobs on {args.workers} workers")
+    scheduler.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Storage backends for the collection database.
+
+Collection always writes to SQLite (row-at-a-time upserts, triggers and
+FTS indexes live there). The analysis side reads whole tables through a
+backend so the column scans and groupbys can run on another engine:
+
+    sqlite  the collection file itself
+    duckdb  DuckDB reading the SQLite file through its sqlite extension,
+            or, with duckdb_path, an embedded DuckDB copy of the base tables
+            that is refreshed whenever the SQLite file has changed
+
+Tables are returned in SQLite rowid order on every backend so seeded
+resampling sees the same rows in the same order and the report comes out
+the same. duckdb is optional and imported on first use.
+"""
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Type, Union
+
+import pandas as pd
+
+from data_summary import SUMMARY_TABLES, data_version
+
+logger = logging.getLogger(__name__)
+
+# Tables copied into an embedded DuckDB database
+ANALYSIS_TABLES = list(SUMMARY_TABLES)
+
+
+class SQLiteBackend:
+    """The SQLite collection database"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def has_table(self, table: str) -> bool:
+        conn = self.connect()
+        try:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone() is not None
+        finally:
+            conn.close()
+
+    def read_table(self, table: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        conn = self.connect()
+        try:
+            return pd.read_sql_query(f"SELECT {', '.join(columns or ['*'])} FROM {table} ORDER BY rowid", conn)
+        finally:
+            conn.close()
+
+    def qualified(self, table: str) -> str:
+        """Name of a base table in query SQL"""
+        return table
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        conn = self.connect()
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+class DuckDBBackend:
+    """
+    DuckDB over the SQLite file (attached read-only), or over an embedded
+    copy in duckdb_path when given
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, db_path: Union[str, Path], duckdb_path: Optional[Union[str, Path]] = None,
+                 threads: Optional[int] = None):
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("The duckdb backend needs the duckdb package: pip install duckdb")
+        self.db_path = Path(db_path)
+        self.duckdb_path = Path(duckdb_path) if duckdb_path else None
+        self.conn = duckdb.connect(str(self.duckdb_path) if self.duckdb_path else ':memory:')
+        self._refresh_lock = threading.Lock()
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.conn.execute("INSTALL sqlite")
+        self.conn.execute("LOAD sqlite")
+        self.conn.execute(f"ATTACH '{self.db_path.resolve()}' AS collected (TYPE SQLITE, READ_ONLY)")
+        if self.duckdb_path:
+            self.refresh()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Copy the base tables into the embedded database if the SQLite file changed; returns True if copied"""
+        version = ':'.join(str(part) for part in data_version(self.db_path))
+        with self._refresh_lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS storage_mirror (sqlite_version VARCHAR)")
+            copied = self.conn.execute("SELECT sqlite_version FROM storage_mirror").fetchone()
+            if not force and copied and copied[0] == version:
+                return False
+            tables = {row[0] for row in self.conn.execute(
+                "SELECT table_name FROM duckdb_tables() WHERE database_name = 'collected'").fetchall()}
+            self.conn.execute("BEGIN TRANSACTION")
+            for table in ANALYSIS_TABLES:
+                if table in tables:
+                    # DuckDB scans keep insertion order, so copying in rowid order keeps rowid order
+                    self.conn.execute(f"CREATE OR REPLACE TABLE main.{table} AS "
+                                      f"SELECT * FROM collected.{table} ORDER BY rowid")
+            self.conn.execute("DELETE FROM storage_mirror")
+            self.conn.execute("INSERT INTO storage_mirror VALUES (?)", [version])
+            self.conn.execute("COMMIT")
+        logger.info("Refreshed DuckDB copy %s", self.duckdb_path, extra={'metrics': {'tables': sorted(tables)}})
+        return True
+
+    @property
+    def schema(self) -> str:
+        """Qualifier of the tables that are read: the embedded copy or the attached SQLite file"""
+        return 'main' if self.duckdb_path else 'collected'
+
+    def has_table(self, table: str) -> bool:
+        database = self.duckdb_path.stem if self.duckdb_path else 'collected'
+        return self.conn.cursor().execute(
+            "SELECT 1 FROM duckdb_tables() WHERE database_name = ? AND table_name = ?", [database, table]
+        ).fetchone() is not None
+
+    def read_table(self, table: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        select = f"SELECT {', '.join(columns or ['*'])} FROM {self.schema}.{table}"
+        if self.duckdb_path:
+            self.refresh()
+            return self.conn.cursor().execute(select).df()
+        return self.conn.cursor().execute(f"{select} ORDER BY rowid").df()
+
+    def qualified(self, table: str) -> str:
+        """Name of a base table in query SQL"""
+        return f"{self.schema}.{table}"
+
+    def query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        """Run DuckDB SQL; unqualified table names resolve in the embedded copy, or use collected.<table>"""
+        return self.conn.cursor().execute(sql, list(params)).df()
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS: Dict[str, Type] = {'sqlite': SQLiteBackend, 'duckdb': DuckDBBackend}
+
+
+def open_backend(name: str, db_path: Union[str, Path], **options):
+    """Backend by name; options go to its constructor (duckdb_path, threads for duckdb)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](db_path, **options)
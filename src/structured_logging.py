@@ -0,0 +1,52 @@
+"""
+Logging setup shared by the command-line entry points.
+
+Diagnostics go through the standard logging module with %-style arguments,
+so nothing is formatted unless the record's level is enabled. Per-call
+summaries attach a ``metrics`` dict via ``extra``; the JSON formatter emits
+it as fields, the plain formatter appends it to the message.
+"""
+import json
+import logging
+from typing import Any, Dict
+
+PLAIN_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+
+class PlainFormatter(logging.Formatter):
+    """Default text format with any metrics appended as key=value pairs"""
+
+    def __init__(self):
+        super().__init__(PLAIN_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        metrics = getattr(record, 'metrics', None)
+        if metrics:
+            text += " " + " ".join(f"{key}={value}" for key, value in metrics.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message and metrics"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'time': self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        metrics = getattr(record, 'metrics', None)
+        if metrics:
+            entry.update(metrics)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO", json_lines: bool = False):
+    """Replace the root handlers with one stderr handler at the given level"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_lines else PlainFormatter())
+    logging.basicConfig(level=getattr(logging, level.upper()), handlers=[handler], force=True)
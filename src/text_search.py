@@ -0,0 +1,150 @@
+"""
+Full-text search over question titles, Reddit posts and comments.
+
+Each searchable table gets an external-content FTS5 index (the text is not
+stored twice) named <table>_fts; for tables whose text is in the text store
+the content is their <table>_text view. Triggers keep the index in step with
+inserts, replacements, updates and deletes; loaders that bypass the
+triggers call rebuild_search_index() afterwards. search() returns, per
+table, the number of matching rows by gender and the best-ranked matches.
+"""
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from text_store import TEXT_COLUMNS, text_sql
+from time_series import gender_sql
+
+# Indexed text columns, and the id and author columns shown in results
+FTS_SOURCES = {
+    'stackoverflow_questions': {'key': 'question_id', 'author': 'user_id', 'columns': ['title']},
+    'reddit_posts': {'key': 'post_id', 'author': 'username', 'columns': ['title', 'selftext']},
+    'reddit_comments': {'key': 'comment_id', 'author': 'username', 'columns': ['body']}
+}
+TOKENIZER = 'porter unicode61 remove_diacritics 2'
+
+
+def _content(source: str) -> tuple:
+    """(content table, content rowid column) the index reads its text from"""
+    return (f"{source}_text", 'item_rowid') if source in TEXT_COLUMNS else (source, 'rowid')
+
+
+def _stored_column(source: str, column: str) -> str:
+    """Table column holding an indexed column: the text itself or the id of its stored copy"""
+    spec = TEXT_COLUMNS.get(source)
+    return spec['ref'] if spec and spec['text'] == column else column
+
+
+def _values(source: str, row: str) -> str:
+    return ', '.join(
+        f"{row}.{column}" if _stored_column(source, column) == column
+        else text_sql(f"{row}.{_stored_column(source, column)}")
+        for column in FTS_SOURCES[source]['columns']
+    )
+
+
+def _triggers(source: str) -> List[str]:
+    fts = f"{source}_fts"
+    columns = ', '.join(FTS_SOURCES[source]['columns'])
+    watched = ', '.join(_stored_column(source, column) for column in FTS_SOURCES[source]['columns'])
+    key = FTS_SOURCES[source]['key']
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', OLD.rowid, {_values(source, 'OLD')});"
+    insert_new = f"INSERT INTO {fts} (rowid, {columns}) VALUES (NEW.rowid, {_values(source, 'NEW')});"
+    return [
+        # INSERT OR REPLACE removes the old row without firing delete triggers
+        f'''CREATE TRIGGER IF NOT EXISTS {source}_fts_replace BEFORE INSERT ON {source}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {columns})
+                SELECT 'delete', old_row.rowid, {_values(source, 'old_row')}
+                FROM {source} AS old_row WHERE old_row.{key} = NEW.{key};
+            END''',
+        f"CREATE TRIGGER IF NOT EXISTS {source}_fts_insert AFTER INSERT ON {source} BEGIN {insert_new} END",
+        f'''CREATE TRIGGER IF NOT EXISTS {source}_fts_update AFTER UPDATE OF {watched} ON {source}
+            BEGIN {delete_old} {insert_new} END''',
+        f"CREATE TRIGGER IF NOT EXISTS {source}_fts_delete AFTER DELETE ON {source} BEGIN {delete_old} END"
+    ]
+
+
+def _existing_sources(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ','.join('?' * len(FTS_SOURCES))), list(FTS_SOURCES)
+    )]
+
+
+def create_search_index(conn: sqlite3.Connection):
+    """
+    Create the FTS5 indexes and triggers; a newly created index is filled
+    from the existing rows. An index over a table whose text has since moved
+    to the text store is recreated over the table's view.
+    """
+    for source in _existing_sources(conn):
+        fts = f"{source}_fts"
+        content, content_rowid = _content(source)
+        existed = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).fetchone()
+        if existed and f"content='{content}'" not in existed[0]:
+            for trigger in ('replace', 'insert', 'update', 'delete'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {source}_fts_{trigger}")
+            conn.execute(f"DROP TABLE {fts}")
+            existed = None
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {', '.join(FTS_SOURCES[source]['columns'])},
+                content='{content}', content_rowid='{content_rowid}', tokenize='{TOKENIZER}'
+            )
+        ''')
+        for trigger in _triggers(source):
+            conn.execute(trigger)
+        if not existed:
+            rebuild_search_index(conn, [source])
+
+
+def rebuild_search_index(conn: sqlite3.Connection, sources: Optional[Iterable[str]] = None):
+    """Re-read the indexed text from the source tables; the caller commits"""
+    for source in sources or _existing_sources(conn):
+        if source in FTS_SOURCES:
+            conn.execute(f"INSERT INTO {source}_fts ({source}_fts) VALUES ('rebuild')")
+
+
+def _match(conn: sqlite3.Connection, source: str, query: str) -> str:
+    """query if FTS5 accepts it, otherwise its words quoted as plain terms"""
+    try:
+        conn.execute(f"SELECT 1 FROM {source}_fts WHERE {source}_fts MATCH ? LIMIT 1", (query,)).fetchall()
+        return query
+    except sqlite3.OperationalError:
+        return ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+def search(conn: sqlite3.Connection, query: str, sources: Optional[Iterable[str]] = None,
+           limit: int = 20) -> Dict[str, Dict]:
+    """
+    Rows matching query (FTS5 syntax: words, "phrases", OR, NOT, prefix*) in
+    each table: {'gender_counts': {gender: hits}, 'total': hits, 'results':
+    DataFrame of the top matches by BM25 with a highlighted snippet}
+    """
+    results = {}
+    if not query or not query.strip():
+        return results
+    for source in sources or _existing_sources(conn):
+        fts = f"{source}_fts"
+        key = FTS_SOURCES[source]['key']
+        match = _match(conn, source, query)
+        counts = dict(conn.execute(f'''
+            SELECT {gender_sql('s')} AS gender, COUNT(*)
+            FROM {fts} JOIN {source} s ON s.rowid = {fts}.rowid
+            WHERE {fts} MATCH ?
+            GROUP BY gender
+        ''', (match,)).fetchall())
+        top = pd.read_sql_query(f'''
+            SELECT s.{key} AS id, s.{FTS_SOURCES[source]['author']} AS author, {gender_sql('s')} AS gender,
+                   snippet({fts}, -1, '**', '**', ' … ', 12) AS snippet,
+                   bm25({fts}) AS rank
+            FROM {fts} JOIN {source} s ON s.rowid = {fts}.rowid
+            WHERE {fts} MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ''', conn, params=(match, limit))
+        results[source] = {'gender_counts': counts, 'total': sum(counts.values()), 'results': top}
+    return results
+
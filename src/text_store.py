@@ -0,0 +1,227 @@
+"""
+Content-addressed storage for the long text columns.
+
+Reddit post selftext and comment bodies are most of the database, so they
+are kept out of the main tables. Each distinct text is stored once in
+text_blobs under a BLAKE2b digest of its bytes. The main tables keep only
+the id of their text and its length in characters, so scans, sketches and
+the cube never page through text, and re-collecting an unchanged post
+rewrites a few bytes. The text itself stays plain TEXT, so the sqlite3
+shell and any other SQLite client can read it and write the tables.
+
+Row builders put the text itself in the *_text_id column; intern_texts()
+swaps it for the id of the stored copy before the row is written. Readers
+get the text back through the <table>_text views or text_sql().
+
+Databases collected before the store are converted once, explicitly; the
+conversion drops the old text columns and cannot be undone. Until then
+with_lengths() lets analyses read them.
+
+    python src/text_store.py              # move existing text, drop orphans
+    python src/text_store.py --vacuum     # ... and reclaim the freed space
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Text column of each table, the column referencing its stored copy and its length in characters
+TEXT_COLUMNS = {
+    'reddit_posts': {'text': 'selftext', 'ref': 'selftext_text_id', 'length': 'selftext_length'},
+    'reddit_comments': {'text': 'body', 'ref': 'body_text_id', 'length': 'body_length'}
+}
+
+def text_sql(ref: str) -> str:
+    """SQL expression for the text whose id is the expression ref"""
+    return f"(SELECT b.text FROM text_blobs b WHERE b.text_id = {ref})"
+
+
+def digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def create_text_store(conn: sqlite3.Connection):
+    """Create text_blobs and the <table>_text views of the tables that keep their text in it"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS text_blobs (
+            text_id INTEGER PRIMARY KEY,
+            digest BLOB NOT NULL UNIQUE,
+            text TEXT
+        )
+    ''')
+    for table, spec in TEXT_COLUMNS.items():
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if spec['ref'] in columns:
+            conn.execute(f'''
+                CREATE VIEW IF NOT EXISTS {table}_text AS
+                SELECT s.rowid AS item_rowid, s.*, {text_sql(f"s.{spec['ref']}")} AS {spec['text']}
+                FROM {table} s
+            ''')
+
+
+def unconverted_tables(conn: sqlite3.Connection) -> List[str]:
+    """Tables that still hold their text instead of a reference into the store"""
+    return [
+        table for table, spec in TEXT_COLUMNS.items()
+        if spec['text'] in [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    ]
+
+
+def require_converted(conn: sqlite3.Connection):
+    """Raise if a table still holds its text; writers and derived-table builders expect the store"""
+    tables = unconverted_tables(conn)
+    if tables:
+        raise RuntimeError(
+            f"{', '.join(tables)} still hold their text; convert the database once with "
+            f"`python src/text_store.py` (it drops the old text columns, so keep a backup)"
+        )
+
+
+def convert(conn: sqlite3.Connection) -> List[str]:
+    """Move the text of tables created before the store into it; returns the converted tables; the caller commits"""
+    create_text_store(conn)
+    tables = unconverted_tables(conn)
+    for table in tables:
+        _move_text(conn, table)
+    create_text_store(conn)
+    return tables
+
+
+def _move_text(conn: sqlite3.Connection, table: str, chunk_rows: int = 5000):
+    """Replace a table's text column with a reference into text_blobs and a length column"""
+    spec = TEXT_COLUMNS[table]
+    logger.info("Moving %s.%s into the text store", table, spec['text'])
+    # Triggers reading the old column (the search index) would block dropping it; their
+    # creators put them back, and the search index is rebuilt over the new view
+    for name, sql in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)
+    ).fetchall():
+        if re.search(rf"\b{spec['text']}\b", sql):
+            conn.execute(f'DROP TRIGGER "{name}"')
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {spec['ref']} INTEGER")
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {spec['length']} INTEGER")
+    last_rowid = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT rowid, {spec['text']} FROM {table}
+            WHERE rowid > ? AND {spec['text']} IS NOT NULL
+            ORDER BY rowid LIMIT ?
+        ''', (last_rowid, chunk_rows)).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        ids = store_texts(conn, [text for _, text in rows])
+        conn.executemany(
+            f"UPDATE {table} SET {spec['ref']} = ?, {spec['length']} = ? WHERE rowid = ?",
+            [(text_id, len(text), rowid) for (rowid, text), text_id in zip(rows, ids)]
+        )
+    conn.execute(f"ALTER TABLE {table} DROP COLUMN {spec['text']}")
+
+
+def _ids(conn: sqlite3.Connection, digests: List[bytes], chunk_size: int) -> Dict[bytes, int]:
+    ids = {}
+    for i in range(0, len(digests), chunk_size):
+        chunk = digests[i:i + chunk_size]
+        ids.update(conn.execute(
+            f"SELECT digest, text_id FROM text_blobs WHERE digest IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    return ids
+
+
+def store_texts(conn: sqlite3.Connection, texts: Sequence[Optional[str]], chunk_size: int = 500) -> List[Optional[int]]:
+    """Ids of the stored copies of texts (None for None), storing the ones not seen before; the caller commits"""
+    digests = {text: digest(text) for text in texts if text is not None}
+    ids = _ids(conn, list(set(digests.values())), chunk_size)
+    missing = {digest: text for text, digest in digests.items() if digest not in ids}
+    if missing:
+        # OR IGNORE: another writer may have stored the same text since the lookup
+        conn.executemany("INSERT OR IGNORE INTO text_blobs (digest, text) VALUES (?, ?)", missing.items())
+        ids.update(_ids(conn, list(missing), chunk_size))
+    return [None if text is None else ids[digests[text]] for text in texts]
+
+
+def intern_texts(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: List[tuple]) -> List[tuple]:
+    """Rows of table with the text in their *_text_id column replaced by the id of its stored copy"""
+    spec = TEXT_COLUMNS.get(table)
+    if spec is None or not rows:
+        return rows
+    at = list(columns).index(spec['ref'])
+    ids = store_texts(conn, [row[at] for row in rows])
+    return [row[:at] + (text_id,) + row[at + 1:] for row, text_id in zip(rows, ids)]
+
+
+def with_lengths(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A frame read from a table, given the length column computed from the
+    text when the table predates the store and still holds the text itself
+    """
+    spec = TEXT_COLUMNS.get(table)
+    if spec is not None and spec['length'] not in df.columns and spec['text'] in df.columns:
+        df[spec['length']] = df[spec['text']].str.len()
+    return df
+
+
+def prune(conn: sqlite3.Connection) -> int:
+    """Delete texts no row references any more (replaced by an edit); returns how many; the caller commits"""
+    referenced = ' UNION ALL '.join(
+        f"SELECT {spec['ref']} FROM {table} WHERE {spec['ref']} IS NOT NULL"
+        for table, spec in TEXT_COLUMNS.items()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    )
+    if not referenced:
+        return 0
+    return conn.execute(f"DELETE FROM text_blobs WHERE text_id NOT IN ({referenced})").rowcount
+
+
+def store_stats(conn: sqlite3.Connection) -> Dict:
+    """Distinct stored texts and their bytes, and how many rows reference them"""
+    texts, text_bytes = conn.execute("SELECT COUNT(*), SUM(LENGTH(CAST(text AS BLOB))) FROM text_blobs").fetchone()
+    references = {
+        table: conn.execute(f"SELECT COUNT({spec['ref']}) FROM {table}").fetchone()[0]
+        for table, spec in TEXT_COLUMNS.items()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    }
+    return {
+        'distinct_texts': texts,
+        'text_bytes': text_bytes or 0,
+        'references': references,
+        'references_per_text': round(sum(references.values()) / texts, 2) if texts else None
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point: move text into the store, drop orphaned texts and report sizes"""
+    parser = argparse.ArgumentParser(description="Move the text columns of the collection database into the text store")
+    parser.add_argument('--db-path', default="data/social_computing.db", help="SQLite database to convert")
+    parser.add_argument('--vacuum', action='store_true', help="Rewrite the file afterwards so freed pages are returned")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # Imported here: data_collector imports this module
+    from data_collector import create_schema
+
+    size_before = os.path.getsize(args.db_path)
+    conn = sqlite3.connect(args.db_path)
+    converted = convert(conn)
+    # Recreates the search index and triggers the conversion dropped
+    create_schema(conn)
+    pruned = prune(conn)
+    conn.commit()
+    if args.vacuum:
+        conn.execute("VACUUM")
+    stats = store_stats(conn)
+    conn.close()
+    stats.update({'converted': converted, 'pruned': pruned, 'file_bytes_before': size_before, 'file_bytes_after': os.path.getsize(args.db_path)})
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Sentiment and politeness scores for Reddit posts and comments.
+
+Scores live in the text_tone side table keyed by (source, item_id), so each
+post or comment is scored once: score_new_rows() only picks up rows without
+a score and works through them in batches spread over a process pool.
+Sentiment is TextBlob's polarity (-1 to 1) and subjectivity (0 to 1).
+Politeness is a small lexicon measure: polite markers (please, thanks, ...)
+against rude ones (insults, profanity), from -1 to 1, and ``toxic`` flags
+text containing any rude marker. Scores describe the text as first seen.
+"""
+import logging
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from text_store import text_sql
+from time_series import gender_sql
+
+logger = logging.getLogger(__name__)
+
+# Id column and text expression of each scored table (the bodies are read from the text store)
+TONE_SOURCES = {
+    'reddit_posts': ('post_id', f"COALESCE(title, '') || ' ' || COALESCE({text_sql('s.selftext_text_id')}, '')"),
+    'reddit_comments': ('comment_id', f"COALESCE({text_sql('s.body_text_id')}, '')")
+}
+
+POLITE_MARKERS = re.compile(
+    r"\b(please|pls|thanks|thank you|thx|ty|appreciate[ds]?|sorry|apologi[sz]e|kindly|"
+    r"could you|would you|would it be|glad|welcome|cheers|great question|good point)\b",
+    re.IGNORECASE
+)
+RUDE_MARKERS = re.compile(
+    r"\b(idiot\w*|stupid\w*|dumb\w*|moron\w*|retard\w*|loser\w*|shut up|stfu|wtf|gtfo|"
+    r"fuck\w*|shit\w*|crap|bullshit|bs|trash|garbage|pathetic|clueless|useless|"
+    r"nobody cares|lol no|get a life)\b",
+    re.IGNORECASE
+)
+
+
+def create_tone_table(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS text_tone (
+            source TEXT,
+            item_id TEXT,
+            polarity REAL,
+            subjectivity REAL,
+            politeness REAL,
+            toxic INTEGER,
+            scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, item_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def politeness(text: str) -> Tuple[float, int]:
+    """(politeness from -1 to 1, 1 if the text contains a rude marker)"""
+    polite = len(POLITE_MARKERS.findall(text))
+    rude = len(RUDE_MARKERS.findall(text))
+    score = (polite - rude) / (polite + rude) if polite + rude else 0.0
+    return score, int(rude > 0)
+
+
+def score_batch(items: List[Tuple[str, str]], with_politeness: bool = True) -> List[tuple]:
+    """(item_id, polarity, subjectivity, politeness, toxic) for each (item_id, text); runs in worker processes"""
+    # Imported here so the analysis modules load without textblob's startup cost
+    from textblob import TextBlob
+    rows = []
+    for item_id, text in items:
+        sentiment = TextBlob(text).sentiment if text.strip() else None
+        polite, toxic = politeness(text) if with_politeness else (None, None)
+        rows.append((
+            item_id,
+            sentiment.polarity if sentiment else 0.0,
+            sentiment.subjectivity if sentiment else 0.0,
+            polite,
+            toxic
+        ))
+    return rows
+
+
+def _unscored(conn: sqlite3.Connection, source: str, after: int, limit: int) -> List[Tuple[int, str, str]]:
+    """(rowid, id, text) of up to limit unscored rows past rowid after, in rowid order"""
+    id_col, text = TONE_SOURCES[source]
+    return conn.execute(f'''
+        SELECT s.rowid, s.{id_col}, {text}
+        FROM {source} s
+        WHERE s.rowid > ?
+          AND NOT EXISTS (SELECT 1 FROM text_tone t WHERE t.source = ? AND t.item_id = s.{id_col})
+        ORDER BY s.rowid
+        LIMIT ?
+    ''', (after, source, limit)).fetchall()
+
+
+def score_new_rows(conn: sqlite3.Connection, sources: Optional[Iterable[str]] = None, batch_size: int = 500,
+                   workers: int = 1, with_politeness: bool = True) -> Dict[str, int]:
+    """Score every post and comment without a stored score, committing per round; returns rows scored per table"""
+    create_tone_table(conn)
+    scored = {}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for source in sources or TONE_SOURCES:
+            scored[source] = 0
+            last_rowid = 0
+            while True:
+                # One round hands every worker a few batches
+                rows = _unscored(conn, source, last_rowid, batch_size * max(workers, 1) * 4)
+                if not rows:
+                    break
+                last_rowid = rows[-1][0]
+                items = [(item_id, text) for _, item_id, text in rows]
+                batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+                if pool:
+                    results = pool.map(score_batch, batches, [with_politeness] * len(batches))
+                else:
+                    results = (score_batch(batch, with_politeness) for batch in batches)
+                for scores in results:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO text_tone (source, item_id, polarity, subjectivity, politeness, toxic)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', [(source, *score) for score in scores])
+                conn.commit()
+                scored[source] += len(items)
+            logger.info("Scored %s text tone", source, extra={'metrics': {'source': source, 'rows': scored[source]}})
+    finally:
+        if pool:
+            pool.shutdown()
+    return scored
+
+
+def tone_by_gender(conn: sqlite3.Connection, source: str) -> pd.DataFrame:
+    """
+    Per-gender count, mean and std of polarity, share positive/negative,
+    subjectivity, politeness and toxic share. Read-only: fails on a database
+    where nothing has been scored yet (score_new_rows creates the table)
+    """
+    id_col, _ = TONE_SOURCES[source]
+    df = pd.read_sql_query(f'''
+        SELECT {gender_sql('s')} AS gender,
+               COUNT(*) AS n,
+               AVG(t.polarity) AS mean_polarity,
+               AVG(t.polarity * t.polarity) AS mean_polarity_sq,
+               AVG(t.polarity > 0.05) AS positive_share,
+               AVG(t.polarity < -0.05) AS negative_share,
+               AVG(t.subjectivity) AS mean_subjectivity,
+               AVG(t.politeness) AS mean_politeness,
+               AVG(t.toxic) AS toxic_share
+        FROM text_tone t
+        JOIN {source} s ON s.{id_col} = t.item_id
+        WHERE t.source = ?
+        GROUP BY gender
+    ''', conn, params=(source,))
+    df['std_polarity'] = (df['mean_polarity_sq'] - df['mean_polarity'] ** 2).clip(lower=0) ** 0.5
+    return df.drop(columns='mean_polarity_sq').set_index('gender')
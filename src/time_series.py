@@ -0,0 +1,190 @@
+"""
+Activity over time per gender, kept as daily rollups.
+
+activity_rollups holds one row per (source table, day, gender) with the
+number of items and the sum of their score (stars for repositories).
+Triggers on the source tables keep it current as rows are inserted,
+replaced, updated or deleted, so a trend query reads a few thousand rollup
+rows instead of rescanning years of raw data. Weeks (starting Monday) and
+months are grouped from the daily rows at query time.
+
+INSERT OR REPLACE removes the old row without firing delete triggers
+(recursive_triggers is off), so a BEFORE INSERT trigger takes the old row
+out of the rollup first. Loaders that bypass the triggers call
+rebuild_rollups() afterwards.
+"""
+import sqlite3
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+# Source tables: primary key, timestamp column, how the timestamp is stored and the summed value
+TIME_SOURCES = {
+    'stackoverflow_questions': {'key': 'question_id', 'time': 'creation_date', 'epoch': False, 'value': 'score'},
+    'github_repositories': {'key': 'repo_id', 'time': 'created_at', 'epoch': False, 'value': 'stars'},
+    'reddit_posts': {'key': 'post_id', 'time': 'created_utc', 'epoch': True, 'value': 'score'},
+    'reddit_comments': {'key': 'comment_id', 'time': 'created_utc', 'epoch': True, 'value': 'score'}
+}
+
+# SQL expressions turning a day ('YYYY-MM-DD') into the start of its bucket
+BUCKETS = {
+    'day': "day",
+    'week': "date(day, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', day)"
+}
+
+
+def _day(source: str, row: str) -> str:
+    spec = TIME_SOURCES[source]
+    column = f"{row}.{spec['time']}"
+    return f"date({column}, 'unixepoch')" if spec['epoch'] else f"date({column})"
+
+
+def gender_sql(row: str) -> str:
+    """SQL folding row.gender_inferred into female/male/anonymous, as chart_data.GENDER_CLEANUP does"""
+    return (f"CASE COALESCE({row}.gender_inferred, 'unknown') "
+            f"WHEN 'unknown' THEN 'anonymous' WHEN 'mostly_male' THEN 'male' "
+            f"WHEN 'mostly_female' THEN 'female' ELSE {row}.gender_inferred END")
+
+
+def _add(source: str, row: str, sign: str) -> str:
+    value = f"COALESCE({row}.{TIME_SOURCES[source]['value']}, 0)"
+    return f'''
+        INSERT INTO activity_rollups (source, day, gender, n, value_sum)
+        SELECT '{source}', {_day(source, row)}, {gender_sql(row)}, {sign}1, {sign}{value}
+        WHERE {_day(source, row)} IS NOT NULL
+        ON CONFLICT (source, day, gender) DO UPDATE SET
+            n = n + excluded.n,
+            value_sum = value_sum + excluded.value_sum;
+    '''
+
+
+def _replaced(source: str) -> str:
+    """Subtract the row an INSERT OR REPLACE is about to overwrite, if any"""
+    spec = TIME_SOURCES[source]
+    return f'''
+        INSERT INTO activity_rollups (source, day, gender, n, value_sum)
+        SELECT '{source}', {_day(source, 'old_row')}, {gender_sql('old_row')}, -1,
+               -COALESCE(old_row.{spec['value']}, 0)
+        FROM {source} AS old_row
+        WHERE old_row.{spec['key']} = NEW.{spec['key']} AND {_day(source, 'old_row')} IS NOT NULL
+        ON CONFLICT (source, day, gender) DO UPDATE SET
+            n = n + excluded.n,
+            value_sum = value_sum + excluded.value_sum;
+    '''
+
+
+def _triggers(source: str) -> List[str]:
+    spec = TIME_SOURCES[source]
+    watched = ', '.join(dict.fromkeys([spec['time'], spec['value'], 'gender_inferred']))
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {source}_rollup_replace BEFORE INSERT ON {source} "
+        f"BEGIN {_replaced(source)} END",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_rollup_insert AFTER INSERT ON {source} "
+        f"BEGIN {_add(source, 'NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_rollup_update AFTER UPDATE OF {watched} ON {source} "
+        f"BEGIN {_add(source, 'OLD', '-')} {_add(source, 'NEW', '')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {source}_rollup_delete AFTER DELETE ON {source} "
+        f"BEGIN {_add(source, 'OLD', '-')} END"
+    ]
+
+
+def _existing_sources(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+            ','.join('?' * len(TIME_SOURCES))), list(TIME_SOURCES)
+    )]
+
+
+def create_rollups(conn: sqlite3.Connection):
+    """
+    Create the rollup table, timestamp indexes and maintenance triggers for
+    every source table that exists; on first creation, roll up any rows
+    already collected
+    """
+    existed = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activity_rollups'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS activity_rollups (
+            source TEXT,
+            day TEXT,
+            gender TEXT,
+            n INTEGER,
+            value_sum REAL,
+            PRIMARY KEY (source, day, gender)
+        ) WITHOUT ROWID
+    ''')
+    sources = _existing_sources(conn)
+    for source in sources:
+        time_col = TIME_SOURCES[source]['time']
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{source}_{time_col} ON {source}({time_col})")
+        for trigger in _triggers(source):
+            conn.execute(trigger)
+    if not existed and sources:
+        rebuild_rollups(conn, sources)
+
+
+def rebuild_rollups(conn: sqlite3.Connection, sources: Optional[Iterable[str]] = None):
+    """Recompute the daily rollups from the raw rows; the caller commits"""
+    for source in sources or _existing_sources(conn):
+        day = _day(source, source)
+        conn.execute("DELETE FROM activity_rollups WHERE source = ?", (source,))
+        conn.execute(f'''
+            INSERT INTO activity_rollups (source, day, gender, n, value_sum)
+            SELECT '{source}', {day}, {gender_sql(source)}, COUNT(*), SUM(COALESCE({TIME_SOURCES[source]['value']}, 0))
+            FROM {source}
+            WHERE {day} IS NOT NULL
+            GROUP BY 2, 3
+        ''')
+
+
+def activity_trend(conn: sqlite3.Connection, source: str, bucket: str = 'week',
+                   start: Optional[str] = None, end: Optional[str] = None,
+                   rolling: Optional[int] = None) -> pd.DataFrame:
+    """
+    Items per bucket and gender between start and end ('YYYY-MM-DD', inclusive)
+    with the mean value, each gender's share of the bucket and, if rolling is
+    given, rolling means of count and share over that many buckets
+    """
+    if source not in TIME_SOURCES:
+        raise ValueError(f"No time series for {source}")
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    conditions, params = ["source = ?"], [source]
+    if start:
+        conditions.append("day >= ?")
+        params.append(start)
+    if end:
+        conditions.append("day <= ?")
+        params.append(end)
+    df = pd.read_sql_query(f'''
+        SELECT {BUCKETS[bucket]} AS period, gender, SUM(n) AS count, SUM(value_sum) AS value_sum
+        FROM activity_rollups
+        WHERE {' AND '.join(conditions)}
+        GROUP BY period, gender
+        HAVING SUM(n) > 0
+        ORDER BY period, gender
+    ''', conn, params=params)
+    if df.empty:
+        return df.assign(mean_value=[], share=[])
+
+    df['period'] = pd.to_datetime(df['period'])
+    df['mean_value'] = df['value_sum'] / df['count']
+    df['share'] = df['count'] / df.groupby('period')['count'].transform('sum')
+    if rolling and rolling > 1:
+        # Fill missing buckets with zero counts so the window spans calendar time
+        full = df.pivot(index='period', columns='gender', values='count').fillna(0)
+        full = full.reindex(pd.date_range(full.index.min(), full.index.max(),
+                                          freq={'day': 'D', 'week': 'W-MON', 'month': 'MS'}[bucket]),
+                            fill_value=0)
+        counts = full.rolling(rolling, min_periods=1).mean()
+        shares = (full.div(full.sum(axis=1).where(lambda total: total > 0), axis=0)
+                  .rolling(rolling, min_periods=1).mean())
+        rolled = pd.DataFrame({
+            'count_rolling': counts.stack(),
+            'share_rolling': shares.stack()
+        }).rename_axis(['period', 'gender']).reset_index()
+        df = df.merge(rolled, on=['period', 'gender'], how='left')
+    return df
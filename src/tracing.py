@@ -0,0 +1,268 @@
+"""
+Lightweight tracing of collector and analysis calls.
+
+Tracing is off by default and a traced call then costs one global lookup.
+Enable it with ``tracing.enable()`` (or by setting SOCIAL_COMPUTING_TRACE to an
+output path) and every traced call records its wall time, rows processed and
+bytes read. Traces export to plain JSON or to the Chrome trace event format,
+which chrome://tracing and https://ui.perfetto.dev can open.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+# Set while tracing is enabled; checked on every traced call
+_tracer = None
+
+
+class Span:
+    """One timed call; rows and bytes accumulate while it is the innermost open span"""
+    __slots__ = ('name', 'start', 'duration', 'thread_id', 'depth', 'rows', 'bytes', 'error')
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.thread_id = threading.get_ident()
+        self.depth = depth
+        self.rows = 0
+        self.bytes = 0
+        self.error = None
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'start': round(self.start - origin, 6),
+            'seconds': round(self.duration, 6),
+            'thread': self.thread_id,
+            'depth': self.depth,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'error': self.error
+        }
+
+
+class Tracer:
+    """Collects finished spans from every thread"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def open(self, name: str) -> Span:
+        stack = self.stack()
+        span = Span(name, len(stack))
+        stack.append(span)
+        return span
+
+    def close(self, span: Span):
+        span.duration = time.perf_counter() - span.start
+        self.stack().pop()
+        with self._lock:
+            self.spans.append(span)
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {'spans': [s.to_dict(self.origin) for s in spans]}
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        return {
+            'traceEvents': [{
+                'name': s.name,
+                'cat': s.name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': round((s.start - self.origin) * 1e6, 3),
+                'dur': round(s.duration * 1e6, 3),
+                'pid': pid,
+                'tid': s.thread_id,
+                'args': {'rows': s.rows, 'bytes': s.bytes, **({'error': s.error} if s.error else {})}
+            } for s in spans],
+            'displayTimeUnit': 'ms'
+        }
+
+
+def enable() -> Tracer:
+    """Start recording spans, discarding any previous trace"""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Stop recording and return the finished tracer, if any"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def add_rows(n: int):
+    """Count rows processed against the innermost open span"""
+    tracer = _tracer
+    if tracer is not None:
+        stack = tracer.stack()
+        if stack:
+            stack[-1].rows += n
+
+
+def add_bytes(n: int):
+    """Count bytes read against the innermost open span"""
+    tracer = _tracer
+    if tracer is not None:
+        stack = tracer.stack()
+        if stack:
+            stack[-1].bytes += n
+
+
+def _measure(result: Any):
+    """Rows and in-memory bytes of DataFrames returned by a traced call"""
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(index=False).sum())
+    if isinstance(result, dict) and result and all(isinstance(v, pd.DataFrame) for v in result.values()):
+        return (sum(len(df) for df in result.values()),
+                int(sum(df.memory_usage(index=False).sum() for df in result.values())))
+    return 0, 0
+
+
+class span:
+    """
+    Context manager recording a named span, e.g.
+
+        with tracing.span('analysis.load_reddit') as s:
+            ...
+            if s: s.rows += len(df)
+
+    Yields None when tracing is disabled.
+    """
+    __slots__ = ('name', '_span', '_tracer')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._span = None
+        self._tracer = None
+
+    def __enter__(self) -> Optional[Span]:
+        self._tracer = _tracer
+        if self._tracer is not None:
+            self._span = self._tracer.open(self.name)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is not None:
+            if exc_type is not None:
+                self._span.error = exc_type.__name__
+            self._tracer.close(self._span)
+        return False
+
+
+def traced(fn: Callable = None, *, name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording a span per call. Rows and bytes come from add_rows()/
+    add_bytes() calls made inside, plus the size of any DataFrame (or dict of
+    DataFrames) the function returns.
+    """
+    if fn is None:
+        return functools.partial(traced, name=name)
+    span_name = name or fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return fn(*args, **kwargs)
+
+        current = tracer.open(span_name)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            current.error = type(e).__name__
+            tracer.close(current)
+            raise
+        rows, nbytes = _measure(result)
+        current.rows += rows
+        current.bytes += nbytes
+        tracer.close(current)
+        return result
+
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def trace_methods(cls=None, *, exclude: Iterable[str] = ()):
+    """
+    Class decorator applying @traced to every public method defined on the
+    class. Properties, static/class methods and generator-based context
+    managers are left alone, as are names in exclude.
+    """
+    if cls is None:
+        return functools.partial(trace_methods, exclude=exclude)
+    excluded = set(exclude)
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or attr in excluded:
+            continue
+        if not inspect.isfunction(value) or getattr(value, '__traced__', False):
+            continue
+        # @contextmanager functions return immediately; their body runs under `with`
+        if hasattr(value, '__wrapped__') and inspect.isgeneratorfunction(value.__wrapped__):
+            continue
+        setattr(cls, attr, traced(value, name=f"{cls.__name__}.{attr}"))
+    return cls
+
+
+def export_json(path: str, tracer: Optional[Tracer] = None):
+    """Write the spans of a tracer (default: the active one) as plain JSON"""
+    tracer = tracer or _tracer
+    if tracer is None:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tracer.to_json(), f, indent=2)
+
+
+def export_chrome_trace(path: str, tracer: Optional[Tracer] = None):
+    """Write the spans of a tracer (default: the active one) in Chrome trace event format"""
+    tracer = tracer or _tracer
+    if tracer is None:
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(tracer.to_chrome_trace(), f)
+
+
+def export(path: str, tracer: Optional[Tracer] = None):
+    """Export as plain JSON when path ends in .spans.json, Chrome trace otherwise"""
+    if path.endswith('.spans.json'):
+        export_json(path, tracer)
+    else:
+        export_chrome_trace(path, tracer)
+
+
+def trace_to(path: str):
+    """Enable tracing now and export to path when the process exits"""
+    tracer = enable()
+    atexit.register(export, path, tracer)
+    return tracer
+
+
+if os.getenv('SOCIAL_COMPUTING_TRACE'):
+    trace_to(os.environ['SOCIAL_COMPUTING_TRACE'])
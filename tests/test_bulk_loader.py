@@ -0,0 +1,72 @@
+import sqlite3
+
+import pytest
+
+import bulk_loader
+from bulk_loader import BulkLoader
+from data_collector import create_schema
+from olap_cube import stale_sources
+
+QUESTIONS = [
+    (1, 10, 'q1', 'python', 5, 100, 1, '2024-01-05T00:00:00', 'male'),
+    (2, 11, 'q2', 'sql', 3, 50, 0, '2024-02-05T00:00:00', 'female')
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "bulk.db"
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        objects = conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE type IN ('index', 'trigger') ORDER BY type, name").fetchall()
+        return objects, conn.execute("PRAGMA journal_mode").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _assert_restored(path, before):
+    # Building the cube adds its tables and change-tracking triggers
+    objects, journal_mode = _schema(path)
+    assert set(before[0]) <= set(objects)
+    assert journal_mode == before[1]
+
+
+def test_load_restores_schema_and_builds_derived_tables(db_path):
+    before = _schema(db_path)
+    with BulkLoader(db_path) as loader:
+        loader._write_batch('stackoverflow_questions', QUESTIONS)
+    _assert_restored(db_path, before)
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT SUM(n) FROM activity_rollups WHERE source = 'stackoverflow_questions'").fetchone() == (2,)
+    assert 'stackoverflow_questions' not in stale_sources(conn)
+    conn.close()
+
+
+def test_failed_rebuild_still_restores_triggers_and_pragmas(db_path, monkeypatch):
+    before = _schema(db_path)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("rebuild failed")
+
+    monkeypatch.setattr(bulk_loader, 'rebuild_sketches', fail)
+    with pytest.raises(RuntimeError, match="rebuild failed"):
+        with BulkLoader(db_path) as loader:
+            loader._write_batch('stackoverflow_questions', QUESTIONS)
+    _assert_restored(db_path, before)
+
+    # The restored triggers keep the rollups current for later writers
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM stackoverflow_questions WHERE question_id = 1")
+    conn.commit()
+    assert conn.execute("SELECT SUM(n) FROM activity_rollups WHERE source = 'stackoverflow_questions'").fetchone() == (1,)
+    conn.close()
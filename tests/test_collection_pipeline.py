@@ -0,0 +1,41 @@
+import sqlite3
+
+import pytest
+
+from collection_pipeline import CollectionPipeline
+
+
+def _write(conn, table, rows):
+    conn.executemany(f"INSERT INTO {table} VALUES (?)", rows)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "pipeline.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (value INTEGER)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_writer_commits_and_restores_journal_mode(db_path):
+    with CollectionPipeline(db_path, transform=lambda kind, item: (kind, (item,)), writer=_write) as pipeline:
+        for value in range(25):
+            pipeline.put('items', value)
+    assert pipeline.metrics()['write']['items'] == 25
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ('delete',)
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone() == (25,)
+    conn.close()
+
+
+def test_failed_writes_are_counted_not_committed(db_path):
+    def fail(conn, table, rows):
+        raise sqlite3.IntegrityError("constraint failed")
+
+    with CollectionPipeline(db_path, transform=lambda kind, item: (kind, (item,)), writer=fail) as pipeline:
+        pipeline.put('items', 1)
+    write = pipeline.metrics()['write']
+    assert (write['items'], write['errors']) == (0, 1)
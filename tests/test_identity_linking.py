@@ -0,0 +1,36 @@
+import pandas as pd
+
+from identity_linking import MAX_BUCKET_SIZE, link_accounts, normalize_username
+
+
+def _accounts(rows):
+    accounts = pd.DataFrame(rows, columns=['platform', 'account_id', 'username', 'gender'])
+    accounts['normalized'] = accounts['username'].map(normalize_username)
+    return accounts
+
+
+def test_common_names_are_paired_across_platforms():
+    size = MAX_BUCKET_SIZE + 10
+    accounts = _accounts(
+        [('stackoverflow', str(i), 'john', 'male') for i in range(size)]
+        + [('reddit', f"r{i}", 'John_', 'male') for i in range(size)]
+    )
+    links = link_accounts(accounts)
+    assert len(links) == size * size
+    assert (links['similarity'] == 1.0).all()
+    assert set(zip(links['platform_a'], links['platform_b'])) == {('reddit', 'stackoverflow')}
+
+
+def test_similar_names_link_and_same_platform_does_not():
+    accounts = _accounts([
+        ('github', '1', 'alexander-smith', 'male'),
+        ('reddit', 'alexandersmith1', 'alexandersmith1', 'male'),
+        ('reddit', 'alexander_smith', 'alexander_smith', 'male'),
+        ('stackoverflow', '2', 'zzyzx_quux', 'female')
+    ])
+    links = link_accounts(accounts)
+    pairs = set(zip(links['account_a'], links['account_b']))
+    assert pairs == {('1', 'alexandersmith1'), ('1', 'alexander_smith')}
+    exact = links[links['account_b'] == 'alexander_smith'].iloc[0]
+    assert exact['similarity'] == 1.0 and exact['confidence'] == 1.0
+    assert links[links['account_b'] == 'alexandersmith1'].iloc[0]['confidence'] < 1.0
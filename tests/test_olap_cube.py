@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from data_collector import INSERT_STATEMENTS, create_schema
+from olap_cube import OlapCube, ensure_cube, stale_sources
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "cube.db")
+    create_schema(conn)
+    conn.executemany(INSERT_STATEMENTS['stackoverflow_questions'], [
+        (1, 10, 'q1', 'python,pandas', 5, 100, 1, '2024-01-05T00:00:00', 'male'),
+        (2, 11, 'q2', 'python', 3, 50, 0, '2024-02-05T00:00:00', 'female'),
+        (3, 12, 'q3', 'sql', 1, 10, 2, '2024-02-06T00:00:00', 'male')
+    ])
+    conn.executemany(INSERT_STATEMENTS['github_repositories'], [
+        (1, 10, 'r1', None, 'Python', 10, 2, '2024-01-01T00:00:00', '2024-01-02T00:00:00', 'male'),
+        (2, 11, 'r2', None, 'Go', 4, 1, '2024-01-01T00:00:00', '2024-01-02T00:00:00', 'female')
+    ])
+    conn.commit()
+    ensure_cube(conn)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_fresh_cube_is_current(conn):
+    assert stale_sources(conn) == []
+    assert ensure_cube(conn) == []
+
+
+def test_metric_update_rebuilds_cube(conn):
+    conn.execute("UPDATE stackoverflow_questions SET view_count = view_count * 100")
+    conn.commit()
+    assert ensure_cube(conn) == ['stackoverflow_questions']
+    stats = OlapCube.load(conn).gender_stats('stackoverflow_questions', 'view_count')
+    assert stats.loc['male', 'mean'] == pytest.approx(5500)
+    assert stats.loc['female', 'mean'] == pytest.approx(5000)
+
+
+def test_gender_relabel_rebuilds_cube(conn):
+    conn.execute("UPDATE github_repositories SET gender_inferred = 'female' WHERE repo_id = 1")
+    conn.commit()
+    assert ensure_cube(conn) == ['github_repositories']
+    stats = OlapCube.load(conn).gender_stats('github_repositories', 'stars')
+    assert list(stats.index) == ['female']
+    assert stats.loc['female', 'count'] == 2
+
+
+def test_replaced_row_rebuilds_cube(conn):
+    conn.execute(INSERT_STATEMENTS['github_repositories'],
+                 (2, 11, 'r2', None, 'Rust', 40, 1, '2024-01-01T00:00:00', '2024-01-02T00:00:00', 'female'))
+    conn.commit()
+    assert ensure_cube(conn) == ['github_repositories']
+    cube = OlapCube.load(conn)
+    assert 'Rust' in cube.dimension_values('github_repositories')
+    assert cube.gender_stats('github_repositories', 'stars').loc['female', 'mean'] == pytest.approx(40)
+
+
+def test_unrelated_update_leaves_cube_current(conn):
+    conn.execute("UPDATE github_repositories SET description = 'updated'")
+    conn.commit()
+    assert ensure_cube(conn) == []
@@ -0,0 +1,55 @@
+import numpy as np
+
+from resampling import Strata, bootstrap_mean, permutation_test_means
+
+
+def exact_bootstrap_interval(values, n_resamples=300, seed=1):
+    rng = np.random.default_rng(seed)
+    means = [values[rng.integers(0, len(values), len(values))].mean() for _ in range(n_resamples)]
+    return np.quantile(means, [0.025, 0.975])
+
+
+def test_small_sample_matches_exact_bootstrap():
+    values = np.random.default_rng(0).normal(10, 3, 500)
+    result = bootstrap_mean(values, n_resamples=2000)
+    low, high = exact_bootstrap_interval(values, 2000)
+    assert abs(result['ci_low'] - low) < 0.1
+    assert abs(result['ci_high'] - high) < 0.1
+
+
+def test_heavy_tailed_interval_matches_exact_bootstrap():
+    values = np.random.default_rng(3).pareto(1.0, 200_000)
+    result = bootstrap_mean(values, n_resamples=1000)
+    low, high = exact_bootstrap_interval(values)
+    assert result['ci_low'] > 0
+    assert abs(result['ci_low'] - low) / low < 0.15
+    assert abs(result['ci_high'] - high) / high < 0.15
+
+
+def test_only_skewed_strata_are_resampled_exactly():
+    rng = np.random.default_rng(0)
+    assert not Strata(rng.uniform(size=200_000)).exact_strata
+    assert Strata(rng.pareto(1.0, 200_000)).exact_strata
+
+
+def test_interval_covers_true_mean():
+    rng = np.random.default_rng(7)
+    covered = 0
+    for trial in range(100):
+        values = rng.exponential(5.0, 2000)
+        result = bootstrap_mean(values, n_resamples=500, seed=trial)
+        covered += result['ci_low'] <= 5.0 <= result['ci_high']
+    assert covered >= 88
+
+
+def test_permutation_test_on_heavy_tails():
+    rng = np.random.default_rng(5)
+    same = rng.pareto(1.2, 100_000)
+    assert permutation_test_means(same[:40_000], same[40_000:], 500)['p_value'] > 0.01
+    shifted = np.concatenate([same[:40_000] + 5, same[40_000:]])
+    assert permutation_test_means(shifted[:40_000], shifted[40_000:], 500)['p_value'] < 0.01
+
+
+def test_results_do_not_depend_on_workers():
+    values = np.random.default_rng(2).lognormal(3, 2, 20_000)
+    assert bootstrap_mean(values, 2000, workers=1) == bootstrap_mean(values, 2000, workers=2)
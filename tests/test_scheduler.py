@@ -0,0 +1,111 @@
+import sqlite3
+import time
+from datetime import timedelta
+
+import pytest
+
+from data_collector import SocialComputingDataCollector
+from scheduler import CollectionScheduler, Job, create_runs_table
+
+
+@pytest.fixture
+def collector(tmp_path):
+    return SocialComputingDataCollector(db_path=tmp_path / "runs.db")
+
+
+def _runs(collector):
+    conn = sqlite3.connect(collector.db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute("SELECT * FROM collection_runs ORDER BY run_id")]
+    finally:
+        conn.close()
+
+
+def _seed(collector, rows):
+    conn = sqlite3.connect(collector.db_path)
+    create_runs_table(conn)
+    conn.executemany(
+        "INSERT INTO collection_runs (source, target, priority, status, scheduled_at, started_at) VALUES (?, ?, 0, ?, ?, ?)",
+        rows)
+    conn.commit()
+    conn.close()
+
+
+def _user(user_id):
+    return {'user_id': user_id, 'display_name': f"user{user_id}", 'reputation': 1,
+            'creation_date': 1600000000, 'last_access_date': 1700000000}
+
+
+def test_recover_retries_interrupted_and_schedules_new_jobs(collector):
+    now = time.time()
+    _seed(collector, [
+        ('stackoverflow', 'python', 'pending', now + 60, None),
+        ('reddit', 'programming', 'running', now - 60, now - 30)
+    ])
+    jobs = [Job('stackoverflow', 'python', timedelta(hours=1)),
+            Job('reddit', 'programming', timedelta(hours=1)),
+            Job('github', 'Go', timedelta(hours=1))]
+    scheduler = CollectionScheduler(collector, jobs)
+
+    assert scheduler.recover() == {'pending': 3, 'interrupted': 1}
+    runs = _runs(collector)
+    assert [run['status'] for run in runs] == ['pending', 'interrupted', 'pending', 'pending']
+    # Every job is queued exactly once; the interrupted one and the new one start now
+    queued = {(run['source'], run['target']): run['scheduled_at'] for run in scheduler._queue}
+    assert len(scheduler._queue) == 3
+    assert queued[('stackoverflow', 'python')] == pytest.approx(now + 60)
+    assert queued[('reddit', 'programming')] <= time.time()
+    assert queued[('github', 'Go')] <= time.time()
+
+
+def test_recover_schedules_one_interval_after_last_start(collector):
+    started = time.time() - 600
+    _seed(collector, [('github', 'Go', 'succeeded', started - 60, started)])
+    scheduler = CollectionScheduler(collector, [Job('github', 'Go', timedelta(hours=1))])
+
+    assert scheduler.recover() == {'pending': 1, 'interrupted': 0}
+    (run,) = scheduler._queue
+    assert started + 3600 <= run['scheduled_at'] <= started + 3600 * 1.1 + 1
+
+
+def test_recover_is_idempotent(collector):
+    scheduler = CollectionScheduler(collector, [Job('github', 'Go', timedelta(hours=1))])
+    scheduler.recover()
+    assert scheduler.recover() == {'pending': 1, 'interrupted': 0}
+    assert len(_runs(collector)) == 1
+
+
+def test_run_records_committed_rows_and_errors(collector, monkeypatch):
+    def collect(tags, max_users):
+        for user_id in range(5):
+            collector._emit('stackoverflow_users', _user(user_id))
+        collector.stats.record_error('stackoverflow', "users 5..9: timeout")
+
+    monkeypatch.setattr(collector, 'collect_stackoverflow_data', collect)
+    scheduler = CollectionScheduler(collector, [Job('stackoverflow', 'python', timedelta(hours=1))])
+    scheduler.run(once=True)
+
+    (run,) = _runs(collector)
+    assert run['status'] == 'failed'
+    assert run['rows'] == 5
+    assert 'timeout' in run['error']
+
+
+def test_failed_writes_fail_only_their_run(collector, monkeypatch):
+    def collect(tags, max_users):
+        collector._emit('stackoverflow_users', _user(1))
+
+    def failing_writer(conn, table, rows):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(collector, 'collect_stackoverflow_data', collect)
+    monkeypatch.setattr(collector, '_write_rows', failing_writer)
+    CollectionScheduler(collector, [Job('stackoverflow', 'python', timedelta(0))]).run(once=True)
+    monkeypatch.delattr(collector, '_write_rows')
+    CollectionScheduler(collector, [Job('stackoverflow', 'python', timedelta(0))]).run(once=True)
+
+    runs = _runs(collector)
+    assert [run['status'] for run in runs] == ['failed', 'succeeded']
+    assert [run['rows'] for run in runs] == [0, 1]
+    assert runs[0]['error'] == "1 rows failed to write"
@@ -0,0 +1,90 @@
+import sqlite3
+
+import pytest
+
+from data_collector import create_schema
+from text_search import search
+from text_store import convert, store_stats, unconverted_tables
+
+COMMENTS = [
+    ('c1', 'p1', 'alice', 'python', 'Pandas merges are slow', 5, 1700000000, 'female'),
+    ('c2', 'p1', 'bob', 'python', 'Pandas merges are slow', 2, 1700000100, 'male'),
+    ('c3', 'p2', 'carol', 'rust', 'Borrow checker café', 7, 1700000200, 'female'),
+    ('c4', 'p2', 'dave', 'rust', None, 0, 1700000300, 'male')
+]
+
+
+@pytest.fixture
+def old_db(tmp_path):
+    """A database in the layout collected before the text store"""
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE reddit_posts (
+            post_id TEXT PRIMARY KEY, username TEXT, subreddit TEXT, title TEXT, selftext TEXT,
+            score INTEGER, num_comments INTEGER, created_utc INTEGER, gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE reddit_comments (
+            comment_id TEXT PRIMARY KEY, post_id TEXT, username TEXT, subreddit TEXT, body TEXT,
+            score INTEGER, created_utc INTEGER, gender_inferred TEXT,
+            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO reddit_posts (post_id, username, subreddit, title, selftext, score, num_comments, "
+        "created_utc, gender_inferred) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+            ('p1', 'alice', 'python', 'Merging frames', 'Pandas merges are slow', 10, 2, 1700000000, 'female'),
+            ('p2', 'bob', 'rust', 'Lifetimes', '', 3, 2, 1700000050, 'male')
+        ])
+    conn.executemany(
+        "INSERT INTO reddit_comments (comment_id, post_id, username, subreddit, body, score, created_utc, "
+        "gender_inferred) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", COMMENTS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_writers_refuse_unconverted_database(old_db):
+    conn = sqlite3.connect(old_db)
+    with pytest.raises(RuntimeError, match="text_store.py"):
+        create_schema(conn)
+    assert unconverted_tables(conn) == ['reddit_posts', 'reddit_comments']
+    conn.close()
+
+
+def test_conversion_round_trip(old_db):
+    conn = sqlite3.connect(old_db)
+    assert convert(conn) == ['reddit_posts', 'reddit_comments']
+    create_schema(conn)
+    conn.commit()
+    assert unconverted_tables(conn) == []
+    assert convert(conn) == []
+
+    rows = conn.execute(
+        "SELECT comment_id, body, body_length FROM reddit_comments_text ORDER BY comment_id").fetchall()
+    assert rows == [(c[0], c[4], None if c[4] is None else len(c[4])) for c in COMMENTS]
+    # Two comments and a post share one text; the empty selftext is stored too
+    assert store_stats(conn)['distinct_texts'] == 3
+    assert search(conn, 'borrow', ['reddit_comments'])['reddit_comments']['total'] == 1
+    conn.close()
+
+
+def test_converted_database_needs_no_custom_functions(old_db):
+    conn = sqlite3.connect(old_db)
+    convert(conn)
+    create_schema(conn)
+    conn.commit()
+    conn.close()
+
+    plain = sqlite3.connect(old_db)
+    assert plain.execute(
+        "SELECT body FROM reddit_comments_text WHERE comment_id = 'c3'").fetchone() == ('Borrow checker café',)
+    plain.execute("UPDATE reddit_comments SET score = 1 WHERE comment_id = 'c1'")
+    plain.execute("DELETE FROM reddit_comments WHERE comment_id = 'c3'")
+    plain.commit()
+    assert search(plain, 'borrow', ['reddit_comments'])['reddit_comments']['total'] == 0
+    assert search(plain, 'pandas', ['reddit_comments'])['reddit_comments']['total'] == 2
+    plain.close()